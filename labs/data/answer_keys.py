@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Answer keys: expected lab results aggregated while the data is generated
+
+With --answer-keys, every batch the generator writes is also folded into
+streaming counters, and answer_keys.json is written next to the data. It
+holds the results the labs ask for, without re-scanning the output:
+- event counts by sourcetype, and per hour for each sourcetype
+- access_combined_wcookie counts by status, file, categoryId, productId
+  and action, plus purchases (file=success.do status=200) by product with
+  revenue from the products.csv lookup (Lab 8)
+- linux_secure events by action, failed logins by source IP and user
+  (Lab 9), and successful logins by user
+- db_audit events by Type and queries by SQL verb
+
+Counters from worker processes, appended days and trims merge into one
+set of keys, so the file stays correct under --workers and --incremental.
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+
+from generate_course_data import TIME_KEYS
+from event_formats import access_fields, db_audit_fields, linux_secure_fields
+
+ANSWER_KEYS_NAME = "answer_keys.json"
+ANSWER_KEYS_VERSION = 1
+PRODUCTS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "products.csv")
+
+# Counters kept per sourcetype (every sourcetype also gets "hourly")
+AGGREGATES = {
+    "access_combined_wcookie": ["status", "file", "categoryId", "productId", "action", "purchases"],
+    "linux_secure": ["action", "failed_by_src_ip", "failed_by_user", "accepted_by_user"],
+    "db_audit": ["Type", "verb"],
+}
+
+
+def load_products(path=PRODUCTS_CSV):
+    """productId -> (product_name, price) from the products lookup"""
+    with open(path, newline='') as f:
+        return {row["productId"]: (row["product_name"], float(row["price"])) for row in csv.DictReader(f)}
+
+
+class AnswerKeys:
+    """Mergeable streaming counters over generated events"""
+
+    def __init__(self, counters=None):
+        # sourcetype -> aggregate name -> Counter
+        self.counters = counters or {}
+
+    def _counters(self, sourcetype):
+        if sourcetype not in self.counters:
+            self.counters[sourcetype] = {name: Counter() for name in AGGREGATES.get(sourcetype, []) + ["hourly"]}
+        return self.counters[sourcetype]
+
+    def observer(self, sourcetype):
+        """Callable taking each batch of event lines written for sourcetype"""
+        return lambda batch: self.observe(sourcetype, batch)
+
+    def observe(self, sourcetype, batch):
+        counters = self._counters(sourcetype)
+        time_key = TIME_KEYS[sourcetype]
+        hourly = counters["hourly"]
+        for line in batch:
+            year, month, day, clock = time_key(line)
+            hourly[(year, month, day, clock[:2])] += 1
+        if sourcetype == "access_combined_wcookie":
+            self._observe_access(counters, batch)
+        elif sourcetype == "linux_secure":
+            self._observe_linux(counters, batch)
+        elif sourcetype == "db_audit":
+            self._observe_db_audit(counters, batch)
+
+    @staticmethod
+    def _observe_access(counters, batch):
+        status, file, category, product, action, purchases = (
+            counters[name] for name in AGGREGATES["access_combined_wcookie"])
+        for line in batch:
+            fields = access_fields(line)
+            status[fields["status"]] += 1
+            file[fields["file"]] += 1
+            if "categoryId" in fields:
+                category[fields["categoryId"]] += 1
+            if "productId" in fields:
+                product[fields["productId"]] += 1
+                if fields["file"] == "success.do" and fields["status"] == "200":
+                    purchases[fields["productId"]] += 1
+            if "action" in fields:
+                action[fields["action"]] += 1
+
+    @staticmethod
+    def _observe_linux(counters, batch):
+        action, failed_ip, failed_user, accepted_user = (counters[name] for name in AGGREGATES["linux_secure"])
+        for line in batch:
+            fields = linux_secure_fields(line)
+            action[fields["action"]] += 1
+            if fields["action"] == "failure":
+                failed_ip[fields["src_ip"]] += 1
+                failed_user[fields["user"]] += 1
+            elif fields["action"] == "success":
+                accepted_user[fields["user"]] += 1
+
+    @staticmethod
+    def _observe_db_audit(counters, batch):
+        kind, verb = counters["Type"], counters["verb"]
+        for line in batch:
+            fields = db_audit_fields(line)
+            kind[fields["Type"]] += 1
+            if fields["Type"] == "Query":
+                verb[fields["Command"].split(" ", 1)[0]] += 1
+
+    def merge(self, other):
+        """Add another AnswerKeys' counters into this one"""
+        for sourcetype, counters in other.counters.items():
+            mine = self._counters(sourcetype)
+            for name, counter in counters.items():
+                mine.setdefault(name, Counter()).update(counter)
+        return self
+
+    def scaled(self, factors):
+        """AnswerKeys with each sourcetype's counts multiplied by factors[sourcetype] and rounded
+
+        e.g. the counts of a sample scaled up to estimate the full dataset's;
+        sourcetypes without a factor are left out.
+        """
+        return AnswerKeys({
+            sourcetype: {name: Counter({key: round(count * factors[sourcetype]) for key, count in counter.items()})
+                         for name, counter in counters.items()}
+            for sourcetype, counters in self.counters.items() if factors.get(sourcetype) is not None})
+
+    def to_dict(self, products=None):
+        """The answer keys as JSON-ready data (counts sorted most common first)"""
+        products = load_products() if products is None else products
+        data = {"version": ANSWER_KEYS_VERSION, "events_by_sourcetype": {}, "sourcetypes": {}, "hourly": {}}
+        for sourcetype, counters in self.counters.items():
+            data["events_by_sourcetype"][sourcetype] = sum(counters["hourly"].values())
+            data["hourly"][sourcetype] = {f"{year}-{month:02d}-{day}T{hour}": count
+                                          for (year, month, day, hour), count in sorted(counters["hourly"].items())}
+            aggregates = {name: dict(counter.most_common())
+                          for name, counter in counters.items() if name != "hourly"}
+            if sourcetype == "access_combined_wcookie":
+                revenue = Counter()
+                for product_id, count in counters["purchases"].items():
+                    name, price = products.get(product_id, (product_id, 0.0))
+                    revenue[name] += count * price
+                aggregates["revenue_by_product"] = {name: round(amount, 2) for name, amount in revenue.most_common()}
+                aggregates["total_revenue"] = round(sum(revenue.values()), 2)
+            data["sourcetypes"][sourcetype] = aggregates
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        counters = {}
+        for sourcetype, aggregates in data["sourcetypes"].items():
+            counters[sourcetype] = {name: Counter(values) for name, values in aggregates.items()
+                                    if isinstance(values, dict) and name != "revenue_by_product"}
+            counters[sourcetype]["hourly"] = Counter({
+                (key[0:4], int(key[5:7]), key[8:10], key[11:13]): count
+                for key, count in data["hourly"].get(sourcetype, {}).items()})
+        return cls(counters)
+
+    def save(self, directory, extra=None):
+        """Write answer_keys.json (with any extra top-level entries) to directory"""
+        data = self.to_dict()
+        data.update(extra or {})
+        path = os.path.join(directory, ANSWER_KEYS_NAME)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, directory):
+        """Answer keys previously saved in directory, or None"""
+        path = os.path.join(directory, ANSWER_KEYS_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        return cls.from_dict(data) if data.get("version") == ANSWER_KEYS_VERSION else None
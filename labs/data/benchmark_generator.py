@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the course data generator
+
+Measures each sourcetype generator at several volumes and worker counts:
+- events/sec and bytes/sec (best of --repeat runs)
+- peak RSS of the process doing the generation (and its worker processes)
+- where the time goes, from a cProfile run split into RNG, string
+  formatting (strftime, f-strings, str.replace/join in the templating) and I/O
+
+Each measurement runs in a fresh spawned process so peak RSS is not skewed by
+earlier runs. A run that crashes, exits non-zero or outlasts --timeout
+stops the benchmark with a non-zero exit naming the case. Results are
+written as JSON; --compare checks them against a stored baseline and exits
+non-zero when throughput regresses by more than --tolerance.
+
+Usage:
+    python benchmark_generator.py --output baseline.json
+    python benchmark_generator.py --compare baseline.json --tolerance 0.15
+"""
+
+import argparse
+import cProfile
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sys
+import tempfile
+import time
+
+from generate_course_data import DataGenerator, SOURCETYPES, np
+from run_metrics import category_split, peak_rss_kb
+
+RESULTS_VERSION = 1
+# Seconds a case's process may take before the benchmark gives up on it
+DEFAULT_TIMEOUT = 600
+
+
+def _run_case(case, result_queue):
+    """Child process: generate one case and report throughput and peak RSS"""
+    sourcetype, engine, events, workers = case
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = DataGenerator(output_dir=output_dir, stream=True, seed=1, engine=engine)
+        started = time.perf_counter()
+        if workers > 1:
+            generator.generate_sharded({sourcetype: events}, workers)
+        else:
+            generator.generate_sourcetype(sourcetype, events)
+        seconds = time.perf_counter() - started
+        size = os.path.getsize(generator.output_path(sourcetype))
+    result_queue.put({"seconds": seconds, "bytes": size, "peak_rss_kb": peak_rss_kb()})
+
+
+def measure(case, repeat, timeout=DEFAULT_TIMEOUT):
+    """Run case repeat times in fresh processes; keep the fastest run
+
+    Raises RuntimeError naming the case when a run crashes, exits non-zero
+    or takes longer than timeout seconds.
+    """
+    sourcetype, engine, events, workers = case
+    name = f"{sourcetype}/{engine} {events} events x{workers}"
+    context = multiprocessing.get_context("spawn")
+    best = None
+    for _ in range(repeat):
+        result_queue = context.Queue()
+        process = context.Process(target=_run_case, args=(case, result_queue))
+        process.start()
+        deadline = time.monotonic() + timeout
+        result = None
+        # Poll, so a child that dies without reporting fails at once rather than at the timeout
+        while result is None:
+            try:
+                result = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not process.is_alive():
+                    try:
+                        # It may have reported just before exiting
+                        result = result_queue.get(timeout=1.0)
+                    except queue.Empty:
+                        process.join()
+                        raise RuntimeError(f"{name}: process exited with code {process.exitcode} "
+                                           "without a result") from None
+                elif time.monotonic() > deadline:
+                    process.kill()
+                    process.join()
+                    raise RuntimeError(f"{name}: no result within {timeout:g}s")
+        process.join(max(deadline - time.monotonic(), 1.0))
+        if process.is_alive():
+            process.kill()
+            process.join()
+            raise RuntimeError(f"{name}: process did not exit after reporting")
+        if process.exitcode != 0:
+            raise RuntimeError(f"{name}: process exited with code {process.exitcode}")
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return {
+        "sourcetype": sourcetype,
+        "engine": engine,
+        "events": events,
+        "workers": workers,
+        "seconds": round(best["seconds"], 4),
+        "events_per_sec": round(events / best["seconds"]),
+        "bytes_per_sec": round(best["bytes"] / best["seconds"]),
+        "peak_rss_kb": best["peak_rss_kb"],
+    }
+
+
+def profile_split(sourcetype, engine, events):
+    """Seconds of own (exclusive) time per category from a cProfile run"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = DataGenerator(output_dir=output_dir, stream=True, seed=1, engine=engine)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        generator.generate_sourcetype(sourcetype, events)
+        profiler.disable()
+    return category_split(profiler)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against baseline: cases whose events/sec dropped by more than tolerance"""
+    key = lambda r: (r["sourcetype"], r["engine"], r["events"], r["workers"])
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        change = result["events_per_sec"] / old["events_per_sec"] - 1
+        status = "REGRESSION" if change < -tolerance else "ok"
+        print(f"  {status:10} {result['sourcetype']:24} {result['engine']:6} {result['events']:>9} events "
+              f"x{result['workers']}: {old['events_per_sec']:>10,} -> {result['events_per_sec']:>10,} events/sec "
+              f"({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the course data generator")
+    parser.add_argument('--sourcetypes', default=",".join(SOURCETYPES),
+                        help='Comma-separated sourcetypes to benchmark (default: all)')
+    parser.add_argument('--volumes', default="10000,100000",
+                        help='Comma-separated event counts (default: 10000,100000)')
+    parser.add_argument('--workers', default="1,2",
+                        help='Comma-separated worker counts (default: 1,2)')
+    parser.add_argument('--engines', default="python,numpy",
+                        help='Engines for access_combined_wcookie (default: python,numpy when installed)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case, fastest is kept (default: 3)')
+    parser.add_argument('--profile-events', type=int, default=20000,
+                        help='Events per profiled run for the time split, 0 to skip (default: 20000)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Seconds each run may take before the benchmark fails (default: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='Baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed fractional throughput drop against the baseline (default: 0.10)')
+    args = parser.parse_args()
+
+    sourcetypes = args.sourcetypes.split(",")
+    volumes = [int(v) for v in args.volumes.split(",")]
+    workers = [int(w) for w in args.workers.split(",")]
+    engines = [e for e in args.engines.split(",") if e != "numpy" or np is not None]
+
+    cases = []
+    for sourcetype in sourcetypes:
+        # Only the web access generator has a numpy engine
+        for engine in (engines if sourcetype == "access_combined_wcookie" else ["python"]):
+            for events in volumes:
+                for worker_count in workers:
+                    cases.append((sourcetype, engine, events, worker_count))
+
+    results = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": [],
+        "profile": {},
+    }
+    for case in cases:
+        try:
+            result = measure(case, args.repeat, args.timeout)
+        except RuntimeError as e:
+            print(f"error: {e}", file=sys.stderr)
+            sys.exit(1)
+        results["results"].append(result)
+        print(f"{result['sourcetype']:24} {result['engine']:6} {result['events']:>9} events x{result['workers']}: "
+              f"{result['events_per_sec']:>10,} events/sec {result['bytes_per_sec'] / 1e6:7.1f} MB/sec "
+              f"peak RSS {result['peak_rss_kb'] / 1024:.0f} MiB")
+
+    if args.profile_events:
+        for sourcetype in sourcetypes:
+            for engine in (engines if sourcetype == "access_combined_wcookie" else ["python"]):
+                split = profile_split(sourcetype, engine, args.profile_events)
+                results["profile"][f"{sourcetype}/{engine}"] = split
+                print(f"{sourcetype}/{engine} time split: " +
+                      ", ".join(f"{category} {value['fraction']:.0%}" for category, value in split.items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing against {args.compare} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed beyond tolerance")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
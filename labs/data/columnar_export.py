@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Columnar export of generated events, with memory-mapped readers
+
+With --format columnar the generator also writes each sourcetype as typed
+column files in a directory next to its text file (access_30DAY.log ->
+access_30DAY.log.columns/), for fast offline analysis and for diffing
+datasets between runs:
+- numeric fields (event time in epoch seconds, status, bytes,
+  response_time, ports, durations) as fixed-width arrays, <field>.bin,
+  with 0 where the field is missing
+- strings (IPs, URL paths, productId, users...) dictionary encoded:
+  <field>.bin holds uint32 codes (0 = field missing) and <field>.dict.json
+  the distinct values, code 1 first
+- schema.json: row count, byte order and each column's type
+
+ColumnarReader memory-maps the .bin files and hands out zero-copy
+memoryviews (or NumPy arrays when NumPy is installed). When pyarrow is
+installed, a Parquet file (access_30DAY.log.parquet) is written as well,
+with the string columns kept dictionary encoded.
+
+Usage:
+    python generate_course_data.py --format columnar
+    python columnar_export.py export access_30DAY.log linux_s_30DAY.log
+    python columnar_export.py info access_30DAY.log.columns
+    python columnar_export.py diff run1/access_30DAY.log.columns run2/access_30DAY.log.columns
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+
+from generate_course_data import SOURCETYPES, np
+from event_formats import FIELD_PARSERS, EventClock, sourcetype_for_path
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.parquet
+except ImportError:  # Parquet output is optional
+    pyarrow = None
+
+COLUMNS_SUFFIX = ".columns"
+PARQUET_SUFFIX = ".parquet"
+SCHEMA_VERSION = 1
+
+# Column type: an array typecode for fixed-width numbers, or "dict" for dictionary-encoded strings
+DICT = "dict"
+TYPECODES = {"q": "int64", "I": "uint32", "H": "uint16"}
+
+# Columns per sourcetype; _time is the event time in epoch seconds
+COLUMNS = {
+    "access_combined_wcookie": [
+        ("_time", "q"), ("status", "H"), ("bytes", "I"), ("response_time", "I"),
+        ("clientip", DICT), ("method", DICT), ("uri_path", DICT), ("file", DICT), ("action", DICT),
+        ("productId", DICT), ("categoryId", DICT), ("JSESSIONID", DICT), ("referer", DICT), ("useragent", DICT),
+    ],
+    "linux_secure": [
+        ("_time", "q"), ("pid", "I"), ("port", "H"),
+        ("host", DICT), ("action", DICT), ("user", DICT), ("src_ip", DICT),
+    ],
+    "db_audit": [
+        ("_time", "q"), ("Duration", "I"), ("Type", DICT), ("Command", DICT),
+    ],
+}
+
+# Sourcetypes without field extraction (--spec) get the event time and the raw line
+DEFAULT_COLUMNS = [("_time", "q"), ("_raw", DICT)]
+
+
+def columns_dir(path):
+    return path + COLUMNS_SUFFIX
+
+
+class ColumnarWriter:
+    """Appends batches of event lines to a sourcetype's column files, in file order"""
+
+    def __init__(self, directory, sourcetype):
+        self.directory = directory
+        self.sourcetype = sourcetype
+        self.columns = COLUMNS.get(sourcetype, DEFAULT_COLUMNS)
+        self.parse = FIELD_PARSERS.get(sourcetype) if sourcetype in COLUMNS else None
+        self.event_time = EventClock(sourcetype)
+        self.rows = 0
+        # Field -> {value: code} for dictionary columns
+        self.dictionaries = {name: {} for name, kind in self.columns if kind == DICT}
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+        self.files = {name: open(os.path.join(directory, f"{name}.bin"), 'wb') for name, _ in self.columns}
+
+    def add_batch(self, lines):
+        """Append a batch of event lines (without line terminators)"""
+        values = {name: array('I' if kind == DICT else kind) for name, kind in self.columns}
+        for line in lines:
+            fields = self.parse(line) if self.parse is not None else {"_raw": line}
+            fields["_time"] = self.event_time(line)
+            for name, kind in self.columns:
+                value = fields.get(name)
+                if kind == DICT:
+                    if value is None:
+                        code = 0
+                    else:
+                        codes = self.dictionaries[name]
+                        code = codes.get(value)
+                        if code is None:
+                            code = codes[value] = len(codes) + 1
+                    values[name].append(code)
+                else:
+                    values[name].append(int(value) if value not in (None, "") else 0)
+        for name, column in values.items():
+            column.tofile(self.files[name])
+        self.rows += len(lines)
+
+    def close(self):
+        """Finish the column files and write the schema (and Parquet when pyarrow is installed)"""
+        for f in self.files.values():
+            f.close()
+        for name, codes in self.dictionaries.items():
+            with open(os.path.join(self.directory, f"{name}.dict.json"), 'w') as f:
+                json.dump(list(codes), f)
+        schema = {
+            "version": SCHEMA_VERSION,
+            "sourcetype": self.sourcetype,
+            "rows": self.rows,
+            "byteorder": sys.byteorder,
+            "columns": {name: kind for name, kind in self.columns},
+        }
+        with open(os.path.join(self.directory, "schema.json"), 'w') as f:
+            json.dump(schema, f, indent=2)
+        if pyarrow is not None:
+            write_parquet(self.directory, self.directory[:-len(COLUMNS_SUFFIX)] + PARQUET_SUFFIX)
+
+
+class ColumnarReader:
+    """Zero-copy access to a column directory through mmap"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "schema.json")) as f:
+            self.schema = json.load(f)
+        if self.schema.get("version") != SCHEMA_VERSION:
+            raise ValueError(f"{directory}: unsupported columnar schema version {self.schema.get('version')}")
+        if self.schema["byteorder"] != sys.byteorder:
+            raise ValueError(f"{directory} was written on a {self.schema['byteorder']}-endian machine")
+        self.rows = self.schema["rows"]
+        self.columns = self.schema["columns"]
+        self._maps = {}
+        self._dictionaries = {}
+
+    def _map(self, name):
+        if name not in self.columns:
+            raise KeyError(f"no column '{name}' (columns: {', '.join(self.columns)})")
+        if name not in self._maps:
+            with open(os.path.join(self.directory, f"{name}.bin"), 'rb') as f:
+                # mmap cannot map empty files
+                self._maps[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.rows else b""
+        return self._maps[name]
+
+    def typecode(self, name):
+        kind = self.columns[name]
+        return 'I' if kind == DICT else kind
+
+    def view(self, name):
+        """The column's fixed-width values (codes for dictionary columns) as a memoryview over the mmap"""
+        return memoryview(self._map(name)).cast(self.typecode(name))
+
+    def array(self, name):
+        """The column as a NumPy array over the mmap (no copy)"""
+        if np is None:
+            raise RuntimeError("ColumnarReader.array requires NumPy; use view() instead")
+        return np.frombuffer(self._map(name), dtype=TYPECODES[self.typecode(name)])
+
+    def dictionary(self, name):
+        """Values of a dictionary column, where code n is dictionary[n - 1]"""
+        if self.columns[name] != DICT:
+            raise ValueError(f"column '{name}' is not dictionary encoded")
+        if name not in self._dictionaries:
+            with open(os.path.join(self.directory, f"{name}.dict.json")) as f:
+                self._dictionaries[name] = json.load(f)
+        return self._dictionaries[name]
+
+    def values(self, name):
+        """The column decoded to Python values (None where a string field is missing)"""
+        if self.columns[name] != DICT:
+            return self.view(name).tolist()
+        lookup = [None] + self.dictionary(name)
+        return [lookup[code] for code in self.view(name)]
+
+    def close(self):
+        for buffer in self._maps.values():
+            if isinstance(buffer, mmap.mmap):
+                try:
+                    buffer.close()
+                except BufferError:
+                    # Views handed out are still alive; the mapping goes away with the last of them
+                    pass
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_parquet(directory, path):
+    """Write a column directory as one Parquet file (requires pyarrow)"""
+    if pyarrow is None:
+        raise RuntimeError("Parquet output requires the pyarrow package")
+    compute = pyarrow.compute
+    with ColumnarReader(directory) as reader:
+        arrays, names = [], []
+        for name, kind in reader.columns.items():
+            # Arrow arrays straight over the mmapped column files
+            arrow_type = getattr(pyarrow, TYPECODES[reader.typecode(name)])()
+            values = pyarrow.Array.from_buffers(arrow_type, reader.rows, [None, pyarrow.py_buffer(reader._map(name))])
+            if kind == DICT:
+                # Code 0 (missing) becomes a null index
+                indices = compute.if_else(compute.equal(values, 0), pyarrow.scalar(None, arrow_type),
+                                          compute.subtract(values, pyarrow.scalar(1, arrow_type)))
+                values = pyarrow.DictionaryArray.from_arrays(compute.cast(indices, pyarrow.int32()),
+                                                            pyarrow.array(reader.dictionary(name), pyarrow.string()))
+            arrays.append(values)
+            names.append(name)
+        pyarrow.parquet.write_table(pyarrow.Table.from_arrays(arrays, names=names), path)
+    return path
+
+
+def export_file(path, sourcetype=None, batch_size=10000):
+    """Write the column directory of an existing uncompressed data file; returns the directory"""
+    sourcetype = sourcetype or sourcetype_for_path(path)
+    if sourcetype is None:
+        raise ValueError(f"cannot tell the sourcetype of {path}; pass --sourcetype")
+    if path.endswith((".gz", ".zst")):
+        raise ValueError(f"{path}: export the uncompressed file")
+    writer = ColumnarWriter(columns_dir(path), sourcetype)
+    with open(path, newline='', buffering=1024 * 1024) as f:
+        if SOURCETYPES[sourcetype][1] is not None:
+            f.readline()
+        batch = []
+        for line in f:
+            batch.append(line.rstrip("\r\n"))
+            if len(batch) >= batch_size:
+                writer.add_batch(batch)
+                batch = []
+        writer.add_batch(batch)
+    writer.close()
+    return writer.directory
+
+
+def diff_columns(directory_a, directory_b, chunk_rows=1 << 20):
+    """Per common column, the number of rows whose values differ (rows beyond the shorter side count too)"""
+    with ColumnarReader(directory_a) as a, ColumnarReader(directory_b) as b:
+        rows = min(a.rows, b.rows)
+        extra = abs(a.rows - b.rows)
+        differences = {}
+        for name in a.columns:
+            if b.columns.get(name) != a.columns[name]:
+                continue
+            if a.columns[name] == DICT:
+                # Codes depend on first appearance, so compare the decoded values
+                left, right = [None] + a.dictionary(name), [None] + b.dictionary(name)
+                codes_a, codes_b = a.view(name), b.view(name)
+                differing = sum(left[x] != right[y] for x, y in zip(codes_a[:rows], codes_b[:rows]))
+            else:
+                view_a, view_b = a.view(name), b.view(name)
+                differing = 0
+                for start in range(0, rows, chunk_rows):
+                    end = min(start + chunk_rows, rows)
+                    if view_a[start:end] != view_b[start:end]:
+                        differing += sum(x != y for x, y in zip(view_a[start:end], view_b[start:end]))
+            differences[name] = differing + extra
+        return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export generated course data to typed column files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Write <file>.columns/ (and <file>.parquet with pyarrow)")
+    export.add_argument("files", nargs="+")
+    export.add_argument("--sourcetype", choices=sorted(SOURCETYPES), default=None)
+    info = subparsers.add_parser("info", help="Show the columns of a column directory")
+    info.add_argument("directory")
+    diff = subparsers.add_parser("diff", help="Count differing rows per column between two column directories")
+    diff.add_argument("directory_a")
+    diff.add_argument("directory_b")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            for path in args.files:
+                directory = export_file(path, args.sourcetype)
+                print(f"Exported {path} to {directory}" + (" and Parquet" if pyarrow is not None else ""))
+        elif args.command == "info":
+            with ColumnarReader(args.directory) as reader:
+                print(f"{reader.schema['sourcetype']}: {reader.rows} rows")
+                for name, kind in reader.columns.items():
+                    detail = f"{len(reader.dictionary(name))} distinct values" if kind == DICT else TYPECODES[kind]
+                    print(f"  {name}: {detail}")
+        else:
+            differences = diff_columns(args.directory_a, args.directory_b)
+            for name, count in differences.items():
+                print(f"  {name}: {count} rows differ")
+            sys.exit(1 if any(differences.values()) else 0)
+    except (OSError, ValueError, KeyError, RuntimeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Dataset manifest, incremental refresh and cache for generated course data
+
+Runs of generate_course_data.py with --incremental or --cache-dir write
+dataset_manifest.json next to the data (plain runs skip it, as checksumming
+the output takes a full extra read). It records the seed, the generation
+parameters (including a digest of the sourcetype specs and the generator
+version), the covered time range and a SHA-256 checksum for each segment
+written to each file.
+
+With the manifest in place:
+- --incremental only generates the days since the last run and appends them
+  (each append is a new checksummed segment); --trim also drops events that
+  fell out of the --days window
+- --cache-dir keeps a copy of each finished dataset under a key derived from
+  its parameters and time range, so rerunning with identical parameters is
+  served from the cache instead of being regenerated
+"""
+
+import hashlib
+import json
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+from itertools import islice
+
+from generate_course_data import (DataGenerator, EventWriter, SOURCETYPES, TIME_KEYS, GENERATOR_VERSION,
+                                  DEFAULT_BATCH_SIZE, derive_seed, open_event_file)
+
+MANIFEST_NAME = "dataset_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, offset=0, length=None):
+    """SHA-256 of length bytes of a file starting at offset (default: to end of file)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = f.read(1024 * 1024 if remaining is None else min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def generation_params(generator, volumes):
+    """The parameters that, with a time range, fully determine a dataset"""
+    params = {
+        "seed": generator.seed,
+        "days": generator.days,
+        "engine": generator.engine,
+        "time_ordered": generator.time_ordered,
+        "compression": generator.compression,
+        "product_skew": generator.product_skew,
+        "entities": dict(generator.entity_counts, skew=generator.entity_skew),
+        "volumes": dict(volumes),
+        # Editing a spec (or passing another --spec) or the generator code changes the dataset
+        "specs": generator.spec_digest(),
+        "generator": GENERATOR_VERSION,
+    }
+    # Only recorded when used, so manifests of earlier runs keep matching
+    if generator.hosts:
+        params["hosts"] = {"count": generator.hosts, "skew": generator.host_skew}
+    return params
+
+
+def day_start(moment):
+    """Midnight at the start of moment's day; incremental runs work in whole days"""
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def time_key(moment):
+    """A datetime as a TIME_KEYS tuple, for comparing against event lines"""
+    return f"{moment.year:04d}", moment.month, f"{moment.day:02d}", moment.strftime("%H:%M:%S")
+
+
+class DatasetManifest:
+    """Parameters, time range and per-file checksummed segments of a dataset"""
+
+    def __init__(self, params, start, end, files=None):
+        self.params = params
+        self.start = start
+        self.end = end
+        self.files = files or {}
+
+    @property
+    def key(self):
+        """Content address of the dataset: a hash of its parameters and time range"""
+        identity = {"params": self.params, "start": self.start.isoformat(), "end": self.end.isoformat()}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:32]
+
+    @classmethod
+    def load(cls, directory):
+        """Load the manifest in directory, or None if there is none"""
+        path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(data["params"], datetime.fromisoformat(data["start"]),
+                   datetime.fromisoformat(data["end"]), data["files"])
+
+    def save(self, directory):
+        data = {
+            "version": MANIFEST_VERSION,
+            "key": self.key,
+            "params": self.params,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "files": self.files,
+        }
+        path = os.path.join(directory, MANIFEST_NAME)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def add_segment(self, sourcetype, path, offset, events, start, end):
+        """Record the bytes of path from offset to end of file as a new segment"""
+        length = os.path.getsize(path) - offset
+        entry = self.files.setdefault(sourcetype, {"file": os.path.basename(path), "events": 0,
+                                                   "bytes": 0, "segments": []})
+        entry["events"] += events
+        entry["bytes"] = offset + length
+        entry["segments"].append({
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "offset": offset,
+            "length": length,
+            "events": events,
+            "sha256": file_sha256(path, offset, length),
+        })
+
+    def verify(self, directory, checksums=True):
+        """True if every file exists with the recorded size (and segment checksums)"""
+        for entry in self.files.values():
+            path = os.path.join(directory, entry["file"])
+            if not os.path.exists(path) or os.path.getsize(path) != entry["bytes"]:
+                return False
+            if checksums:
+                for segment in entry["segments"]:
+                    if file_sha256(path, segment["offset"], segment["length"]) != segment["sha256"]:
+                        return False
+        return True
+
+
+def record_generation(generator, volumes):
+    """Write a manifest for a dataset generator has just written in full"""
+    manifest = DatasetManifest(generation_params(generator, volumes), generator.start_date, generator.end_date)
+    for sourcetype in volumes:
+        path = generator.output_path(sourcetype)
+        events = generator.stats.get(sourcetype, {}).get("events", volumes[sourcetype])
+        manifest.add_segment(sourcetype, path, 0, events, generator.start_date, generator.end_date)
+    manifest.save(generator.output_dir)
+    return manifest
+
+
+def append_new_days(generator, manifest, trim=False):
+    """Bring a dataset up to generator.end_date by appending only the missing time range
+
+    Event counts per sourcetype follow the manifest's per-day rates. The new
+    range gets its own seed derived from the master seed and the new end time,
+    and its own checksummed segment. Returns the updated manifest.
+    """
+    new_end = generator.end_date
+    if new_end <= manifest.end:
+        print(f"Dataset already covers up to {manifest.end}; nothing to do")
+        return manifest
+
+    window_days = manifest.params["days"]
+    start = manifest.end + timedelta(seconds=1)
+    added_days = (new_end - start).total_seconds() / 86400
+    print(f"Appending {added_days:.2f} days of data ({start} to {new_end})")
+
+    appender = DataGenerator(**dict(generator.generator_args(), start_date=start, end_date=new_end))
+    appender.rng = random.Random(derive_seed(manifest.params["seed"], "append", new_end.isoformat()))
+    for sourcetype, window_count in manifest.params["volumes"].items():
+        path = os.path.join(generator.output_dir, manifest.files[sourcetype]["file"])
+        count = round(window_count / window_days * added_days)
+        offset = os.path.getsize(path)
+        newline = SOURCETYPES[sourcetype][2]
+        with EventWriter(path, newline=newline, batch_size=generator.batch_size,
+                         compression=generator.compression, compress_workers=generator.compress_workers,
+                         append=True, observer=appender.observer(sourcetype)) as writer:
+            writer.write_many(appender.iter_events(sourcetype, count))
+        manifest.add_segment(sourcetype, path, offset, writer.count, start, new_end)
+        print(f"Appended {writer.count} {sourcetype} events to {path}")
+    manifest.end = new_end
+
+    answer_keys = appender.answer_keys
+    if trim:
+        # Trimming reads every kept event, so the answer keys are rebuilt from scratch
+        answer_keys = type(answer_keys)() if answer_keys is not None else None
+        trim_window(generator, manifest, new_end - timedelta(days=window_days), answer_keys)
+    elif answer_keys is not None:
+        previous = type(answer_keys).load(generator.output_dir)
+        if previous is not None:
+            answer_keys = previous.merge(answer_keys)
+    if answer_keys is not None:
+        answer_keys.save(generator.output_dir, {"start": manifest.start.isoformat(), "end": manifest.end.isoformat()})
+    manifest.save(generator.output_dir)
+    return manifest
+
+
+def trim_window(generator, manifest, cutoff, answer_keys=None):
+    """Drop events older than cutoff from every file, rewriting them as a single segment
+
+    Kept events are fed to answer_keys, if given.
+    """
+    if cutoff <= manifest.start:
+        return
+    cutoff_key = time_key(cutoff)
+    for sourcetype, entry in list(manifest.files.items()):
+        filename, header, newline = SOURCETYPES[sourcetype]
+        key = TIME_KEYS[sourcetype]
+        path = os.path.join(generator.output_dir, entry["file"])
+        with open_event_file(path) as source, \
+                EventWriter(path + ".trim", header=header, newline=newline,
+                            compression=generator.compression,
+                            compress_workers=generator.compress_workers) as writer:
+            if header is not None:
+                source.readline()
+            kept = (line for line in source if key(line) >= cutoff_key)
+            while True:
+                batch = list(islice(kept, DEFAULT_BATCH_SIZE))
+                if not batch:
+                    break
+                writer.write_raw("".join(batch))
+                writer.count += len(batch)
+                if answer_keys is not None:
+                    answer_keys.observe(sourcetype, [line.rstrip("\r\n") for line in batch])
+        os.replace(path + ".trim", path)
+        del manifest.files[sourcetype]
+        manifest.add_segment(sourcetype, path, 0, writer.count, cutoff, manifest.end)
+        print(f"Trimmed {sourcetype} to {writer.count} events from {cutoff}")
+    manifest.start = cutoff
+
+
+def restore_from_cache(cache_dir, key, output_dir):
+    """Copy a cached dataset into output_dir if its checksums verify; returns the manifest or None"""
+    entry = os.path.join(cache_dir, key)
+    manifest = DatasetManifest.load(entry)
+    if manifest is None or manifest.key != key or not manifest.verify(entry):
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    for file_entry in manifest.files.values():
+        shutil.copyfile(os.path.join(entry, file_entry["file"]), os.path.join(output_dir, file_entry["file"]))
+    manifest.save(output_dir)
+    return manifest
+
+
+def store_in_cache(cache_dir, manifest, output_dir):
+    """Copy a finished dataset into the cache under its content address
+
+    Files are copied rather than hard-linked so later appends to the output
+    directory cannot change the cached copy.
+    """
+    entry = os.path.join(cache_dir, manifest.key)
+    staging = entry + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for file_entry in manifest.files.values():
+        shutil.copyfile(os.path.join(output_dir, file_entry["file"]), os.path.join(staging, file_entry["file"]))
+    manifest.save(staging)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(staging, entry)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Deterministic downsampling of existing course data files
+
+Makes small classroom or sandbox copies of large outputs (say 1% of
+access_30DAY.log) without regenerating them. The sample goes into a
+directory next to the originals (sample-1pct/access_30DAY.log ...) under
+the same file names, so every other tool works on it unchanged.
+
+- --fraction keeps events by a keyed hash of their session (JSESSIONID),
+  so whole access log sessions stay intact; --key user keeps whole user
+  histories instead (sshd users, db_audit userids), which suits data
+  generated with --users, as the built-in data has only a handful of
+  users. Other events are hashed line by line. The same seed always keeps
+  the same events.
+- --count keeps exactly that many events per file by bottom-k (priority)
+  reservoir sampling: every event gets a hash priority from its position
+  and the count lowest are kept, so the result does not depend on how
+  the file was split across workers (sessions are not kept whole).
+- uncompressed files are split into line-aligned byte ranges read in
+  large chunks and sampled in parallel by a process pool; .gz/.zst files
+  are streamed by one worker each.
+- answer_keys.json is recomputed from the kept events, so its counts are
+  the sample's own (what lab searches over the sample should return). It
+  also records the scale factor per sourcetype (events in / events kept)
+  and "estimated", the sample's counts multiplied by those factors as an
+  estimate of the full dataset's. Exact full-size keys come from the
+  generator (--answer-keys), not from a sample.
+
+Usage:
+    python downsample_dataset.py access_30DAY.log linux_s_30DAY.log db_audit_30DAY.csv --fraction 0.01
+    python downsample_dataset.py access_30DAY.log --count 5000 --seed 7
+"""
+
+import argparse
+import hashlib
+import heapq
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from generate_course_data import SOURCETYPES, compress_block
+from event_formats import compression_of, open_binary, sourcetype_for_path
+from answer_keys import AnswerKeys
+
+# Bytes per parallel range of an uncompressed file, and per read of a compressed one
+RANGE_SIZE = 64 * 1024 * 1024
+READ_SIZE = 8 * 1024 * 1024
+
+# Sampling key per sourcetype: a regex whose first group is the key, or None to hash whole events
+KEY_PATTERNS = {
+    "session": re.compile(rb"JSESSIONID=([^&\s\"]+)"),
+    "user": re.compile(rb"(?:for (?:invalid )?user |Accepted password for |Failed password for |userid = )([^\s,]+)"),
+    "event": None,
+}
+DEFAULT_KEYS = {"access_combined_wcookie": "session"}
+
+HASH_SPACE = 1 << 64
+# Decisions cached per key (sessions and users repeat) before the cache is reset
+KEY_CACHE_LIMIT = 1 << 20
+
+
+def _hash(data, seed):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8, key=seed).digest(), "little")
+
+
+class HashSampler:
+    """Keeps an event when the keyed hash of its session/user (or of the whole line) falls under fraction"""
+
+    def __init__(self, fraction, key, seed):
+        self.threshold = int(fraction * HASH_SPACE)
+        self.pattern = KEY_PATTERNS[key]
+        self.seed = seed
+        self.decisions = {}
+
+    def keep(self, line):
+        match = self.pattern.search(line) if self.pattern is not None else None
+        # Events without a key (e.g. sshd server messages) are sampled on their own
+        key = match.group(1) if match is not None else line
+        decision = self.decisions.get(key)
+        if decision is None:
+            if len(self.decisions) >= KEY_CACHE_LIMIT:
+                self.decisions.clear()
+            decision = self.decisions[key] = _hash(key, self.seed) < self.threshold
+        return decision
+
+
+def _range_lines(path, start, end):
+    """Yield (offset, line without the newline) for lines starting in [start, end) of an uncompressed file"""
+    with open(path, 'rb') as f:
+        if start:
+            # The line straddling start belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            data = f.read(min(READ_SIZE, end - position))
+            if not data:
+                break
+            if not data.endswith(b"\n"):
+                data += f.readline()
+            for line in data.split(b"\n")[:-1] if data.endswith(b"\n") else data.split(b"\n"):
+                yield position, line
+                position += len(line) + 1
+
+
+def _stream_lines(path):
+    """Yield (offset, line) over a whole (possibly compressed) file"""
+    with open_binary(path) as f:
+        position = 0
+        rest = b""
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                break
+            lines = (rest + data).split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                yield position, line
+                position += len(line) + 1
+        if rest:
+            yield position, rest
+
+
+def _sample_task(task):
+    """Process pool entry point: sample one range (or whole compressed file) of one data file
+
+    Returns (events read, events kept, part path or reservoir entries, AnswerKeys of the kept events).
+    """
+    path, sourcetype, start, end, mode, value, key, seed, part = task
+    header = SOURCETYPES[sourcetype][1]
+    lines = _range_lines(path, start, end) if end is not None else _stream_lines(path)
+    answer_keys = AnswerKeys()
+    observe = answer_keys.observer(sourcetype)
+    read = 0
+
+    if mode == "count":
+        # Bottom-k: a max-heap (negated priorities) of the value lowest-priority events seen
+        heap = []
+        for offset, line in lines:
+            if not line or (offset == 0 and header is not None):
+                continue
+            read += 1
+            priority = _hash(offset.to_bytes(8, "little"), seed)
+            if len(heap) < value:
+                heapq.heappush(heap, (-priority, offset, line))
+            elif -heap[0][0] > priority:
+                heapq.heapreplace(heap, (-priority, offset, line))
+        return read, len(heap), [(-negated, offset, line) for negated, offset, line in heap], None
+
+    sampler = HashSampler(value, key, seed)
+    kept = 0
+    batch = []
+    with open(part, 'wb') as out:
+        for offset, line in lines:
+            if not line or (offset == 0 and header is not None):
+                continue
+            read += 1
+            if sampler.keep(line):
+                batch.append(line)
+                if len(batch) >= 10000:
+                    out.write(b"\n".join(batch) + b"\n")
+                    observe([event.decode().rstrip("\r") for event in batch])
+                    kept += len(batch)
+                    batch = []
+        if batch:
+            out.write(b"\n".join(batch) + b"\n")
+            observe([event.decode().rstrip("\r") for event in batch])
+            kept += len(batch)
+    return read, kept, part, answer_keys
+
+
+def sample_files(paths, output_dir, fraction=None, count=None, key="auto", seed=0, workers=None):
+    """Write samples of paths into output_dir; returns (per-file stats, AnswerKeys of the sample)
+
+    Exactly one of fraction and count is given.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    seed_bytes = str(seed).encode()[:64]
+    mode, value = ("count", count) if count is not None else ("fraction", fraction)
+    tasks = []
+    plans = []
+    for path in paths:
+        sourcetype = sourcetype_for_path(path)
+        if sourcetype is None:
+            raise ValueError(f"cannot tell the sourcetype of {path}")
+        if mode == "count":
+            file_key = "reservoir"
+        else:
+            file_key = DEFAULT_KEYS.get(sourcetype, "event") if key == "auto" else key
+        target = os.path.join(output_dir, os.path.basename(path))
+        if os.path.abspath(target) == os.path.abspath(path):
+            raise ValueError(f"{path}: the sample would overwrite the original")
+        if compression_of(path) is None:
+            size = os.path.getsize(path)
+            ranges = [(start, min(start + RANGE_SIZE, size)) for start in range(0, size, RANGE_SIZE)] or [(0, 0)]
+        else:
+            ranges = [(0, None)]
+        first = len(tasks)
+        for number, (start, end) in enumerate(ranges):
+            tasks.append((path, sourcetype, start, end, mode, value, file_key, seed_bytes,
+                          f"{target}.part{number:04d}"))
+        plans.append((path, sourcetype, file_key, target, first, len(tasks)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_sample_task, tasks))
+
+    answer_keys = AnswerKeys()
+    stats = []
+    for path, sourcetype, file_key, target, first, end in plans:
+        filename, header, newline = SOURCETYPES[sourcetype]
+        compression = compression_of(path)
+        file_results = results[first:end]
+        read = sum(result[0] for result in file_results)
+        with open(target, 'wb') as out:
+            if header is not None:
+                out.write(compress_block((header + newline).encode(), compression))
+            if mode == "count":
+                entries = heapq.nsmallest(count, (entry for result in file_results for entry in result[2]))
+                lines = [line for _, _, line in sorted(entries, key=lambda entry: entry[1])]
+                for start in range(0, len(lines), 10000):
+                    chunk = lines[start:start + 10000]
+                    out.write(compress_block(b"\n".join(chunk) + b"\n", compression))
+                    answer_keys.observe(sourcetype, [line.decode().rstrip("\r") for line in chunk])
+                kept = len(lines)
+            else:
+                kept = 0
+                for read_count, kept_count, part, part_keys in file_results:
+                    kept += kept_count
+                    answer_keys.merge(part_keys)
+                    with open(part, 'rb') as source:
+                        if compression is None:
+                            shutil.copyfileobj(source, out, READ_SIZE)
+                        else:
+                            while True:
+                                data = source.read(READ_SIZE)
+                                if not data:
+                                    break
+                                # Cut at a line end so each compressed block holds whole lines
+                                data += source.readline()
+                                out.write(compress_block(data, compression))
+                    os.remove(part)
+        stats.append({"file": path, "sample": target, "sourcetype": sourcetype, "key": file_key,
+                      "events": read, "kept": kept})
+    return stats, answer_keys
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write deterministic samples of course data files",
+        epilog="answer_keys.json in the sample directory is recomputed from the kept events, so lab "
+               "answers checked against the sample must come from it, not from the full dataset's "
+               "answer_keys.json; its \"estimated\" entry scales the sample's counts up to the full dataset.")
+    parser.add_argument('files', nargs='+', help='access, db_audit or linux_secure files (.gz/.zst allowed)')
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument('--fraction', type=float, help='Share of sessions/users (or events) to keep, e.g. 0.01')
+    size.add_argument('--count', type=int, help='Exact number of events to keep per file (reservoir sampling)')
+    parser.add_argument('--key', choices=['auto', 'session', 'user', 'event'], default='auto',
+                        help='What --fraction hashes: auto uses JSESSIONID for access logs and whole events '
+                             'elsewhere (default: auto)')
+    parser.add_argument('--seed', default='0', help='Sampling seed; the same seed keeps the same events (default: 0)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--output-dir', default=None,
+                        help='Sample directory (default: sample-<size> next to the first file)')
+    args = parser.parse_args()
+    if args.fraction is not None and not 0 < args.fraction <= 1:
+        parser.error("--fraction must be in (0, 1]")
+    if args.count is not None and args.count < 1:
+        parser.error("--count must be positive")
+
+    label = f"{args.fraction * 100:g}pct" if args.fraction is not None else f"{args.count}events"
+    output_dir = args.output_dir or os.path.join(os.path.dirname(args.files[0]) or ".", f"sample-{label}")
+    started = time.perf_counter()
+    try:
+        stats, answer_keys = sample_files(args.files, output_dir, fraction=args.fraction, count=args.count,
+                                          key=args.key, seed=args.seed, workers=args.workers)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+    seconds = max(time.perf_counter() - started, 1e-9)
+
+    scale = {entry["sourcetype"]: entry["events"] / entry["kept"] if entry["kept"] else None for entry in stats}
+    estimated = answer_keys.scaled(scale).to_dict()
+    del estimated["version"]
+    answer_keys.save(output_dir, {"estimated": estimated, "sample": {
+        "fraction": args.fraction, "count": args.count, "seed": args.seed,
+        "source": os.path.abspath(os.path.dirname(args.files[0]) or "."),
+        "files": stats,
+        # Multiply sample counts by these to estimate the full dataset's
+        "scale": scale,
+    }})
+    total = sum(os.path.getsize(entry["file"]) for entry in stats)
+    for entry in stats:
+        print(f"{entry['file']}: kept {entry['kept']} of {entry['events']} events ({entry['key']}) -> {entry['sample']}")
+    print(f"Sampled {total / 1e6:.1f} MB in {seconds:.2f}s ({total / 1e6 / seconds:.0f} MB/sec); "
+          f"answer keys of the sample (and scaled estimates) in {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+High-cardinality entities derived on the fly from integer IDs
+
+An EntitySpace stands for `cardinality` distinct entities (sessions, client
+IPs, users, hosts) without storing any of them. A draw picks an entity number,
+optionally Zipf-skewed so a few entities are far more active than the rest,
+and renders it through a keyed Feistel permutation of the entity format's
+value space. The permutation is a bijection, so distinct entities always
+render distinctly, and the same entity number always renders the same way
+for the same key. Popular entities are scattered across the value space
+rather than being the lowest IDs.
+
+Memory use is constant whatever the cardinality (small spaces, up to
+TABLE_LIMIT entities, keep their rendered entities in a table):
+
+    sessions = EntitySpace("session", 5_000_000, skew=1.1, key=derive_seed(seed, "session"))
+    sessions.sample(rng.random)          # 'SD4SL17FF86ADFF5821'
+    sessions.sample_array(np_rng, 100000)
+"""
+
+import math
+
+MASK64 = (1 << 64) - 1
+# Spaces up to this many entities render each one up front, so draws skip the permutation
+TABLE_LIMIT = 1 << 14
+
+LAST_NAMES = ["smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "rodriguez", "martinez"]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _session(value):
+    value, adff = divmod(value, 9000)
+    value, ff = divmod(value, 99)
+    sd, sl = divmod(value, 99)
+    return f"SD{sd + 1}SL{sl + 1}FF{ff + 1}ADFF{adff + 1000}"
+
+
+def _ipv4(value):
+    # Skip 0.0.0.0/8; 223 first octets keeps addresses out of multicast/reserved space
+    value += 1 << 24
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+
+def _host(value):
+    return f"www{value + 1}"
+
+
+def _user(value):
+    value, letter = divmod(value, 26)
+    number, last = divmod(value, len(LAST_NAMES))
+    return f"{LETTERS[letter]}{LAST_NAMES[last]}{number or ''}"
+
+
+# Renderers and the size of the value space they cover, per entity kind;
+# None means the space is exactly the cardinality, so hosts are www1..wwwN
+FORMATS = {
+    "session": (_session, 9 * 99 * 99 * 9000),
+    "client_ip": (_ipv4, 223 << 24),
+    "user": (_user, 26 * len(LAST_NAMES) * 100000),
+    "host": (_host, None),
+}
+
+
+class FeistelPermutation:
+    """Keyed bijection on range(size): a balanced Feistel network with cycle walking"""
+
+    ROUNDS = 4
+
+    def __init__(self, size, key):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        self.round_keys = [(key * (2 * i + 1) * 0x9E3779B97F4A7C15 + i) & MASK64 for i in range(self.ROUNDS)]
+
+    def _round(self, value, round_key):
+        value = ((value * 0xBF58476D1CE4E5B9 + round_key) & MASK64) ^ (value >> 7)
+        return ((value * 0x94D049BB133111EB) & MASK64) >> 29
+
+    def __call__(self, value):
+        half_bits, half_mask = self.half_bits, self.half_mask
+        while True:
+            left, right = value >> half_bits, value & half_mask
+            for round_key in self.round_keys:
+                left, right = right, left ^ (self._round(right, round_key) & half_mask)
+            value = (left << half_bits) | right
+            # The network permutes the enclosing power of two; walk until back in range
+            if value < self.size:
+                return value
+
+    def permute_array(self, values):
+        """Vectorized __call__ over a numpy uint64 array"""
+        import numpy as np
+        values = values.astype(np.uint64)
+        half_bits, half_mask = np.uint64(self.half_bits), np.uint64(self.half_mask)
+        pending = np.ones(len(values), dtype=bool)
+        while pending.any():
+            current = values[pending]
+            left, right = current >> half_bits, current & half_mask
+            for round_key in self.round_keys:
+                mixed = (right * np.uint64(0xBF58476D1CE4E5B9) + np.uint64(round_key)) ^ (right >> np.uint64(7))
+                mixed = (mixed * np.uint64(0x94D049BB133111EB)) >> np.uint64(29)
+                left, right = right, left ^ (mixed & half_mask)
+            values[pending] = (left << half_bits) | right
+            pending[pending] = values[pending] >= np.uint64(self.size)
+        return values
+
+
+class EntitySpace:
+    """cardinality distinct entities of one kind, drawn with Zipf skew and rendered by keyed permutation
+
+    as_id renders users as numeric user IDs from 1000 up instead of names;
+    an entity's name and ID both depend only on its number and the key.
+    """
+
+    def __init__(self, kind, cardinality, skew=0.0, key=0, as_id=False):
+        if kind not in FORMATS:
+            raise ValueError(f"unknown entity kind '{kind}' (expected one of {', '.join(FORMATS)})")
+        if as_id:
+            digits = max(4, len(str(cardinality)) + 1)
+            render, capacity = (lambda value: str(value + 1000)), 10 ** digits - 1000
+        else:
+            render, capacity = FORMATS[kind]
+            if capacity is None:
+                capacity = max(cardinality, 1)
+        if not 0 < cardinality <= capacity:
+            raise ValueError(f"{kind} cardinality must be between 1 and {capacity:,}")
+        self.kind = kind
+        self.cardinality = cardinality
+        self.skew = skew
+        self.render = render
+        self.permutation = FeistelPermutation(capacity, key)
+        # Inverse CDF of a continuous power law on [1, cardinality + 1) approximates Zipf ranks
+        if skew == 1.0:
+            self.log_span = math.log(cardinality + 1)
+        elif skew:
+            self.exponent = 1.0 - skew
+            self.span = (cardinality + 1) ** self.exponent - 1.0
+        self.table = [self.entity(number) for number in range(cardinality)] if cardinality <= TABLE_LIMIT else None
+
+    def number(self, u):
+        """Entity number for a uniform u in [0, 1): rank 0 is the most active entity"""
+        if not self.skew:
+            return int(u * self.cardinality)
+        if self.skew == 1.0:
+            x = math.exp(u * self.log_span)
+        else:
+            x = (self.span * u + 1.0) ** (1.0 / self.exponent)
+        return min(int(x) - 1, self.cardinality - 1)
+
+    def entity(self, number):
+        """The rendered entity for an entity number"""
+        return self.render(self.permutation(number))
+
+    def sample(self, random):
+        """Draw one rendered entity; random is a callable returning uniforms on [0, 1)"""
+        if self.table is not None:
+            return self.table[self.number(random())]
+        return self.render(self.permutation(self.number(random())))
+
+    def sample_array(self, rng, count):
+        """Draw count rendered entities from a numpy Generator, as a list of strings"""
+        import numpy as np
+        u = rng.random(count)
+        if not self.skew:
+            numbers = (u * self.cardinality).astype(np.int64)
+        else:
+            x = np.exp(u * self.log_span) if self.skew == 1.0 else (self.span * u + 1.0) ** (1.0 / self.exponent)
+            numbers = np.minimum(x.astype(np.int64) - 1, self.cardinality - 1)
+        render = self.render
+        return [render(value) for value in self.permutation.permute_array(numbers).tolist()]
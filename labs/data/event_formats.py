@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Timestamp layout and field extraction for generated sourcetypes' event lines
+
+Shared by the tools that read generated files back (rebase_timestamps.py,
+answer_keys.py and friends). Every built-in timestamp is a date part followed by
+HH:MM:SS, the same split TimestampTable uses when writing them:
+
+    access_combined_wcookie   1.2.3.4 - - [dd/Mon/YYYY:HH:MM:SS] ...
+    db_audit                  dd/Mon/YYYY HH:MM:SS,...
+    linux_secure              Www Mon dd YYYY HH:MM:SS host ...
+
+The timestamp functions accept str lines or bytes-like lines (bytes, mmap
+slices); the *_fields parsers take str lines without the line terminator
+and return the search-time fields Splunk would extract.
+"""
+
+import gzip
+import io
+import os
+import re
+from datetime import datetime
+
+from generate_course_data import SOURCETYPES, SPECS, COMPRESSION_SUFFIXES, TIME_KEYS, zstandard
+
+# Width of the trailing HH:MM:SS in every timestamp
+TIME_OF_DAY_WIDTH = 8
+
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def timestamp_format(sourcetype):
+    """strftime format of sourcetype's event timestamps"""
+    return SPECS[sourcetype]["timestamp"]
+
+
+def date_format(sourcetype):
+    """strftime format of the date part preceding HH:MM:SS"""
+    return timestamp_format(sourcetype)[:-TIME_OF_DAY_WIDTH]
+
+
+def timestamp_width(sourcetype):
+    """Characters in a formatted timestamp (all built-in formats are fixed width)"""
+    return len(datetime(2000, 1, 1).strftime(timestamp_format(sourcetype)))
+
+
+def timestamp_start(sourcetype, line, start=0, end=None):
+    """Index of the first timestamp character in the line beginning at start
+
+    line may be a whole buffer (e.g. an mmap), with the line spanning
+    start:end. Raises ValueError when an access line has no '['.
+    """
+    if sourcetype == "access_combined_wcookie":
+        needle = "[" if isinstance(line, str) else b"["
+        bracket = line.find(needle, start, len(line) if end is None else end)
+        if bracket < 0:
+            raise ValueError("access line without a [timestamp]")
+        return bracket + 1
+    return start
+
+
+def epoch_seconds(moment):
+    """Naive datetime as seconds since 1970-01-01 (event times carry no time zone)"""
+    return ((moment.toordinal() - EPOCH_ORDINAL) * 86400
+            + moment.hour * 3600 + moment.minute * 60 + moment.second)
+
+
+def from_epoch_seconds(seconds):
+    """Inverse of epoch_seconds"""
+    day, second = divmod(int(seconds), 86400)
+    return datetime.fromordinal(EPOCH_ORDINAL + day).replace(hour=second // 3600, minute=second // 60 % 60,
+                                                            second=second % 60)
+
+
+class EventClock:
+    """Event time of sourcetype's str lines as epoch_seconds, parsing each distinct day once"""
+
+    def __init__(self, sourcetype):
+        self.time_key = TIME_KEYS[sourcetype]
+        self.days = {}
+
+    def __call__(self, line):
+        year, month, day, clock = self.time_key(line)
+        base = self.days.get((year, month, day))
+        if base is None:
+            base = self.days[(year, month, day)] = (
+                (datetime(int(year), month, int(day)).toordinal() - EPOCH_ORDINAL) * 86400)
+        return base + int(clock[0:2]) * 3600 + int(clock[3:5]) * 60 + int(clock[6:8])
+
+
+_IP = rb"\d{1,3}(?:\.\d{1,3}){3}"
+_DB_COMMAND = rb'(?:"(?:[^"\r\n]|"")*"|[^,"\r\n]*)'
+
+# Exact shape of each built-in sourcetype's event lines, for multiline
+# finditer over whole buffers; the date and clock groups split the timestamp
+LINE_PATTERNS = {
+    "access_combined_wcookie": re.compile(
+        rb"^" + _IP + rb" - - \[(?P<date>\d\d/[A-Z][a-z]{2}/\d{4}):(?P<clock>\d\d:\d\d:\d\d)\] "
+        rb'"[A-Z]+ /[^\s"?]*\?(?:[^\s"&]*&)*JSESSIONID=[^\s&"]+ HTTP 1\.1" \d{3} \d+ "[^"\r\n]*" "[^"\r\n]*" \d+\r?$',
+        re.MULTILINE),
+    # Query rows carry a Duration, Connect rows leave it empty
+    "db_audit": re.compile(
+        rb"^(?P<date>\d\d/[A-Z][a-z]{2}/\d{4}) (?P<clock>\d\d:\d\d:\d\d),"
+        rb"(?:Query," + _DB_COMMAND + rb",\d+|Connect," + _DB_COMMAND + rb",)\r?$",
+        re.MULTILINE),
+    "linux_secure": re.compile(
+        rb"^(?P<date>[A-Z][a-z]{2} [A-Z][a-z]{2} \d\d \d{4}) (?P<clock>\d\d:\d\d:\d\d) \S+ sshd\[\d+\]: "
+        rb"(?:(?:Failed password for (?:invalid user )?|Accepted password for )\S+ from " + _IP + rb" port \d+ ssh2"
+        rb"|pam_unix\(sshd:session\): session (?:opened for user \S+ by \(uid=\d+\)|closed for user \S+)"
+        rb"|Server listening on (?:::|" + _IP + rb") port \d+\."
+        rb"|Received SIGHUP; restarting\.)\r?$",
+        re.MULTILINE),
+}
+
+
+def sourcetype_for_path(path):
+    """The sourcetype whose output file path is (ignoring compression and rotation suffixes), or None"""
+    name = os.path.basename(path)
+    for suffix in COMPRESSION_SUFFIXES.values():
+        name = name.removesuffix(suffix)
+    base, _, rotation = name.rpartition(".")
+    if rotation.isdigit():
+        name = base
+    for sourcetype, (filename, header, newline) in SOURCETYPES.items():
+        if filename == name:
+            return sourcetype
+    return None
+
+
+def open_binary(path):
+    """Binary reader of a data file, decompressing .gz and .zst files"""
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rb')
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"reading {path} requires the zstandard package")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'),
+                                                                             read_across_frames=True,
+                                                                             closefd=True))
+    return open(path, 'rb', buffering=1024 * 1024)
+
+
+def compression_of(path):
+    """Compression (a COMPRESSION_SUFFIXES key) of path from its suffix, or None"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def access_fields(line):
+    """Search-time fields of an access_combined_wcookie line, named as Splunk extracts them"""
+    prefix, request, middle, referer, _, useragent, tail = line.split('"', 6)
+    clientip = prefix.split(" ", 1)[0]
+    method, uri, version = request.split(" ", 2)
+    status, size = middle.split()
+    uri_path, _, query = uri.partition("?")
+    fields = {
+        "clientip": clientip,
+        "method": method,
+        "uri": uri,
+        "uri_path": uri_path,
+        "file": uri_path.rsplit("/", 1)[-1],
+        "status": status,
+        "bytes": size,
+        "referer": referer,
+        "useragent": useragent,
+        "response_time": tail.strip(),
+    }
+    for param in query.split("&") if query else ():
+        name, _, value = param.partition("=")
+        fields[name] = value
+    return fields
+
+
+def linux_secure_fields(line):
+    """Fields of a linux_secure sshd line: host, process, pid, action, user, src_ip, port"""
+    parts = line.split(" ", 6)
+    process, _, pid = parts[6].partition(": ")[0].rstrip("]").partition("[")
+    message = parts[6].partition(": ")[2]
+    fields = {"host": parts[5], "process": process, "pid": pid}
+    words = message.split()
+    if message.startswith("Failed password"):
+        fields["action"] = "failure"
+        fields["invalid_user"] = words[3] == "invalid"
+        user_at = 5 if fields["invalid_user"] else 3
+        fields["user"], fields["src_ip"], fields["port"] = words[user_at], words[user_at + 2], words[user_at + 4]
+    elif message.startswith("Accepted password"):
+        fields["action"] = "success"
+        fields["user"], fields["src_ip"], fields["port"] = words[3], words[5], words[7]
+    elif "session opened" in message:
+        fields["action"] = "session_opened"
+        fields["user"] = words[5]
+    elif "session closed" in message:
+        fields["action"] = "session_closed"
+        fields["user"] = words[5]
+    else:
+        fields["action"] = "server"
+    return fields
+
+
+def db_audit_fields(line):
+    """The Time, Type, Command and Duration columns of a db_audit CSV row"""
+    time_text, kind, rest = line.split(",", 2)
+    if rest.startswith('"'):
+        command, _, duration = rest[1:].rpartition('",')
+        command = command.replace('""', '"')
+    else:
+        command, _, duration = rest.rpartition(",")
+    return {"Time": time_text, "Type": kind, "Command": command, "Duration": duration}
+
+
+# Field extraction per built-in sourcetype
+FIELD_PARSERS = {
+    "access_combined_wcookie": access_fields,
+    "db_audit": db_audit_fields,
+    "linux_secure": linux_secure_fields,
+}
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Token inverted index and time index sidecars for generated data files
+
+An index lives in a sidecar directory next to the data (access_30DAY.log
+-> access_30DAY.log.idx/) and holds:
+- offsets.bin   byte offset of every event (array of uint64)
+- times.bin     event time of every event, epoch seconds (array of uint32)
+- sparse.json   one entry per SPARSE_EVERY events: first event, byte offset,
+                min and max time; a time slice of a sorted file is found by
+                binary search and read by seeking
+- postings.bin  per token, the events containing it as varint-encoded
+                deltas of event numbers
+- tokens.tsv    every token in sorted order with the position and length of
+                its postings, one "token<TAB>position<TAB>length" line each
+- token_blocks.json  first token and byte offset of every TOKEN_BLOCK lines
+                of tokens.tsv, so a lookup reads one block of it
+- fields.json   per key field (status, productId, action, user, src_ip...),
+                each value and its event count; field values are also
+                posted as "field=value" tokens
+- meta.json     sourcetype, event count, time range and the data file's size
+                and mtime, so a stale index is detected
+
+Tokens follow Splunk's segmentation: lowercased major segments (split on
+whitespace, quotes, brackets and , ; = & ?) plus their minor pieces (split
+on / : . -). Indexes are built while generating (--build-index) or over
+existing uncompressed files.
+
+Building takes bounded memory at any file size: offsets and times are
+appended to their files batch by batch, and postings stay in memory only
+until SPILL_POSTINGS of them (or SPILL_TOKENS distinct tokens) pile up,
+then go to a sorted run file; save() merges the runs token by token into
+postings.bin. Readers memory-map offsets.bin and times.bin and find
+tokens through token_blocks.json.
+
+Usage:
+    python event_index.py build access_30DAY.log linux_s_30DAY.log
+    python event_index.py count access_30DAY.log status=404 productId=DB-SG-G01 \\
+        --earliest 2025-10-01T00:00:00 --latest 2025-10-02T00:00:00
+    python event_index.py extract linux_s_30DAY.log failed 208.65.153.253 --output slice.log
+"""
+
+import argparse
+import heapq
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from generate_course_data import SOURCETYPES
+from event_formats import FIELD_PARSERS, EventClock, epoch_seconds, from_epoch_seconds, sourcetype_for_path
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 2
+
+# Events per sparse time index entry
+SPARSE_EVERY = 1024
+
+# Postings (token occurrences) and distinct tokens held in memory before they are spilled to a run file
+SPILL_POSTINGS = 1 << 24
+SPILL_TOKENS = 1 << 20
+
+# Lines of tokens.tsv per token_blocks.json entry
+TOKEN_BLOCK = 256
+
+# Fields with value dictionaries, per sourcetype
+KEY_FIELDS = {
+    "access_combined_wcookie": ["status", "file", "action", "categoryId", "productId", "clientip"],
+    "linux_secure": ["action", "user", "src_ip"],
+    "db_audit": ["Type"],
+}
+
+MAJOR_BREAKERS = re.compile(r"[\s\"'\[\](){}<>,;=&?|]+")
+MINOR_BREAKERS = re.compile(r"[/:.\-]+")
+
+
+def tokenize(text):
+    """Set of index tokens in text: lowercased major segments and their minor pieces"""
+    tokens = set()
+    for segment in MAJOR_BREAKERS.split(text.lower()):
+        if segment:
+            tokens.add(segment)
+            if MINOR_BREAKERS.search(segment):
+                tokens.update(piece for piece in MINOR_BREAKERS.split(segment) if piece)
+    return tokens
+
+
+def index_dir(path):
+    return path + INDEX_SUFFIX
+
+
+def _encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, position):
+    """(value, position after it) of the varint at data[position]"""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def _write_run(path, postings, last_event):
+    """Write postings sorted by token as records of token, last event and postings, length-prefixed"""
+    with open(path, 'wb') as f:
+        for token in sorted(postings):
+            record = bytearray()
+            name = token.encode()
+            _encode_varint(len(name), record)
+            record += name
+            _encode_varint(last_event[token], record)
+            data = postings[token]
+            _encode_varint(len(data), record)
+            record += data
+            f.write(record)
+
+
+def _read_run(path):
+    """Yield the (token, last event, postings) records of a run file, in token order"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        position = 0
+        while position < len(data):
+            size, position = _read_varint(data, position)
+            token = data[position:position + size].decode()
+            last, position = _read_varint(data, position + size)
+            size, position = _read_varint(data, position)
+            yield token, last, data[position:position + size]
+            position += size
+
+
+def _map_array(path, typecode):
+    """Read-only memory-mapped view of an array file (an empty array for an empty file)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return array(typecode)
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+
+def _decode_postings(data):
+    """Event numbers from varint-encoded deltas"""
+    events = []
+    value = shift = 0
+    previous = -1
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        events.append(previous)
+        value = shift = 0
+    return events
+
+
+class IndexBuilder:
+    """Builds the sidecar index of one data file from batches of event lines, in file order"""
+
+    def __init__(self, path, sourcetype, header_bytes=0, spill_postings=SPILL_POSTINGS, spill_tokens=SPILL_TOKENS):
+        self.path = path
+        self.sourcetype = sourcetype
+        self.directory = index_dir(path)
+        self.newline_bytes = len(SOURCETYPES[sourcetype][2])
+        self.event_time = EventClock(sourcetype)
+        self.parse_fields = FIELD_PARSERS.get(sourcetype)
+        self.key_fields = KEY_FIELDS.get(sourcetype, [])
+        self.spill_postings = spill_postings
+        self.spill_tokens = spill_tokens
+        self.offset = header_bytes
+        self.events = 0
+        self.earliest = self.latest = self.last_time = None
+        self.sorted = True
+        # [first event, byte offset, min time, max time] per SPARSE_EVERY events
+        self.sparse = []
+        # Postings since the last spill (token -> varint deltas) and each token's last event
+        self.postings = {}
+        self.last_event = {}
+        self.posted = 0
+        self.runs = []
+        self.field_values = {name: {} for name in self.key_fields}
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self.offsets_file = open(os.path.join(self.directory, "offsets.bin"), 'wb')
+        self.times_file = open(os.path.join(self.directory, "times.bin"), 'wb')
+
+    def _post(self, token, event):
+        data = self.postings.get(token)
+        if data is None:
+            data = self.postings[token] = bytearray()
+            previous = -1
+        else:
+            previous = self.last_event[token]
+        delta = event - previous
+        if delta < 0x80:
+            data.append(delta)
+        else:
+            _encode_varint(delta, data)
+        self.last_event[token] = event
+
+    def add_batch(self, lines):
+        """Index a batch of event lines (without line terminators) following the previous batch"""
+        post = self._post
+        offsets = array('Q')
+        times = array('I')
+        sparse = self.sparse
+        posted = 0
+        for line in lines:
+            event = self.events + len(offsets)
+            event_time = self.event_time(line)
+            offsets.append(self.offset)
+            times.append(event_time)
+            if event % SPARSE_EVERY == 0:
+                sparse.append([event, self.offset, event_time, event_time])
+            else:
+                block = sparse[-1]
+                if event_time < block[2]:
+                    block[2] = event_time
+                elif event_time > block[3]:
+                    block[3] = event_time
+            self.offset += len(line) + self.newline_bytes
+            tokens = tokenize(line)
+            if self.parse_fields is not None:
+                fields = self.parse_fields(line)
+                for name in self.key_fields:
+                    value = fields.get(name)
+                    if value is not None:
+                        values = self.field_values[name]
+                        values[value] = values.get(value, 0) + 1
+                        tokens.add(f"{name.lower()}={value.lower()}")
+            for token in tokens:
+                post(token, event)
+            posted += len(tokens)
+        if not offsets:
+            return
+        offsets.tofile(self.offsets_file)
+        times.tofile(self.times_file)
+        self.events += len(offsets)
+        if self.sorted and ((self.last_time is not None and times[0] < self.last_time)
+                            or any(a > b for a, b in zip(times, times[1:]))):
+            self.sorted = False
+        self.last_time = times[-1]
+        low, high = min(times), max(times)
+        self.earliest = low if self.earliest is None else min(self.earliest, low)
+        self.latest = high if self.latest is None else max(self.latest, high)
+        self.posted += posted
+        if self.posted >= self.spill_postings or len(self.postings) >= self.spill_tokens:
+            self._spill()
+
+    def _spill(self):
+        """Move the postings held in memory to a sorted run file"""
+        path = os.path.join(self.directory, f"run{len(self.runs):05d}.tmp")
+        _write_run(path, self.postings, self.last_event)
+        self.runs.append(path)
+        self.postings = {}
+        self.last_event = {}
+        self.posted = 0
+
+    def _merge_postings(self):
+        """Merge the run files and in-memory postings into postings.bin and tokens.tsv; returns the token count"""
+        sources = [_read_run(path) for path in self.runs]
+        sources.append((token, self.last_event[token], self.postings[token]) for token in sorted(self.postings))
+        blocks = []
+        count = position = length = 0
+        current = last = None
+        with open(os.path.join(self.directory, "postings.bin"), 'wb') as postings, \
+                open(os.path.join(self.directory, "tokens.tsv"), 'wb') as tokens:
+
+            def finish_token():
+                nonlocal count
+                if count % TOKEN_BLOCK == 0:
+                    blocks.append([current, tokens.tell()])
+                tokens.write(f"{current}\t{position}\t{length}\n".encode())
+                count += 1
+
+            # A token's records come from the runs in event order, as heapq.merge is stable
+            for token, token_last, data in heapq.merge(*sources, key=lambda record: record[0]):
+                if token != current:
+                    if current is not None:
+                        finish_token()
+                        position += length
+                    current, length = token, 0
+                    postings.write(data)
+                    length += len(data)
+                else:
+                    # A run's first delta counts from -1; rebase it on the previous run's last event
+                    first, rest = _read_varint(data, 0)
+                    delta = bytearray()
+                    _encode_varint(first - 1 - last, delta)
+                    postings.write(delta)
+                    postings.write(data[rest:])
+                    length += len(delta) + len(data) - rest
+                last = token_last
+            if current is not None:
+                finish_token()
+        with open(os.path.join(self.directory, "token_blocks.json"), 'w') as f:
+            json.dump(blocks, f, separators=(",", ":"))
+        for path in self.runs:
+            os.remove(path)
+        self.runs = []
+        self.postings = {}
+        self.last_event = {}
+        return count
+
+    def save(self):
+        """Write the sidecar directory; the data file must be complete and closed"""
+        directory = self.directory
+        self.offsets_file.close()
+        self.times_file.close()
+        with open(os.path.join(directory, "sparse.json"), 'w') as f:
+            json.dump(self.sparse, f)
+        tokens = self._merge_postings()
+        with open(os.path.join(directory, "fields.json"), 'w') as f:
+            json.dump({name: dict(sorted(values.items(), key=lambda item: -item[1]))
+                       for name, values in self.field_values.items()}, f, indent=1)
+
+        stat = os.stat(self.path)
+        meta = {
+            "version": INDEX_VERSION,
+            "sourcetype": self.sourcetype,
+            "events": self.events,
+            "tokens": tokens,
+            "earliest": from_epoch_seconds(self.earliest).isoformat() if self.events else None,
+            "latest": from_epoch_seconds(self.latest).isoformat() if self.events else None,
+            "sorted": self.sorted,
+            "file_size": stat.st_size,
+            "file_mtime_ns": stat.st_mtime_ns,
+        }
+        # Written last, so an interrupted build leaves no index that looks complete
+        with open(os.path.join(directory, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=2)
+        return directory
+
+
+def build_index(path, sourcetype=None, batch_size=10000):
+    """Index an existing uncompressed data file; returns the sidecar directory"""
+    sourcetype = sourcetype or sourcetype_for_path(path)
+    if sourcetype is None:
+        raise ValueError(f"cannot tell the sourcetype of {path}; pass --sourcetype")
+    if path.endswith((".gz", ".zst")):
+        raise ValueError(f"{path}: indexes need uncompressed files (byte offsets must be seekable)")
+    header, newline = SOURCETYPES[sourcetype][1:]
+    builder = IndexBuilder(path, sourcetype)
+    with open(path, newline='', buffering=1024 * 1024) as f:
+        if header is not None:
+            builder.offset = len(f.readline())
+        batch = []
+        for line in f:
+            batch.append(line.rstrip("\r\n"))
+            if len(batch) >= batch_size:
+                builder.add_batch(batch)
+                batch = []
+        builder.add_batch(batch)
+    return builder.save()
+
+
+class EventIndex:
+    """Read side of a sidecar index"""
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = index_dir(path)
+        with open(os.path.join(self.directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        stat = os.stat(path)
+        if (self.meta.get("version") != INDEX_VERSION or stat.st_size != self.meta["file_size"]
+                or stat.st_mtime_ns != self.meta["file_mtime_ns"]):
+            raise ValueError(f"index of {path} is stale; rebuild it with: python event_index.py build {path}")
+        with open(os.path.join(self.directory, "token_blocks.json")) as f:
+            self.token_blocks = json.load(f)
+        self.block_tokens = [token for token, _ in self.token_blocks]
+        self.block_cache = (None, {})
+        with open(os.path.join(self.directory, "sparse.json")) as f:
+            self.sparse = json.load(f)
+        self.offsets = _map_array(os.path.join(self.directory, "offsets.bin"), 'Q')
+        self.times = _map_array(os.path.join(self.directory, "times.bin"), 'I')
+
+    def fields(self):
+        with open(os.path.join(self.directory, "fields.json")) as f:
+            return json.load(f)
+
+    def token_entry(self, token):
+        """(position, length) of token's postings in postings.bin, or None if no event has it"""
+        block = bisect_right(self.block_tokens, token) - 1
+        if block < 0:
+            return None
+        if self.block_cache[0] != block:
+            # Read and parse the one block of tokens.tsv that would hold token (the last one is kept)
+            start = self.token_blocks[block][1]
+            with open(os.path.join(self.directory, "tokens.tsv"), 'rb') as f:
+                f.seek(start)
+                if block + 1 < len(self.token_blocks):
+                    data = f.read(self.token_blocks[block + 1][1] - start)
+                else:
+                    data = f.read()
+            entries = {}
+            for line in data.decode().splitlines():
+                name, position, length = line.split("\t")
+                entries[name] = (int(position), int(length))
+            self.block_cache = (block, entries)
+        return self.block_cache[1].get(token)
+
+    def postings(self, token):
+        """Sorted event numbers containing token"""
+        entry = self.token_entry(token)
+        if entry is None:
+            return []
+        with open(os.path.join(self.directory, "postings.bin"), 'rb') as f:
+            f.seek(entry[0])
+            return _decode_postings(f.read(entry[1]))
+
+    def _term_events(self, term):
+        """Events matching one search term: a token, a field=value pair, or a multi-token phrase"""
+        term = term.lower()
+        if self.token_entry(term) is not None:
+            return set(self.postings(term))
+        name, equals, value = term.partition("=")
+        if equals and self.token_entry(f"{name}={value}") is not None:
+            return set(self.postings(f"{name}={value}"))
+        pieces = tokenize(term)
+        if not pieces:
+            return set()
+        # Candidates hold every piece; confirm the term itself against the raw event
+        candidates = None
+        for piece in pieces:
+            events = set(self.postings(piece))
+            candidates = events if candidates is None else candidates & events
+            if not candidates:
+                return set()
+        return {event for event in candidates if term in self.read_event(event).lower()}
+
+    def time_range(self, earliest=None, latest=None):
+        """(first, end) event numbers covering [earliest, latest) in a sorted file, via the sparse index"""
+        low = 0 if earliest is None else epoch_seconds(earliest)
+        high = None if latest is None else epoch_seconds(latest)
+        maxes = [entry[3] for entry in self.sparse]
+        mins = [entry[2] for entry in self.sparse]
+        first_block = bisect_left(maxes, low)
+        end_block = len(self.sparse) if high is None else bisect_left(mins, high)
+        first = self.sparse[first_block][0] if first_block < len(self.sparse) else len(self.times)
+        end = self.sparse[end_block][0] if end_block < len(self.sparse) else len(self.times)
+        # Narrow within the boundary blocks
+        first += bisect_left(self.times[first:min(first + SPARSE_EVERY, end)], low)
+        if high is not None and end > first:
+            block_start = max(first, end - SPARSE_EVERY)
+            end = block_start + bisect_left(self.times[block_start:end], high)
+        return first, end
+
+    def search(self, terms, earliest=None, latest=None):
+        """Sorted event numbers matching every term within [earliest, latest)"""
+        if self.meta["sorted"] and not terms:
+            first, end = self.time_range(earliest, latest)
+            return list(range(first, end))
+        low = 0 if earliest is None else epoch_seconds(earliest)
+        high = float("inf") if latest is None else epoch_seconds(latest)
+        if terms:
+            matches = None
+            for term in sorted(terms, key=len, reverse=True):
+                events = self._term_events(term)
+                matches = events if matches is None else matches & events
+                if not matches:
+                    return []
+        else:
+            matches = range(len(self.times))
+        times = self.times
+        return sorted(event for event in matches if low <= times[event] < high)
+
+    def read_event(self, event, f=None):
+        """The raw line of event number event"""
+        start = self.offsets[event]
+        end = self.offsets[event + 1] if event + 1 < len(self.offsets) else os.path.getsize(self.path)
+        if f is None:
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                return f.read(end - start).decode().rstrip("\r\n")
+        f.seek(start)
+        return f.read(end - start).decode().rstrip("\r\n")
+
+    def extract(self, events, out):
+        """Copy the given events' lines to the binary file object out by seeking; returns bytes written"""
+        written = 0
+        with open(self.path, 'rb') as f:
+            for event in events:
+                start = self.offsets[event]
+                end = self.offsets[event + 1] if event + 1 < len(self.offsets) else None
+                f.seek(start)
+                data = f.read(end - start) if end is not None else f.read()
+                out.write(data)
+                written += len(data)
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query sidecar indexes of course data files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Index existing uncompressed data files")
+    build.add_argument("files", nargs="+")
+    build.add_argument("--sourcetype", choices=sorted(SOURCETYPES), default=None)
+    for name, help_text in [("count", "Count events matching all terms in a time range"),
+                            ("extract", "Write events matching all terms in a time range")]:
+        query = subparsers.add_parser(name, help=help_text)
+        query.add_argument("file")
+        query.add_argument("terms", nargs="*", help="Tokens, field=value pairs or phrases; all must match")
+        query.add_argument("--earliest", type=datetime.fromisoformat, default=None)
+        query.add_argument("--latest", type=datetime.fromisoformat, default=None)
+        if name == "extract":
+            query.add_argument("--output", default=None, help="Output file (default: stdout)")
+    fields = subparsers.add_parser("fields", help="Show the value dictionaries of an indexed file")
+    fields.add_argument("file")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "build":
+            for path in args.files:
+                directory = build_index(path, args.sourcetype)
+                with open(os.path.join(directory, "meta.json")) as f:
+                    meta = json.load(f)
+                print(f"Indexed {meta['events']} events, {meta['tokens']} tokens of {path} into {directory}")
+            return
+        index = EventIndex(args.file)
+        if args.command == "fields":
+            for name, values in index.fields().items():
+                print(f"{name}: " + ", ".join(f"{value} ({count})" for value, count in list(values.items())[:20]))
+            return
+        events = index.search(args.terms, args.earliest, args.latest)
+        if args.command == "count":
+            print(len(events))
+        elif args.output:
+            with open(args.output, 'wb') as out:
+                index.extract(events, out)
+            print(f"Wrote {len(events)} events to {args.output}")
+        else:
+            index.extract(events, sys.stdout.buffer)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,16 +11,46 @@ This script generates:
 - Product lookup data (CSV)
 - Customer category lookups (CSV)
 
-Usage: python generate_course_data.py [--days N] [--output-dir DIR]
+Usage: python generate_course_data.py [--days N] [--output-dir DIR] [--stream]
+
+Library use: each sourcetype also has an iter_* method that yields events lazily,
+so callers can consume data without a full list being built in memory:
+
+    generator = DataGenerator(days=30)
+    for line in generator.iter_web_access_logs(1000):
+        ...
 """
 
 import random
 import json
-import csv
 import argparse
 from datetime import datetime, timedelta
-import sys
 import os
+import hashlib
+import heapq
+import math
+import time
+import shutil
+import zlib
+import gzip
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from weighted_sampler import zipf_weights
+from entities import EntitySpace
+from sourcetype_specs import CompiledSourcetype, MONTHS, builtin_spec_paths, load_spec, make_time_key
+
+try:
+    import numpy as np
+except ImportError:  # the numpy engine is optional
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # zstd output is optional
+    zstandard = None
 
 # Product IDs from the static products.csv file
 PRODUCT_IDS = [
@@ -30,322 +60,783 @@ PRODUCT_IDS = [
     "WSC-MG-G10"
 ]
 
+
+def code_digest(directory):
+    """Content hash of every module in directory, like module_digest in validate_course.py"""
+    digest = hashlib.blake2b(digest_size=8)
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), 'rb') as f:
+                digest.update(name.encode() + b"\0" + f.read() + b"\0")
+    return digest.hexdigest()
+
+
+# Hash of the code that shapes generated events (every module here, so none is
+# left out), so cached and incrementally extended datasets (dataset_manifest.py)
+# are only reused by the same generator
+GENERATOR_VERSION = code_digest(os.path.dirname(os.path.abspath(__file__)))
+
+# Built-in sourcetype definitions (see sourcetypes/*.json and sourcetype_specs.py)
+SPECS = {spec["name"]: spec for spec in map(load_spec, builtin_spec_paths())}
+
+# Output file, CSV header and line terminator for each sourcetype
+# (csv.writer terminates rows with \r\n; db_audit keeps that for compatibility)
+SOURCETYPES = {name: (spec["file"], spec.get("header"), spec.get("newline", "\n")) for name, spec in SPECS.items()}
+
+# Event volumes matching the original course data
+DEFAULT_VOLUMES = {name: spec["volume"] for name, spec in SPECS.items()}
+
+# Number of events buffered before each write in streaming mode
+DEFAULT_BATCH_SIZE = 10000
+
+# File suffix per --compress format, and uncompressed bytes per compressed block
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSION_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Number of events drawn per array batch by the numpy engine
+NUMPY_BATCH_SIZE = 100000
+
+
+def _access_time_key(line):
+    # 1.2.3.4 - - [dd/Mon/YYYY:HH:MM:SS] ...
+    start = line.index("[") + 1
+    return line[start + 7:start + 11], MONTHS[line[start + 3:start + 6]], line[start:start + 2], line[start + 12:start + 20]
+
+
+def _db_audit_time_key(line):
+    # dd/Mon/YYYY HH:MM:SS,...
+    return line[7:11], MONTHS[line[3:6]], line[0:2], line[12:20]
+
+
+def _linux_time_key(line):
+    # Www Mon dd YYYY HH:MM:SS host ...
+    return line[11:15], MONTHS[line[4:7]], line[8:10], line[16:24]
+
+
+# Sort key giving the event time of a formatted line, per sourcetype
+TIME_KEYS = {
+    "access_combined_wcookie": _access_time_key,
+    "db_audit": _db_audit_time_key,
+    "linux_secure": _linux_time_key,
+}
+
+
+def register_spec(path):
+    """Load a sourcetype spec file and add it to SPECS, SOURCETYPES, DEFAULT_VOLUMES and TIME_KEYS
+
+    Returns the sourcetype name. Spec-defined sourcetypes without a
+    hand-written time key get one parsed from their timestamp format.
+    """
+    spec = load_spec(path)
+    name = spec["name"]
+    SPECS[name] = spec
+    SOURCETYPES[name] = (spec["file"], spec.get("header"), spec.get("newline", "\n"))
+    DEFAULT_VOLUMES[name] = spec["volume"]
+    TIME_KEYS.setdefault(name, make_time_key(spec["timestamp"]))
+    return name
+
+
+def compress_block(data, compression):
+    """Compress bytes as one self-contained gzip member or zstd frame
+
+    Concatenated members/frames form a valid stream, so blocks can be
+    compressed independently and in parallel. Returns data unchanged when
+    compression is None.
+    """
+    if compression == "gzip":
+        # wbits=31 writes a gzip header with mtime 0, so output is reproducible
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def open_event_file(path):
+    """Open a generated file for reading as text, decompressing .gz/.zst transparently"""
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', newline='')
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"reading {path} requires the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                            closefd=True)
+        return io.TextIOWrapper(reader, newline='')
+    return open(path, newline='', buffering=1024 * 1024)
+
+
+def derive_seed(master_seed, *parts):
+    """Derive a stable 64-bit seed from a master seed and a shard identifier"""
+    key = ":".join(str(part) for part in (master_seed,) + parts)
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+
+
+def split_count(count, shards):
+    """Split count into shards nearly equal parts (larger parts first)"""
+    return [count // shards + (1 if i < count % shards else 0) for i in range(shards)]
+
+
+def _generate_shard(task):
+    """Process pool entry point: write one shard of one sourcetype to path"""
+    generator_args, sourcetype, shard, count, max_bytes, path = task
+    generator = DataGenerator(**generator_args)
+    # Entity pools come from the master seed, the event stream from the shard seed
+    generator.rng = random.Random(derive_seed(generator.seed, sourcetype, shard))
+    filename, header, newline = SOURCETYPES[sourcetype]
+    # Time-ordered parts are merged line by line, so only compress the merged file
+    compression = None if generator.time_ordered else generator.compression
+    started = time.perf_counter()
+    with EventWriter(path, newline=newline, batch_size=generator.batch_size, max_bytes=max_bytes,
+                     compression=compression, compress_workers=generator.compress_workers,
+                     observer=generator.observer(sourcetype), metrics=generator.metrics,
+                     label=sourcetype) as writer:
+        writer.write_many(generator.iter_events(sourcetype, count))
+    return writer.count, writer.bytes, time.perf_counter() - started, generator.answer_keys, generator.metrics
+
+
+def scaled_volumes(days, scale=None, events_per_day=None):
+    """Event counts per sourcetype, keeping the ratios of DEFAULT_VOLUMES
+
+    scale multiplies the default volumes; events_per_day sets the total across
+    all sourcetypes per day of data. With neither, the defaults are returned.
+    """
+    if events_per_day is not None:
+        total = sum(DEFAULT_VOLUMES.values())
+        return {sourcetype: round(events_per_day * days * count / total)
+                for sourcetype, count in DEFAULT_VOLUMES.items()}
+    if scale is not None:
+        return {sourcetype: round(count * scale) for sourcetype, count in DEFAULT_VOLUMES.items()}
+    return dict(DEFAULT_VOLUMES)
+
+
+def parse_partition_fields(text):
+    """argparse type for --partition: a comma-separated list of host and day"""
+    from partitioned_output import parse_partition
+    try:
+        return parse_partition(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_size(text):
+    """Parse a byte size such as 500000, 750MB or 50G (binary units)"""
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    text = text.strip().upper().removesuffix("B").removesuffix("I")
+    number = text.rstrip("KMGT")
+    try:
+        return int(float(number) * units[text[len(number):]])
+    except (ValueError, KeyError):
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+
+
+class EventWriter:
+    """Buffered writer that writes events to a file in fixed-size batches
+
+    Only one batch of events is held in memory at a time, so memory use stays
+    bounded no matter how many events are written. With max_bytes, writing
+    stops once that many bytes of events have been written (events are ASCII,
+    so characters and bytes are the same).
+
+    With compression ("gzip" or "zstd") the output is cut into blocks of
+    COMPRESSION_BLOCK_SIZE that are compressed independently in a thread pool
+    and written in order, giving a multi-member gzip (or multi-frame zstd)
+    stream. zlib and zstandard release the GIL, so blocks compress in parallel.
+
+    observer, if given, is called with each batch of events as it is written
+    (e.g. to aggregate answer keys in the same pass).
+
+    metrics, if given (a run_metrics.RunMetrics), gets each batch's counts and
+    generate/observe/format/write phase times under label.
+    """
+
+    def __init__(self, path, header=None, newline="\n", batch_size=DEFAULT_BATCH_SIZE, max_bytes=None,
+                 compression=None, compress_workers=None, append=False, observer=None, metrics=None,
+                 label=None):
+        self.path = path
+        self.observer = observer
+        self.metrics = metrics
+        self.label = label
+        self.newline = newline
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.count = 0
+        self.bytes = 0
+        if compression is None:
+            self.file = open(path, 'a' if append else 'w', newline='', buffering=1024 * 1024)
+        else:
+            self.file = open(path, 'ab' if append else 'wb')
+            self.workers = compress_workers or os.cpu_count() or 1
+            self.pool = ThreadPoolExecutor(max_workers=self.workers)
+            self.pending = deque()
+            self.block = []
+            self.block_size = 0
+        if header is not None:
+            self.write_raw(header + newline)
+
+    def write_raw(self, text):
+        """Write already formatted text (not counted as events)"""
+        if self.compression is None:
+            self.file.write(text)
+            return
+        self.block.append(text)
+        self.block_size += len(text)
+        if self.block_size >= COMPRESSION_BLOCK_SIZE:
+            self._submit_block()
+
+    def _submit_block(self):
+        data = "".join(self.block).encode()
+        self.block = []
+        self.block_size = 0
+        self.pending.append(self.pool.submit(compress_block, data, self.compression))
+        # Bound the blocks in flight so memory stays proportional to the pool size
+        while len(self.pending) > 2 * self.workers:
+            self.file.write(self.pending.popleft().result())
+
+    def write_many(self, events):
+        """Write every event from an iterable; returns the number written"""
+        events = iter(events)
+        written = 0
+        # A few clock reads per batch cost nothing next to the batch itself
+        clock = time.perf_counter
+        while self.max_bytes is None or self.bytes < self.max_bytes:
+            started = clock()
+            batch = list(islice(events, self.batch_size))
+            if not batch:
+                break
+            if self.max_bytes is not None:
+                batch = self._fit(batch)
+            generated = clock()
+            if self.observer is not None:
+                self.observer(batch)
+            observed = clock()
+            chunk = self.newline.join(batch) + self.newline
+            formatted = clock()
+            self.write_raw(chunk)
+            self.bytes += len(chunk)
+            written += len(batch)
+            if self.metrics is not None:
+                self.metrics.record(self.label, len(batch), len(chunk), generated - started, observed - generated,
+                                    formatted - observed, clock() - formatted)
+        self.count += written
+        return written
+
+    def _fit(self, batch):
+        """Trim batch to the events needed to reach max_bytes"""
+        remaining = self.max_bytes - self.bytes
+        size = 0
+        for i, event in enumerate(batch):
+            size += len(event) + len(self.newline)
+            if size >= remaining:
+                return batch[:i + 1]
+        return batch
+
+    def close(self):
+        started = time.perf_counter()
+        if self.compression is not None:
+            if self.block:
+                self._submit_block()
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+            self.pool.shutdown()
+        self.file.close()
+        if self.metrics is not None:
+            # Flushing the last buffered and compressed blocks
+            self.metrics.add_time(self.label, "write", time.perf_counter() - started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 class DataGenerator:
-    def __init__(self, days=30, output_dir="."):
+    def __init__(self, days=30, output_dir=".", stream=False, batch_size=DEFAULT_BATCH_SIZE,
+                 seed=None, end_date=None, engine="python", time_ordered=False,
+                 compression=None, compress_workers=None, start_date=None, spec_files=None,
+                 product_skew=0.0, sessions=None, client_ips=None, users=None, entity_skew=0.0,
+                 answer_keys=False, index=False, output_format="text", metrics=None, hosts=None,
+                 host_skew=0.0, partition=(), partition_writers=None, max_open_files=None):
+        # Registered here as well as in main() so worker processes see extra sourcetypes
+        self.spec_files = list(spec_files or [])
+        for path in self.spec_files:
+            register_spec(path)
+        if engine == "numpy" and np is None:
+            print("NumPy is not installed; falling back to the python engine")
+            engine = "python"
+        if compression == "zstd" and zstandard is None:
+            print("zstandard is not installed; falling back to gzip compression")
+            compression = "gzip"
+        self.compression = compression
+        self.compress_workers = compress_workers
+        self.engine = engine
+        self.time_ordered = time_ordered
         self.days = days
         self.output_dir = output_dir
-        self.start_date = datetime.now() - timedelta(days=days)
-        self.end_date = datetime.now()
+        self.stream = stream
+        self.batch_size = batch_size
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.stats = {}
+        if answer_keys:
+            from answer_keys import AnswerKeys
+            self.answer_keys = AnswerKeys()
+        else:
+            self.answer_keys = None
+        self.index = index
+        self.output_format = output_format
+        # run_metrics.RunMetrics collecting counters and phase timings, if any
+        self.metrics = metrics
+        self.end_date = end_date or datetime.now()
+        self.start_date = start_date or self.end_date - timedelta(days=days)
+        # Events fall on whole-second offsets in [0, span_seconds] from start_date
+        self.span_seconds = int((self.end_date - self.start_date).total_seconds())
         
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
         
         # Data tracking for consistency
         self.product_ids = PRODUCT_IDS
-        self.session_ids = [f"SD{random.randint(1,9)}SL{random.randint(1,99)}FF{random.randint(1,99)}ADFF{random.randint(1000,9999)}" 
+        # Zipfian product popularity in PRODUCT_IDS order; 0 keeps products uniform
+        self.product_skew = product_skew
+        self.product_weights = zipf_weights(len(self.product_ids), product_skew)
+        self.session_ids = [f"SD{self.rng.randint(1,9)}SL{self.rng.randint(1,99)}FF{self.rng.randint(1,99)}ADFF{self.rng.randint(1000,9999)}" 
                            for _ in range(1000)]
+
+        # Optional high-cardinality entity spaces replacing the small built-in pools
+        self.entity_counts = {"session": sessions, "client_ip": client_ips, "user": users}
+        self.entity_skew = entity_skew
+        self.entities = {}
+        for kind, cardinality in self.entity_counts.items():
+            if cardinality:
+                # Keyed by the master seed so every shard renders an entity the same way
+                key = derive_seed(seed, "entity", kind) if seed is not None else self.rng.getrandbits(64)
+                self.entities[kind] = EntitySpace(kind, cardinality, entity_skew, key)
+                if kind == "user":
+                    self.entities["user_id"] = EntitySpace(kind, cardinality, entity_skew, key, as_id=True)
+        # Synthetic hosts (www1..wwwN) for linux_secure events and host partitions
+        self.hosts = hosts
+        self.host_skew = host_skew
+        if hosts:
+            key = derive_seed(seed, "entity", "host") if seed is not None else self.rng.getrandbits(64)
+            self.entities["host"] = EntitySpace("host", hosts, host_skew, key)
+        # Partition fields ("host", "day") of a host=<h>/date=<d>/ output tree; empty writes one file each
+        self.partition = tuple(partition)
+        self.partition_writers = partition_writers
+        self.max_open_files = max_open_files
         
-    def generate_web_access_logs(self, count=50000):
-        """Generate web application access logs in Apache combined log format"""
-        
-        # IP addresses based on original data
-        client_ips = [
-            "92.46.53.223", "212.58.253.71", "91.214.92.22", "193.33.170.23",
-            "87.194.216.51", "108.65.113.83", "109.103.32.135", "118.138.38.229",
-            "116.159.208.78", "95.134.237.97", "192.168.1.100", "10.0.0.50"
-        ]
-        
-        # Referrers with realistic distribution
-        referrers = [
-            "http://www.buttercupgames.com", "http://www.google.com", "http://www.bing.com",
-            "http://www.yahoo.com", "http://www.facebook.com", "-"
-        ]
-        
-        # User agents from original data
-        user_agents = [
-            "Mozilla/5.0 (Windows; U; Windows NT 5.1; en-US; rv:1.9.2.28) Gecko/20120306 YFF3 Firefox/3.6.28 ( .NET CLR 3.5.30729; .NET4.0C)",
-            "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/536.5 (KHTML, like Gecko) Chrome/19.0.1084.52 Safari/536.5",
-            "Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1; .NET CLR 2.0.50727; .NET CLR 3.0.4506.2152; .NET CLR 3.5.30729; InfoPath.1; .NET4.0C; .NET4.0E; MS-RTC LM 8)",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        ]
-        
-        # URL patterns from original data
-        url_patterns = [
-            {"path": "/category.screen", "params": ["categoryId=STRATEGY", "categoryId=SHOOTER", "categoryId=ARCADE", "categoryId=TEE", "categoryId=SPORTS", "categoryId=SIMULATION", "categoryId=ACCESSORIES"]},
-            {"path": "/product.screen", "params": [f"productId={pid}" for pid in self.product_ids]},
-            {"path": "/cart.do", "params": ["action=addtocart", "action=remove", "action=view", "action=purchase"]},
-            {"path": "/success.do", "params": ["action=purchase"]},
-            {"path": "/cart/success.do", "params": []},
-            {"path": "/oldlink", "params": []},
-            {"path": "/stuff/logo.ico", "params": []}
-        ]
-        
-        logs = []
-        
-        for i in range(count):
-            timestamp = self.start_date + timedelta(
-                seconds=random.randint(0, self.days * 24 * 3600)
-            )
-            
-            ip = random.choice(client_ips)
-            session_id = random.choice(self.session_ids)
-            user_agent = random.choice(user_agents)
-            referrer = random.choice(referrers)
-            
-            # Select URL pattern
-            url_pattern = random.choice(url_patterns)
-            path = url_pattern["path"]
-            
-            # Add parameters
-            params = []
-            if url_pattern["params"]:
-                if path in ["/category.screen", "/product.screen"]:
-                    params.append(random.choice(url_pattern["params"]))
-                elif path == "/cart.do":
-                    action = random.choice(["addtocart", "remove", "view"])
-                    params.append(f"action={action}")
-                    if action in ["addtocart", "remove"]:
-                        params.append(f"productId={random.choice(self.product_ids)}")
-                elif path == "/success.do":
-                    params.append("action=purchase")
-                    params.append(f"categoryId={random.choice(['STRATEGY', 'SHOOTER', 'ARCADE', 'TEE', 'SPORTS', 'SIMULATION', 'ACCESSORIES'])}")
-                    params.append(f"productId={random.choice(self.product_ids)}")
-                
-            params.append(f"JSESSIONID={session_id}")
-            url = path + ("?" + "&".join(params) if params else "")
-            
-            # HTTP method and version
-            method = "POST" if path in ["/cart.do", "/success.do", "/category.screen"] else "GET"
-            http_version = "HTTP 1.1"
-            
-            # Status code (mostly 200, some 404)
-            if "/stuff/" in path:
-                status = 404
-                bytes_sent = random.randint(1000, 2000)
+    def iter_events(self, sourcetype, count):
+        """Yield events for the named sourcetype (see SOURCETYPES)"""
+        iterators = {
+            "access_combined_wcookie": self.iter_web_access_logs,
+            "db_audit": self.iter_db_audit_logs,
+            "linux_secure": self.iter_linux_security_logs,
+        }
+        if sourcetype in iterators:
+            return iterators[sourcetype](count)
+        return self.iter_spec_events(sourcetype, count)
+
+    def compile_spec(self, sourcetype):
+        """Compile the spec for sourcetype against this generator's RNG and entity pools"""
+        return CompiledSourcetype(SPECS[sourcetype], self.rng,
+                                  pools={"session_ids": self.session_ids, "product_ids": self.product_ids},
+                                  pool_weights={"product_ids": self.product_weights} if self.product_skew else None,
+                                  entities=self.entities)
+
+    def iter_spec_events(self, sourcetype, count):
+        """Yield count events rendered from the sourcetype's spec"""
+        # Compiled per call: shards and samplers swap in their own self.rng after construction
+        compiled = self.compile_spec(sourcetype)
+        return compiled.iter_events(self._offsets(count), self.start_date, self.span_seconds // 86400 + 1)
+
+    def spec_digest(self):
+        """Content hash of the loaded sourcetype specs (built-in and --spec), which shape every event"""
+        specs = json.dumps(SPECS, sort_keys=True, default=str).encode()
+        return hashlib.sha256(specs).hexdigest()[:16]
+
+    def output_path(self, sourcetype):
+        """Path of the output file for sourcetype, including any compression suffix"""
+        filename = SOURCETYPES[sourcetype][0] + COMPRESSION_SUFFIXES.get(self.compression, "")
+        return os.path.join(self.output_dir, filename)
+
+    def generate_sourcetype(self, sourcetype, count, max_bytes=None):
+        """Write count events for sourcetype; returns the event list, or the count in streaming mode
+
+        Writing stops early once max_bytes of events have been written.
+        Throughput is recorded in self.stats[sourcetype].
+        """
+        filename, header, newline = SOURCETYPES[sourcetype]
+        started = time.perf_counter()
+        events = self.iter_events(sourcetype, count)
+        if not self.stream:
+            events = list(events)
+            if self.metrics is not None:
+                self.metrics.add_time(sourcetype, "generate", time.perf_counter() - started)
+        sinks = self._sidecar_sinks(sourcetype)
+        if self.partition:
+            writer = self._partitioned_writer(sourcetype, max_bytes)
+        else:
+            writer = EventWriter(self.output_path(sourcetype), header=header, newline=newline,
+                                 batch_size=self.batch_size, max_bytes=max_bytes,
+                                 compression=self.compression, compress_workers=self.compress_workers,
+                                 observer=self.observer(sourcetype, [add_batch for add_batch, _ in sinks]),
+                                 metrics=self.metrics, label=sourcetype)
+        with writer:
+            writer.write_many(events)
+        for _, finish in sinks:
+            finish()
+        self._record_stats(sourcetype, writer.count, writer.bytes, time.perf_counter() - started)
+        if self.partition:
+            self.stats[sourcetype].update(partitions=writer.partitions, file_opens=writer.opens)
+        return writer.count if self.stream else events[:writer.count]
+
+    def _partitioned_writer(self, sourcetype, max_bytes=None):
+        """PartitionedWriter spreading sourcetype's events over the self.partition directory tree"""
+        from partitioned_output import PartitionedWriter, partitioner, DEFAULT_MAX_OPEN, DEFAULT_WRITERS
+        filename, header, newline = SOURCETYPES[sourcetype]
+        # Hosts of events without a host field get their own stream, leaving the event stream unchanged
+        host_seed = derive_seed(self.seed, "host", sourcetype) if self.seed is not None else None
+        key = partitioner(self.partition, sourcetype, TIME_KEYS[sourcetype], self.entities.get("host"),
+                          random.Random(host_seed).random)
+        return PartitionedWriter(self.output_dir, os.path.basename(self.output_path(sourcetype)), key,
+                                 header=header, newline=newline, batch_size=self.batch_size, max_bytes=max_bytes,
+                                 compression=self.compression, writers=self.partition_writers or DEFAULT_WRITERS,
+                                 max_open=self.max_open_files or DEFAULT_MAX_OPEN,
+                                 observer=self.observer(sourcetype), metrics=self.metrics, label=sourcetype)
+
+    def output_location(self, sourcetype):
+        """Where sourcetype's events were written, for messages: its file or a pattern of partition files"""
+        if not self.partition:
+            return self.output_path(sourcetype)
+        levels = [{"host": "host=*", "day": "date=*"}[field] for field in self.partition]
+        return os.path.join(self.output_dir, *levels, os.path.basename(self.output_path(sourcetype)))
+
+    def observer(self, sourcetype, extra=()):
+        """Batch observer feeding the answer keys and any extra batch callables, or None when there are none"""
+        observers = list(extra)
+        if self.answer_keys is not None:
+            observers.insert(0, self.answer_keys.observer(sourcetype))
+        if len(observers) < 2:
+            return observers[0] if observers else None
+
+        def observe(batch):
+            for observer in observers:
+                observer(batch)
+        return observe
+
+    def _sidecar_sinks(self, sourcetype):
+        """(add_batch, finish) pairs writing the index and/or column files while sourcetype is generated"""
+        filename, header, newline = SOURCETYPES[sourcetype]
+        sinks = []
+        if self.index:
+            from event_index import IndexBuilder
+            indexer = IndexBuilder(self.output_path(sourcetype), sourcetype,
+                                   0 if header is None else len(header) + len(newline))
+            sinks.append((indexer.add_batch, indexer.save))
+        if self.output_format == "columnar":
+            from columnar_export import ColumnarWriter, columns_dir
+            columns = ColumnarWriter(columns_dir(self.output_path(sourcetype)), sourcetype)
+            sinks.append((columns.add_batch, columns.close))
+        return sinks
+
+    def write_sidecars(self, sourcetypes):
+        """Index and/or export already written output files (sharded, appended or cached data)"""
+        for sourcetype in sourcetypes:
+            path = self.output_path(sourcetype)
+            if self.index:
+                from event_index import build_index
+                print(f"Indexed {path} into {build_index(path, sourcetype)}")
+            if self.output_format == "columnar":
+                from columnar_export import export_file
+                print(f"Exported {path} to {export_file(path, sourcetype)}")
+
+    def _record_stats(self, sourcetype, events, size, seconds):
+        self.stats[sourcetype] = {"events": events, "bytes": size, "seconds": seconds}
+
+    def calibrate(self, sample_size=1000):
+        """Estimate the average bytes per event (including line terminator) per sourcetype
+
+        The sample is drawn from a separate RNG so the main event stream is
+        not disturbed.
+        """
+        sampler = DataGenerator(**self.generator_args())
+        sampler.time_ordered = False
+        sampler.rng = random.Random(derive_seed(self.seed, "calibration"))
+        averages = {}
+        for sourcetype, (filename, header, newline) in SOURCETYPES.items():
+            size = sum(len(event) + len(newline) for event in sampler.iter_events(sourcetype, sample_size))
+            averages[sourcetype] = size / sample_size
+        return averages
+
+    def plan_target_bytes(self, target_bytes, sample_size=1000):
+        """Event counts and byte budgets per sourcetype that add up to target_bytes
+
+        Counts keep the ratios of DEFAULT_VOLUMES; each sourcetype's share of
+        the target is its count times its calibrated bytes per event.
+        """
+        averages = self.calibrate(sample_size)
+        bytes_per_unit = sum(DEFAULT_VOLUMES[st] * averages[st] for st in SOURCETYPES)
+        volumes, budgets = {}, {}
+        for sourcetype in SOURCETYPES:
+            budgets[sourcetype] = int(target_bytes * DEFAULT_VOLUMES[sourcetype] * averages[sourcetype]
+                                      / bytes_per_unit)
+            # Sorted output needs the exact count, or the cut-off would drop the latest events
+            margin = 1.0 if self.time_ordered else 1.02
+            volumes[sourcetype] = math.ceil(budgets[sourcetype] / averages[sourcetype] * margin)
+        return volumes, budgets
+
+    def _offsets(self, count):
+        """Yield count event offsets in seconds from start_date
+
+        Offsets are uniform over the time range; with time_ordered they are
+        produced as ascending order statistics, one at a time, so events come
+        out in time order without ever sorting them.
+        """
+        span = self.span_seconds
+        rng = self.rng
+        if not self.time_ordered:
+            for _ in range(count):
+                yield rng.randint(0, span)
+            return
+        # The smallest of i uniforms on (x, 1) is 1 - (1 - x) * U ** (1 / i)
+        x = 0.0
+        for i in range(count, 0, -1):
+            x = 1.0 - (1.0 - x) * rng.random() ** (1.0 / i)
+            yield min(int(x * (span + 1)), span)
+
+    def _offset_batches(self, rng, count, batch_size):
+        """Yield numpy arrays of event offsets, batch_size at a time (numpy engine)
+
+        With time_ordered, each batch ends at the batch_size-th order statistic
+        of the remaining draws (a Beta variate) and only the values in between
+        are sorted, so memory stays bounded by the batch size.
+        """
+        span = self.span_seconds
+        x = 0.0
+        remaining = count
+        while remaining > 0:
+            n = min(remaining, batch_size)
+            if not self.time_ordered:
+                yield rng.integers(0, span + 1, n)
             else:
-                status = 200 if random.random() < 0.95 else random.choice([403, 404, 500])
-                bytes_sent = random.randint(200, 4000) if status == 200 else random.randint(0, 1000)
-            
-            # Response time (last number in original format)
-            response_time = random.randint(50, 1000)
-            
-            # Format: IP - - [timestamp] "METHOD /path HTTP/1.1" status bytes "referrer" "user_agent" response_time
-            log_line = (f'{ip} - - [{timestamp.strftime("%d/%b/%Y:%H:%M:%S")}] '
-                       f'"{method} {url} {http_version}" {status} {bytes_sent} '
-                       f'"{referrer}" "{user_agent}" {response_time}')
-            
-            logs.append(log_line)
-        
-        # Write to file
-        output_file = os.path.join(self.output_dir, "access_30DAY.log")
-        with open(output_file, 'w') as f:
-            for log in logs:
-                f.write(f"{log}\n")
-        
-        print(f"Generated {len(logs)} web access logs in {output_file}")
-        return logs
-    
-    def generate_db_audit_logs(self, count=10000):
+                end = x + (1.0 - x) * rng.beta(n, remaining - n + 1)
+                values = np.empty(n)
+                values[:-1] = np.sort(rng.uniform(x, end, n - 1))
+                values[-1] = end
+                x = end
+                yield np.minimum((values * (span + 1)).astype(np.int64), span)
+            remaining -= n
+
+    def generator_args(self):
+        """Constructor arguments that reproduce this generator in a worker process"""
+        if self.metrics is not None:
+            from run_metrics import RunMetrics
+        return {
+            "days": self.days,
+            "start_date": self.start_date,
+            "output_dir": self.output_dir,
+            "stream": True,
+            "batch_size": self.batch_size,
+            "seed": self.seed,
+            "end_date": self.end_date,
+            "engine": self.engine,
+            "time_ordered": self.time_ordered,
+            "compression": self.compression,
+            "compress_workers": self.compress_workers,
+            "spec_files": self.spec_files,
+            "product_skew": self.product_skew,
+            "sessions": self.entity_counts["session"],
+            "client_ips": self.entity_counts["client_ip"],
+            "users": self.entity_counts["user"],
+            "entity_skew": self.entity_skew,
+            "hosts": self.hosts,
+            "host_skew": self.host_skew,
+            "answer_keys": self.answer_keys is not None,
+            # Shards are indexed and exported after they are concatenated
+            "index": False,
+            "output_format": "text",
+            # Workers return their metrics with the shard results
+            "metrics": RunMetrics() if self.metrics is not None else None,
+        }
+
+    def generate_sharded(self, volumes, workers, byte_budgets=None):
+        """Generate every sourcetype in volumes split into shards across a process pool
+
+        Each sourcetype is split into `workers` shards whose seeds are derived
+        from the master seed, so output is identical for a given seed and
+        worker count. Shards are written to part files and concatenated in
+        shard order, or k-way merged by event time when time_ordered is set.
+        byte_budgets optionally caps the bytes written per sourcetype.
+        Returns a dict of sourcetype -> event count.
+        """
+        if self.seed is None:
+            raise ValueError("sharded generation requires a master seed")
+        if self.partition:
+            raise ValueError("partitioned output is written by a single process")
+
+        tasks = []
+        for sourcetype, count in volumes.items():
+            filename = SOURCETYPES[sourcetype][0]
+            budget = (byte_budgets or {}).get(sourcetype)
+            shard_budgets = split_count(budget, workers) if budget is not None else [None] * workers
+            for shard, shard_count in enumerate(split_count(count, workers)):
+                part = os.path.join(self.output_dir, f".{filename}.part{shard:04d}")
+                tasks.append((self.generator_args(), sourcetype, shard, shard_count, shard_budgets[shard], part))
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for task, result in zip(tasks, pool.map(_generate_shard, tasks)):
+                results.append(result)
+                if self.metrics is not None:
+                    self.metrics.merge(result[4])
+                    self.metrics.progress(task[1])
+
+        counts = {}
+        for sourcetype in volumes:
+            header, newline = SOURCETYPES[sourcetype][1:]
+            parts = [task[5] for task in tasks if task[1] == sourcetype]
+            shard_results = [result for task, result in zip(tasks, results) if task[1] == sourcetype]
+            counts[sourcetype] = sum(result[0] for result in shard_results)
+            # Shard times are summed, so rates are per worker process
+            self._record_stats(sourcetype, counts[sourcetype], sum(result[1] for result in shard_results),
+                               sum(result[2] for result in shard_results))
+            if self.answer_keys is not None:
+                for result in shard_results:
+                    self.answer_keys.merge(result[3])
+            merge_started = time.perf_counter()
+            if self.time_ordered:
+                with EventWriter(self.output_path(sourcetype), header=header, newline=newline,
+                                 compression=self.compression,
+                                 compress_workers=self.compress_workers) as writer:
+                    self._merge_parts(parts, writer, TIME_KEYS[sourcetype])
+            else:
+                # Parts are already compressed; members/frames concatenate into one stream
+                with open(self.output_path(sourcetype), 'wb') as out:
+                    if header is not None:
+                        out.write(compress_block((header + newline).encode(), self.compression))
+                    for path in parts:
+                        with open(path, 'rb') as part:
+                            shutil.copyfileobj(part, out, 1024 * 1024)
+            for path in parts:
+                os.remove(path)
+            if self.metrics is not None:
+                self.metrics.add_time(sourcetype, "merge", time.perf_counter() - merge_started)
+        if self.index or self.output_format == "columnar":
+            self.write_sidecars(volumes)
+        return counts
+
+    @staticmethod
+    def _merge_parts(parts, writer, key):
+        """k-way merge of time-sorted part files into an EventWriter, one line per part in memory"""
+        files = [open(path, newline='', buffering=1024 * 1024) for path in parts]
+        try:
+            merged = heapq.merge(*files, key=key)
+            while True:
+                batch = list(islice(merged, DEFAULT_BATCH_SIZE))
+                if not batch:
+                    break
+                writer.write_raw("".join(batch))
+        finally:
+            for f in files:
+                f.close()
+
+    def generate_web_access_logs(self, count=50000, max_bytes=None):
+        """Generate web application access logs in Apache combined log format"""
+        result = self.generate_sourcetype("access_combined_wcookie", count, max_bytes)
+        print(f"Generated {self.stats['access_combined_wcookie']['events']} web access logs in {self.output_location('access_combined_wcookie')}")
+        return result
+
+    def iter_web_access_logs(self, count=50000):
+        """Yield web access log lines one at a time"""
+        if self.engine == "numpy":
+            yield from self._iter_web_access_numpy(count)
+            return
+        yield from self.iter_spec_events("access_combined_wcookie", count)
+
+    def _iter_web_access_numpy(self, count):
+        """Vectorized web access generator: renders the access_combined_wcookie spec in numpy batches
+
+        Uses the spec's variants, weights and samplers (so --spec overrides
+        apply) with the python engine's distributions but not its random stream.
+        """
+        compiled = self.compile_spec("access_combined_wcookie")
+        rng = np.random.default_rng(self.rng.getrandbits(64))
+        return compiled.iter_events_numpy(rng, self._offset_batches(rng, count, NUMPY_BATCH_SIZE),
+                                          self.start_date, self.span_seconds // 86400 + 1)
+
+    def generate_db_audit_logs(self, count=10000, max_bytes=None):
         """Generate database audit logs in CSV format"""
-        
-        # SQL commands from original data
-        commands = [
-            'UPDATE users SET email = {}@{}.{} WHERE userid = {}',
-            'SELECT * FROM creditcard WHERE userid = {}',
-            'INSERT INTO users (username, password, fname, lname, email) VALUES ({}, {}, {}, {}, {}@{}.{})',
-            'SELECT ccexpire FROM creditcard WHERE userid = {}',
-            'SELECT email FROM users WHERE userid = {}',
-            'SELECT * FROM users WHERE userid = {}',
-            'SELECT username FROM users WHERE userid = {}',
-            'DELETE FROM sessions WHERE userid = {}',
-            'UPDATE products SET stock = stock - 1 WHERE productid = {}',
-            'INSERT INTO orders (userid, productid, quantity) VALUES ({}, {}, {})'
-        ]
-        
-        connection_types = [
-            'admin on BCG using TCP/IP',
-            'dbuser on BCG using TCP/IP',
-            'webapp on BCG using TCP/IP'
-        ]
-        
-        # Generate names for realistic data
-        first_names = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth"]
-        last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez"]
-        domains = ["gmail.com", "yahoo.com", "hotmail.com", "company.com", "example.org"]
-        
-        logs = []
-        
-        for i in range(count):
-            timestamp = self.start_date + timedelta(
-                seconds=random.randint(0, self.days * 24 * 3600)
-            )
-            
-            # Choose between Query and Connect
-            if random.random() < 0.8:  # 80% queries
-                query_type = "Query"
-                # Generate realistic SQL command
-                command_template = random.choice(commands)
-                
-                if "UPDATE users SET email" in command_template:
-                    email_user = random.choice(first_names).lower()
-                    domain = random.choice(domains)
-                    userid = random.randint(1000, 9999)
-                    command = f'UPDATE users SET email = {email_user}@{domain} WHERE userid = {userid}'
-                elif "INSERT INTO users" in command_template:
-                    username = random.choice(first_names).lower() + str(random.randint(10, 99))
-                    password_hash = "1e3f0e4291be8533bce600d32c41da4fecfd0204"  # Sample hash
-                    fname = random.choice(first_names)
-                    lname = random.choice(last_names)
-                    email = f"{random.choice(first_names).lower()}{random.randint(10,99)}@{random.choice(domains)}"
-                    command = f'INSERT INTO users (username, password, fname, lname, email) VALUES ({username}, {password_hash}, {fname}, {lname}, {email})'
-                else:
-                    # Simple substitution
-                    userid = random.randint(1000, 9999)
-                    productid = random.choice(self.product_ids)
-                    quantity = random.randint(1, 5)
-                    command = command_template.replace('{}', str(userid), 1)
-                    command = command.replace('{}', str(productid), 1) 
-                    command = command.replace('{}', str(quantity), 1)
-                
-                # Duration varies by query type
-                if "SELECT" in command:
-                    duration = random.randint(5, 50)
-                elif "UPDATE" in command or "INSERT" in command:
-                    duration = random.randint(10, 100)
-                else:
-                    duration = random.randint(5, 30)
-                    
-            else:  # 20% connections
-                query_type = "Connect"
-                command = random.choice(connection_types)
-                duration = ""  # No duration for connections
-            
-            log = {
-                "Time": timestamp.strftime("%d/%b/%Y %H:%M:%S"),
-                "Type": query_type,
-                "Command": command,
-                "Duration": duration
-            }
-            logs.append(log)
-        
-        # Write to CSV file
-        output_file = os.path.join(self.output_dir, "db_audit_30DAY.csv")
-        with open(output_file, 'w', newline='') as csvfile:
-            fieldnames = ["Time", "Type", "Command", "Duration"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for log in logs:
-                writer.writerow(log)
-        
-        print(f"Generated {len(logs)} database audit logs in {output_file}")
-        return logs
+        result = self.generate_sourcetype("db_audit", count, max_bytes)
+        print(f"Generated {self.stats['db_audit']['events']} database audit logs in {self.output_location('db_audit')}")
+        return result
+
+    def iter_db_audit_logs(self, count=10000):
+        """Yield database audit events as CSV rows (Time,Type,Command,Duration)"""
+        yield from self.iter_spec_events("db_audit", count)
     
-    def generate_linux_security_logs(self, count=5000):
+    def generate_linux_security_logs(self, count=5000, max_bytes=None):
         """Generate Linux security logs"""
-        
-        # Common patterns from original data
-        failed_users = ["zabbix", "operator", "dba", "admin", "root", "oracle", "postgres", "mysql"]
-        valid_users = ["nsharpe", "djohnson", "admin", "root", "user1", "analyst"]
-        
-        # Source IPs - mix of suspicious and legitimate
-        suspicious_ips = ["208.65.153.253", "202.179.8.245", "94.102.49.190", "185.234.218.110"]
-        legitimate_ips = ["192.168.1.100", "10.0.0.50", "172.16.0.10"]
-        
-        log_patterns = [
-            {"type": "failed_password", "weight": 0.40},
-            {"type": "successful_login", "weight": 0.30},
-            {"type": "session_opened", "weight": 0.15},
-            {"type": "session_closed", "weight": 0.10},
-            {"type": "server_events", "weight": 0.05}
-        ]
-        
-        logs = []
-        
-        for i in range(count):
-            timestamp = self.start_date + timedelta(
-                seconds=random.randint(0, self.days * 24 * 3600)
-            )
-            
-            # Select log pattern
-            rand_val = random.random()
-            cumulative = 0
-            selected_pattern = "failed_password"
-            
-            for pattern in log_patterns:
-                cumulative += pattern['weight']
-                if rand_val < cumulative:
-                    selected_pattern = pattern['type']
-                    break
-            
-            pid = random.randint(1000, 99999)
-            
-            if selected_pattern == "failed_password":
-                if random.random() < 0.7:  # 70% invalid users
-                    user = random.choice(failed_users)
-                    user_desc = f"invalid user {user}"
-                else:
-                    user = random.choice(valid_users)
-                    user_desc = user
-                
-                ip = random.choice(suspicious_ips)
-                port = random.randint(22, 65535)
-                
-                log_line = (f'{timestamp.strftime("%a %b %d %Y %H:%M:%S")} www1 '
-                           f'sshd[{pid}]: Failed password for {user_desc} from {ip} port {port} ssh2')
-                
-            elif selected_pattern == "successful_login":
-                user = random.choice(valid_users)
-                ip = random.choice(legitimate_ips + suspicious_ips[:1])  # Mostly legitimate
-                port = 22
-                
-                log_line = (f'{timestamp.strftime("%a %b %d %Y %H:%M:%S")} www1 '
-                           f'sshd[{pid}]: Accepted password for {user} from {ip} port {port} ssh2')
-                
-            elif selected_pattern == "session_opened":
-                user = random.choice(valid_users)
-                uid = 0 if user in ["root", "admin"] else random.randint(1000, 9999)
-                
-                log_line = (f'{timestamp.strftime("%a %b %d %Y %H:%M:%S")} www1 '
-                           f'sshd[{pid}]: pam_unix(sshd:session): session opened for user {user} by (uid={uid})')
-                
-            elif selected_pattern == "session_closed":
-                user = random.choice(valid_users)
-                
-                log_line = (f'{timestamp.strftime("%a %b %d %Y %H:%M:%S")} www1 '
-                           f'sshd[{pid}]: pam_unix(sshd:session): session closed for user {user}')
-                
-            else:  # server_events
-                events = [
-                    f'sshd[{pid}]: Server listening on :: port 22.',
-                    f'sshd[{pid}]: Server listening on 0.0.0.0 port 22.',
-                    f'sshd[{pid}]: Received SIGHUP; restarting.',
-                ]
-                event = random.choice(events)
-                
-                log_line = f'{timestamp.strftime("%a %b %d %Y %H:%M:%S")} www1 {event}'
-            
-            logs.append(log_line)
-        
-        # Write to file
-        output_file = os.path.join(self.output_dir, "linux_s_30DAY.log")
-        with open(output_file, 'w') as f:
-            for log in logs:
-                f.write(f"{log}\n")
-        
-        print(f"Generated {len(logs)} Linux security logs in {output_file}")
-        return logs
+        result = self.generate_sourcetype("linux_secure", count, max_bytes)
+        print(f"Generated {self.stats['linux_secure']['events']} Linux security logs in {self.output_location('linux_secure')}")
+        return result
+
+    def iter_linux_security_logs(self, count=5000):
+        """Yield Linux security (sshd) log lines one at a time"""
+        yield from self.iter_spec_events("linux_secure", count)
     
-    def generate_all_data(self):
-        """Generate all data types for the course"""
+    def generate_all_data(self, workers=1, volumes=None, byte_budgets=None):
+        """Generate all data types for the course
+
+        volumes defaults to the original course volumes; byte_budgets
+        optionally caps the bytes written per sourcetype.
+        """
+        volumes = volumes or DEFAULT_VOLUMES
+        byte_budgets = byte_budgets or {}
         print(f"Generating {self.days} days of data for Splunk Fundamentals course...")
         print(f"Output directory: {self.output_dir}")
         print("=" * 60)
         
-        # Generate main data files (matching original volumes)
-        self.generate_web_access_logs(131645)
-        self.generate_db_audit_logs(44097)  
-        self.generate_linux_security_logs(63884)
+        # Generate main data files (matching original volumes unless scaled)
+        started = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.start(sum(volumes.values()))
+        if workers > 1:
+            print(f"Using {workers} worker processes (seed {self.seed})")
+            counts = self.generate_sharded(volumes, workers, byte_budgets)
+            for sourcetype, count in counts.items():
+                print(f"Generated {count} {sourcetype} events in {self.output_path(sourcetype)}")
+        else:
+            self.generate_web_access_logs(volumes["access_combined_wcookie"],
+                                          byte_budgets.get("access_combined_wcookie"))
+            self.generate_db_audit_logs(volumes["db_audit"], byte_budgets.get("db_audit"))
+            self.generate_linux_security_logs(volumes["linux_secure"], byte_budgets.get("linux_secure"))
+            for sourcetype in volumes:
+                if sourcetype not in ("access_combined_wcookie", "db_audit", "linux_secure"):
+                    self.generate_sourcetype(sourcetype, volumes[sourcetype], byte_budgets.get(sourcetype))
+                    print(f"Generated {self.stats[sourcetype]['events']} {sourcetype} events in {self.output_location(sourcetype)}")
+        elapsed = time.perf_counter() - started
+        
+        print()
+        for sourcetype, stats in self.stats.items():
+            seconds = max(stats["seconds"], 1e-9)
+            partitions = (f", {stats['partitions']} partition files ({stats['file_opens']} opens)"
+                          if "partitions" in stats else "")
+            print(f"{sourcetype}: {stats['events']} events, {stats['bytes'] / 1e6:.1f} MB "
+                  f"({stats['events'] / seconds:,.0f} events/sec, {stats['bytes'] / 1e6 / seconds:.1f} MB/sec)"
+                  f"{partitions}")
+        total_events = sum(stats["events"] for stats in self.stats.values())
+        total_bytes = sum(stats["bytes"] for stats in self.stats.values())
+        print(f"Total: {total_events} events, {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+              f"({total_events / elapsed:,.0f} events/sec, {total_bytes / 1e6 / elapsed:.1f} MB/sec)")
+        if self.metrics is not None:
+            print("Phase times" + (" (summed over worker processes)" if workers > 1 else "") + ":")
+            for line in self.metrics.summary_lines():
+                print(f"  {line}")
+        
+        if self.answer_keys is not None:
+            path = self.answer_keys.save(self.output_dir, {"start": self.start_date.isoformat(),
+                                                           "end": self.end_date.isoformat()})
+            print(f"Answer keys written to {path}")
         
         print("=" * 60)
         print("Data generation complete!")
@@ -354,6 +845,9 @@ class DataGenerator:
         print("- access_30DAY.log (Web application access logs)")
         print("- db_audit_30DAY.csv (Database audit logs)")
         print("- linux_s_30DAY.log (Linux security logs)")
+        for sourcetype in volumes:
+            if sourcetype not in ("access_combined_wcookie", "db_audit", "linux_secure"):
+                print(f"- {SOURCETYPES[sourcetype][0]} ({sourcetype}, from --spec)")
         print()
         print("Note: products.csv is a static file and does not need regeneration")
         print()
@@ -381,12 +875,461 @@ def main():
         default='.',
         help='Output directory for generated files (default: current directory)'
     )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Stream events to disk in batches instead of building them in memory first'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f'Events per write batch in streaming mode (default: {DEFAULT_BATCH_SIZE})'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Generate each sourcetype in N shards across a process pool (default: 1)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Master random seed; output is reproducible for a given seed and worker count'
+    )
+    parser.add_argument(
+        '--end-date',
+        type=datetime.fromisoformat,
+        default=None,
+        help='End of the generated time range, ISO format (default: now)'
+    )
+    parser.add_argument(
+        '--engine',
+        choices=['python', 'numpy'],
+        default='python',
+        help='Web access log engine; numpy draws events in vectorized batches (default: python)'
+    )
+    parser.add_argument(
+        '--sorted',
+        action='store_true',
+        help='Emit events in increasing time order (no in-memory sort, works at any volume)'
+    )
+    volume = parser.add_mutually_exclusive_group()
+    volume.add_argument(
+        '--scale',
+        type=float,
+        default=None,
+        help='Multiply the default event volumes, keeping sourcetype ratios'
+    )
+    volume.add_argument(
+        '--events-per-day',
+        type=int,
+        default=None,
+        help='Total events per day of data across all sourcetypes, keeping sourcetype ratios'
+    )
+    volume.add_argument(
+        '--target-bytes',
+        type=parse_size,
+        default=None,
+        help='Generate about this much data in total, e.g. 500MB or 50GB'
+    )
+    parser.add_argument(
+        '--output',
+        choices=['file', 'hec', 'syslog'],
+        default='file',
+        help='Write files, send events to a Splunk HTTP Event Collector, or send linux_secure events '
+             'to a syslog endpoint (default: file)'
+    )
+    parser.add_argument(
+        '--hec-url',
+        default='http://localhost:8088',
+        help='HEC base URL for --output hec (default: http://localhost:8088)'
+    )
+    parser.add_argument(
+        '--hec-token',
+        default=None,
+        help='HEC token for --output hec'
+    )
+    parser.add_argument(
+        '--index',
+        default='main',
+        help='Splunk index for --output hec events (default: main)'
+    )
+    parser.add_argument(
+        '--hec-batch-size',
+        type=int,
+        default=500,
+        help='Events per HEC request (default: 500)'
+    )
+    parser.add_argument(
+        '--hec-concurrency',
+        type=int,
+        default=4,
+        help='Concurrent HEC connections (default: 4)'
+    )
+    parser.add_argument(
+        '--hec-no-gzip',
+        action='store_true',
+        help='Send uncompressed HEC request bodies'
+    )
+    parser.add_argument(
+        '--hec-insecure',
+        action='store_true',
+        help='Skip TLS certificate verification for https HEC URLs'
+    )
+    parser.add_argument(
+        '--syslog-host',
+        default='localhost',
+        help='Syslog endpoint for --output syslog (default: localhost)'
+    )
+    parser.add_argument(
+        '--syslog-port',
+        type=int,
+        default=5514,
+        help='Syslog port for --output syslog (default: 5514)'
+    )
+    parser.add_argument(
+        '--syslog-protocol',
+        choices=['udp', 'tcp'],
+        default='udp',
+        help='Syslog transport; tcp uses octet-counting framing (default: udp)'
+    )
+    parser.add_argument(
+        '--syslog-framing',
+        choices=['octet', 'lf'],
+        default='octet',
+        help='TCP framing: octet counting, or newline-terminated for older receivers (default: octet)'
+    )
+    parser.add_argument(
+        '--syslog-format',
+        choices=['rfc3164', 'rfc5424'],
+        default='rfc3164',
+        help='Syslog message format (default: rfc3164)'
+    )
+    parser.add_argument(
+        '--syslog-connections',
+        type=int,
+        default=1,
+        help='Sockets (udp) or connections (tcp) to spread messages over (default: 1)'
+    )
+    parser.add_argument(
+        '--syslog-batch-size',
+        type=int,
+        default=200,
+        help='Messages written per batch (default: 200)'
+    )
+    parser.add_argument(
+        '--compress',
+        choices=['gzip', 'zstd'],
+        default=None,
+        help='Write block-compressed .gz or .zst files (zstd needs the zstandard package)'
+    )
+    parser.add_argument(
+        '--compress-workers',
+        type=int,
+        default=None,
+        help='Threads compressing blocks per output file (default: CPU count)'
+    )
+    parser.add_argument(
+        '--product-skew',
+        type=float,
+        default=0.0,
+        help='Zipf exponent for product popularity, e.g. 1.1 (default: 0, uniform)'
+    )
+    parser.add_argument(
+        '--sessions',
+        type=int,
+        default=None,
+        help='Draw JSESSIONIDs from N distinct sessions derived on the fly (default: a pool of 1000)'
+    )
+    parser.add_argument(
+        '--client-ips',
+        type=int,
+        default=None,
+        help='Draw web client IPs from N distinct addresses derived on the fly'
+    )
+    parser.add_argument(
+        '--users',
+        type=int,
+        default=None,
+        help='Draw linux_secure users and db_audit user IDs from N distinct users'
+    )
+    parser.add_argument(
+        '--entity-skew',
+        type=float,
+        default=0.0,
+        help='Zipf exponent for entity activity with --sessions/--client-ips/--users (default: 0, uniform)'
+    )
+    parser.add_argument(
+        '--hosts',
+        type=int,
+        default=None,
+        help='Spread events over N synthetic hosts (www1..wwwN): the linux_secure host field, and the '
+             'host= level of --partition (default: all events on www1)'
+    )
+    parser.add_argument(
+        '--host-skew',
+        type=float,
+        default=0.0,
+        help='Zipf exponent for per-host event volume with --hosts, e.g. 1.1 (default: 0, uniform)'
+    )
+    parser.add_argument(
+        '--partition',
+        type=parse_partition_fields,
+        default=(),
+        metavar='FIELDS',
+        help='Write each sourcetype into a directory tree partitioned by FIELDS (host, day or host,day), '
+             'e.g. host=www3/date=2024-05-01/access_30DAY.log, instead of one file'
+    )
+    parser.add_argument(
+        '--partition-writers',
+        type=int,
+        default=4,
+        help='Writer threads for --partition output (default: 4)'
+    )
+    parser.add_argument(
+        '--max-open-files',
+        type=int,
+        default=64,
+        help='Open partition files kept across the --partition writers; others are closed and '
+             'reopened as needed (default: 64)'
+    )
+    parser.add_argument(
+        '--spec',
+        action='append',
+        default=[],
+        metavar='FILE',
+        help='Also generate the sourcetype defined in this JSON/YAML spec file (repeatable)'
+    )
+    parser.add_argument(
+        '--live',
+        action='store_true',
+        help='Write events stamped with the current time at --rate until stopped, like a live application'
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=50.0,
+        help='Average events/sec across all sourcetypes in --live mode (default: 50)'
+    )
+    parser.add_argument(
+        '--live-profile',
+        choices=['flat', 'diurnal', 'burst', 'diurnal-burst'],
+        default='flat',
+        help='Shape of the --live rate over time (default: flat)'
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=None,
+        help='Stop --live mode after this many seconds (default: run until Ctrl-C)'
+    )
+    parser.add_argument(
+        '--rotate-size',
+        type=parse_size,
+        default=None,
+        help='In --live mode, rotate each file when it reaches this size, e.g. 50MB'
+    )
+    parser.add_argument(
+        '--rotate-interval',
+        type=int,
+        default=None,
+        help='In --live mode, rotate each file every N seconds (aligned, e.g. 3600 rotates hourly)'
+    )
+    parser.add_argument(
+        '--rotate-keep',
+        type=int,
+        default=5,
+        help='Rotated files kept per log, file.1 being the newest (default: 5)'
+    )
+    parser.add_argument(
+        '--answer-keys',
+        action='store_true',
+        help='Aggregate expected lab results while generating and write them to answer_keys.json'
+    )
+    parser.add_argument(
+        '--format',
+        choices=['text', 'columnar'],
+        default='text',
+        help='columnar also writes typed column files (<file>.columns/, plus <file>.parquet with pyarrow)'
+    )
+    parser.add_argument(
+        '--build-index',
+        action='store_true',
+        help='Write token, time and field index sidecars (<file>.idx/) for event_index.py queries'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only generate and append the days since the last run recorded in the dataset manifest'
+    )
+    parser.add_argument(
+        '--trim',
+        action='store_true',
+        help='With --incremental, drop events older than the --days window'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='Serve runs with identical parameters from this dataset cache, and store new ones in it'
+    )
+    parser.add_argument(
+        '--metrics',
+        nargs='?',
+        const='',
+        default=None,
+        metavar='PATH',
+        help='Time each phase per sourcetype, print progress with rate and ETA, and write a JSON metrics '
+             'report with peak RSS (default PATH: generation_metrics.json in the output directory)'
+    )
+    parser.add_argument(
+        '--progress-interval',
+        type=float,
+        default=5.0,
+        help='Seconds between --metrics progress lines (default: 5)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile the run with cProfile and tracemalloc; writes generation_profile.txt/.pstats '
+             'to the output directory'
+    )
     
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.output == 'hec' and args.hec_token is None:
+        parser.error("--output hec requires --hec-token")
+    if args.output != 'file':
+        if args.workers > 1 or args.target_bytes is not None:
+            parser.error("--workers and --target-bytes apply to file output only")
+        if args.incremental or args.cache_dir:
+            parser.error("--incremental and --cache-dir apply to file output only")
+    if args.output == 'syslog' and (args.syslog_connections < 1 or args.syslog_batch_size < 1):
+        parser.error("--syslog-connections and --syslog-batch-size must be at least 1")
+    if args.trim and not args.incremental:
+        parser.error("--trim requires --incremental")
+    if args.hosts is not None and args.hosts < 1:
+        parser.error("--hosts must be at least 1")
+    if args.partition:
+        if args.output != 'file' or args.live or args.workers > 1 or args.incremental or args.cache_dir:
+            parser.error("--partition writes files from a single process; it cannot be combined with "
+                         "--output hec/syslog, --live, --workers, --incremental or --cache-dir")
+        if args.partition_writers < 1 or args.max_open_files < args.partition_writers:
+            parser.error("--partition-writers must be at least 1 and --max-open-files at least as many")
+        # Host partitions without --hosts put everything on www1, like the built-in data
+        if "host" in args.partition and args.hosts is None:
+            args.hosts = 1
+    if (args.metrics is not None or args.profile) and (args.output != 'file' or args.live):
+        parser.error("--metrics and --profile apply to file output only (not --output hec/syslog or --live)")
+    if args.progress_interval <= 0:
+        parser.error("--progress-interval must be positive")
+    if args.live:
+        if args.output != 'file' or args.workers > 1 or args.compress or args.incremental or args.cache_dir:
+            parser.error("--live writes plain files from a single process; it cannot be combined with "
+                         "--output hec/syslog, --workers, --compress, --incremental or --cache-dir")
+        if args.rate <= 0:
+            parser.error("--rate must be positive")
+    if (args.build_index or args.format == 'columnar') and (args.output != 'file' or args.live or args.compress
+                                                            or args.partition):
+        parser.error("--build-index and --format columnar need uncompressed file output "
+                     "(not --output hec/syslog, --live, --compress or --partition)")
+    
+    seed = args.seed
+    end_date = args.end_date
+    manifest = None
+    if args.incremental or args.cache_dir:
+        import dataset_manifest
+        manifest = dataset_manifest.DatasetManifest.load(args.output_dir) if args.incremental else None
+        # Reuse the recorded seed so daily reruns do not need to repeat --seed
+        if seed is None and manifest is not None:
+            seed = manifest.params["seed"]
+        # Work in whole days so reruns on the same day are no-ops
+        if end_date is None:
+            end_date = dataset_manifest.day_start(datetime.now())
+    
+    # Sharded and cached runs need a master seed to derive per-shard seeds from
+    if seed is None and (args.workers > 1 or args.incremental or args.cache_dir):
+        seed = random.SystemRandom().randrange(2 ** 32)
+    
+    metrics = None
+    if args.metrics is not None:
+        from run_metrics import RunMetrics
+        metrics = RunMetrics(progress_interval=args.progress_interval)
     
     # Create data generator and generate all data
-    generator = DataGenerator(days=args.days, output_dir=args.output_dir)
-    generator.generate_all_data()
+    generator = DataGenerator(days=args.days, output_dir=args.output_dir,
+                              stream=args.stream, batch_size=args.batch_size,
+                              seed=seed, end_date=end_date, engine=args.engine,
+                              time_ordered=args.sorted, compression=args.compress,
+                              compress_workers=args.compress_workers, spec_files=args.spec,
+                              product_skew=args.product_skew, sessions=args.sessions,
+                              client_ips=args.client_ips, users=args.users, entity_skew=args.entity_skew,
+                              answer_keys=args.answer_keys, index=args.build_index,
+                              output_format=args.format, metrics=metrics, hosts=args.hosts,
+                              host_skew=args.host_skew, partition=args.partition,
+                              partition_writers=args.partition_writers, max_open_files=args.max_open_files)
+    byte_budgets = None
+    if args.target_bytes is not None:
+        volumes, byte_budgets = generator.plan_target_bytes(args.target_bytes)
+    else:
+        volumes = scaled_volumes(args.days, scale=args.scale, events_per_day=args.events_per_day)
+    if args.live:
+        from live_emitter import run_live
+        run_live(generator, args.rate, profile=args.live_profile, duration=args.duration,
+                 rotate_bytes=args.rotate_size, rotate_seconds=args.rotate_interval, keep=args.rotate_keep)
+        return
+    if args.output == 'hec':
+        from hec_sender import send_generated_events
+        send_generated_events(generator, volumes, args.hec_url, args.hec_token, index=args.index,
+                              batch_size=args.hec_batch_size, concurrency=args.hec_concurrency,
+                              compress=not args.hec_no_gzip, verify_ssl=not args.hec_insecure)
+        return
+    if args.output == 'syslog':
+        from syslog_sender import send_generated_events
+        send_generated_events(generator, volumes["linux_secure"], args.syslog_host, args.syslog_port,
+                              protocol=args.syslog_protocol, connections=args.syslog_connections,
+                              batch_size=args.syslog_batch_size, framing=args.syslog_framing,
+                              message_format=args.syslog_format)
+        return
+    
+    if args.incremental or args.cache_dir:
+        params = dataset_manifest.generation_params(generator, volumes)
+        if manifest is not None and manifest.params == params and manifest.verify(args.output_dir, checksums=False):
+            manifest = dataset_manifest.append_new_days(generator, manifest, trim=args.trim)
+            if args.build_index or args.format == 'columnar':
+                generator.write_sidecars(manifest.params["volumes"])
+            if args.cache_dir:
+                dataset_manifest.store_in_cache(args.cache_dir, manifest, args.output_dir)
+            return
+        if args.incremental:
+            print("No matching dataset manifest found; generating the full time range")
+        if args.cache_dir:
+            key = dataset_manifest.DatasetManifest(params, generator.start_date, generator.end_date).key
+            if dataset_manifest.restore_from_cache(args.cache_dir, key, args.output_dir):
+                print(f"Identical dataset served from cache {os.path.join(args.cache_dir, key)}")
+                if args.build_index or args.format == 'columnar':
+                    generator.write_sidecars(volumes)
+                return
+    
+    if args.profile:
+        from run_metrics import profiled
+        if args.workers > 1:
+            print("Note: --profile covers this process only, not the shard worker processes")
+        with profiled(args.output_dir):
+            generator.generate_all_data(workers=args.workers, volumes=volumes, byte_budgets=byte_budgets)
+    else:
+        generator.generate_all_data(workers=args.workers, volumes=volumes, byte_budgets=byte_budgets)
+    if metrics is not None:
+        path = metrics.save(args.metrics or os.path.join(args.output_dir, "generation_metrics.json"))
+        print(f"Metrics written to {path}")
+    
+    # Checksumming the output is a full extra read, so only runs that will reuse the dataset pay for it
+    if args.incremental or args.cache_dir:
+        manifest = dataset_manifest.record_generation(generator, volumes)
+        if args.cache_dir:
+            dataset_manifest.store_in_cache(args.cache_dir, manifest, args.output_dir)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
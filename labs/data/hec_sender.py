@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Splunk HTTP Event Collector (HEC) sender for generated course data
+
+Streams events from DataGenerator into HEC with an asyncio client:
+- a pool of keep-alive connections, one per concurrent sender
+- events batched per request, gzip-compressed bodies
+- a bounded queue between generator and senders for backpressure
+- retry with exponential backoff when HEC answers 503 (server busy)
+
+Also includes a local stand-in HEC server that accepts, counts and times
+events, for testing and for measuring sender throughput without Splunk.
+
+Usage:
+    python hec_sender.py serve [--port 8088] [--token TOKEN] [--busy-rate 0.05]
+    python generate_course_data.py --output hec --hec-url http://localhost:8088 --hec-token TOKEN
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import ssl
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from generate_course_data import SOURCETYPES, TIME_KEYS
+from sender_common import put_batch
+
+EVENT_ENDPOINT = "/services/collector/event"
+DEFAULT_TOKEN = "00000000-0000-0000-0000-000000000000"
+
+
+class HecError(Exception):
+    """Raised when HEC rejects a batch or stays unavailable after all retries"""
+
+
+def event_time(sourcetype, line):
+    """Epoch seconds of a generated event line (naive local time, like Splunk's default)"""
+    year, month, day, clock = TIME_KEYS[sourcetype](line)
+    hour, minute, second = clock.split(":")
+    return int(datetime(int(year), month, int(day), int(hour), int(minute), int(second)).timestamp())
+
+
+def hec_events(generator, volumes, index="main", host=None):
+    """Yield HEC event payloads (as JSON strings) for every sourcetype in volumes"""
+    for sourcetype, count in volumes.items():
+        source = SOURCETYPES[sourcetype][0]
+        metadata = {"index": index, "source": source, "sourcetype": sourcetype}
+        if host is not None:
+            metadata["host"] = host
+        for line in generator.iter_events(sourcetype, count):
+            payload = dict(metadata, time=event_time(sourcetype, line), event=line)
+            yield json.dumps(payload, separators=(",", ":"))
+
+
+class _Connection:
+    """A single keep-alive HTTP/1.1 connection to HEC"""
+
+    def __init__(self, host, port, ssl_context):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.reader = None
+        self.writer = None
+
+    async def request(self, path, headers, body):
+        """POST body to path; returns (status, response body)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl_context)
+        head = [f"POST {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        length = 0
+        close = False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                close = True
+        response = await self.reader.readexactly(length) if length else b""
+        if close:
+            await self.close()
+        return status, response
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+        self.reader = self.writer = None
+
+
+class HecClient:
+    """Batched, concurrent HEC client
+
+    Events are grouped into batches of batch_size, and up to concurrency
+    batches are in flight at once, each on its own keep-alive connection.
+    The queue between the producer and the senders holds at most
+    2 * concurrency batches, so a slow HEC slows generation rather than
+    growing memory.
+    """
+
+    def __init__(self, url, token, batch_size=500, concurrency=4, compress=True,
+                 max_retries=8, verify_ssl=True):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 8088)
+        self.ssl_context = None
+        if parts.scheme == "https":
+            self.ssl_context = ssl.create_default_context()
+            if not verify_ssl:
+                self.ssl_context.check_hostname = False
+                self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.path = parts.path.rstrip("/") or EVENT_ENDPOINT
+        self.token = token
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.compress = compress
+        self.max_retries = max_retries
+        self.events = 0
+        self.bytes = 0
+        self.requests = 0
+        self.retries = 0
+
+    async def send(self, events):
+        """Send every event payload from an iterable of JSON strings"""
+        queue = asyncio.Queue(maxsize=2 * self.concurrency)
+        senders = [asyncio.create_task(self._sender(queue)) for _ in range(self.concurrency)]
+        try:
+            batch = []
+            for event in events:
+                batch.append(event)
+                if len(batch) >= self.batch_size:
+                    await put_batch(queue, batch, senders)
+                    batch = []
+            if batch:
+                await put_batch(queue, batch, senders)
+            for _ in senders:
+                await put_batch(queue, None, senders)
+            await asyncio.gather(*senders)
+        finally:
+            for task in senders:
+                task.cancel()
+
+    async def _sender(self, queue):
+        connection = _Connection(self.host, self.port, self.ssl_context)
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                await self._post(connection, batch)
+        finally:
+            await connection.close()
+
+    async def _post(self, connection, batch):
+        body = "\n".join(batch).encode()
+        headers = {"Authorization": f"Splunk {self.token}", "Content-Type": "application/json"}
+        if self.compress:
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, response = await connection.request(self.path, headers, body)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                await connection.close()
+                status, response = None, b""
+            if status == 200:
+                self.events += len(batch)
+                self.bytes += len(body)
+                self.requests += 1
+                return
+            if status is not None and status != 503:
+                raise HecError(f"HEC returned {status}: {response.decode(errors='replace')}")
+            # Busy or disconnected: back off with jitter and try again
+            self.retries += 1
+            await asyncio.sleep(min(0.05 * 2 ** attempt, 5.0) * (0.5 + random.random()))
+        raise HecError(f"HEC still unavailable after {self.max_retries} retries")
+
+
+def send_generated_events(generator, volumes, url, token, index="main", host=None,
+                          batch_size=500, concurrency=4, compress=True, verify_ssl=True):
+    """Generate events for volumes and send them to HEC; prints throughput"""
+    client = HecClient(url, token, batch_size=batch_size, concurrency=concurrency,
+                       compress=compress, verify_ssl=verify_ssl)
+    started = time.perf_counter()
+    asyncio.run(client.send(hec_events(generator, volumes, index=index, host=host)))
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"Sent {client.events} events to {url} in {client.requests} requests "
+          f"({client.retries} retries) in {elapsed:.1f}s "
+          f"({client.events / elapsed:,.0f} events/sec, {client.bytes / 1e6 / elapsed:.1f} MB/sec on the wire)")
+    return client
+
+
+class LocalHecServer:
+    """Minimal stand-in for Splunk HEC that counts and times received events
+
+    Accepts POSTs to /services/collector/event with a Splunk token, gzip or
+    plain bodies of newline-separated JSON events. busy_rate is the fraction
+    of requests answered with 503 to exercise client retries.
+    """
+
+    def __init__(self, token=DEFAULT_TOKEN, busy_rate=0.0):
+        self.token = token
+        self.busy_rate = busy_rate
+        self.events = 0
+        self.bytes = 0
+        self.requests = 0
+        self.rejected = 0
+        self.counts = {}
+        self.first = None
+        self.last = None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, response = self._process(request_line.decode("latin-1"), headers, body)
+                payload = json.dumps(response).encode()
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                             f"Connection: keep-alive\r\n\r\n".encode() + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _process(self, request_line, headers, body):
+        self.requests += 1
+        if not request_line.startswith("POST") or "/services/collector" not in request_line:
+            return 404, {"text": "Not found", "code": 404}
+        if headers.get("authorization") != f"Splunk {self.token}":
+            self.rejected += 1
+            return 403, {"text": "Invalid token", "code": 4}
+        if self.busy_rate and random.random() < self.busy_rate:
+            self.rejected += 1
+            return 503, {"text": "Server is busy", "code": 9}
+        if headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        now = time.perf_counter()
+        self.first = self.first or now
+        self.last = now
+        self.bytes += len(body)
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                return 400, {"text": "Invalid data format", "code": 6}
+            key = (event.get("index", "main"), event.get("sourcetype", ""))
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.events += 1
+        return 200, {"text": "Success", "code": 0}
+
+    def report(self):
+        """Summary of what was received"""
+        elapsed = (self.last - self.first) if self.first and self.last and self.last > self.first else 0
+        return {
+            "events": self.events,
+            "bytes": self.bytes,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "seconds": round(elapsed, 3),
+            "events_per_sec": round(self.events / elapsed) if elapsed else None,
+            "by_index_sourcetype": {f"{index}/{sourcetype}": count
+                                    for (index, sourcetype), count in sorted(self.counts.items())},
+        }
+
+    async def serve(self, host="127.0.0.1", port=8088, report_interval=5.0):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Local HEC listening on http://{host}:{port}{EVENT_ENDPOINT} (token {self.token})")
+        async with server:
+            while True:
+                await asyncio.sleep(report_interval)
+                if self.requests:
+                    print(json.dumps(self.report()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in Splunk HTTP Event Collector")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="Run a local HEC that counts received events")
+    serve.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    serve.add_argument('--port', type=int, default=8088, help='Port to listen on (default: 8088)')
+    serve.add_argument('--token', default=DEFAULT_TOKEN, help='HEC token to accept')
+    serve.add_argument('--busy-rate', type=float, default=0.0,
+                       help='Fraction of requests answered with 503 to test retries (default: 0)')
+    serve.add_argument('--report-interval', type=float, default=5.0,
+                       help='Seconds between progress reports (default: 5)')
+    args = parser.parse_args()
+
+    server = LocalHecServer(token=args.token, busy_rate=args.busy_rate)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.report_interval))
+    except KeyboardInterrupt:
+        print(json.dumps(server.report(), indent=2))
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
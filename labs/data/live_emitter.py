@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Live-tail emission of generated course data
+
+Instead of 30 days of history, --live writes events stamped with the
+current time at a target rate, the way a running application would, so
+forwarder monitor inputs and real-time alerts (Lab 9) have something to
+watch:
+- the total rate is split across sourcetypes in the ratio of DEFAULT_VOLUMES
+- rate profiles: flat, diurnal (busy afternoons, quiet nights around the
+  same daily mean), burst (random short spikes) and diurnal-burst
+- a fixed-tick scheduler with absolute deadlines: each tick renders the
+  events that became due since the last one and writes them as one batch,
+  so the long-run rate stays accurate under load and sleep jitter never
+  accumulates
+- logrotate-style rotation by size and/or time: file -> file.1 -> file.2 ...
+
+Usage:
+    python generate_course_data.py --live --rate 200 --live-profile diurnal-burst --rotate-size 50MB
+"""
+
+import math
+import os
+import random
+import time
+from datetime import datetime
+
+from generate_course_data import DEFAULT_VOLUMES, SOURCETYPES
+
+PROFILES = ["flat", "diurnal", "burst", "diurnal-burst"]
+
+# Scheduler tick: events due within a tick are written as one batch
+DEFAULT_TICK = 0.1
+
+# Diurnal profile: rate multiplier 1 + amplitude * cos(...) peaking at PEAK_HOUR
+DIURNAL_AMPLITUDE = 0.6
+PEAK_HOUR = 14
+
+# Burst profile: chance per second of a burst starting, its length and multiplier
+BURST_CHANCE = 1 / 300
+BURST_SECONDS = (10, 60)
+BURST_FACTOR = (3.0, 8.0)
+
+
+class RateProfile:
+    """Events/sec over time: a base rate shaped by a diurnal curve and random bursts"""
+
+    def __init__(self, rate, profile="flat", rng=None):
+        if profile not in PROFILES:
+            raise ValueError(f"unknown rate profile '{profile}' (expected one of {', '.join(PROFILES)})")
+        self.rate = rate
+        self.diurnal = profile.startswith("diurnal")
+        self.bursts = profile.endswith("burst")
+        self.rng = rng or random.Random()
+        self.burst_until = 0.0
+        self.burst_factor = 1.0
+        self.last_check = None
+
+    def __call__(self, now):
+        """Target rate at wall-clock time now (epoch seconds)"""
+        rate = self.rate
+        if self.diurnal:
+            # Fractional local hour
+            moment = datetime.fromtimestamp(now)
+            hour = moment.hour + moment.minute / 60 + (moment.second + moment.microsecond / 1e6) / 3600
+            rate *= 1 + DIURNAL_AMPLITUDE * math.cos(2 * math.pi * (hour - PEAK_HOUR) / 24)
+        if self.bursts:
+            if self.last_check is not None and now >= self.burst_until:
+                # Chance of a burst starting somewhere in the time since the last call
+                if self.rng.random() < 1 - (1 - BURST_CHANCE) ** (now - self.last_check):
+                    self.burst_until = now + self.rng.uniform(*BURST_SECONDS)
+                    self.burst_factor = self.rng.uniform(*BURST_FACTOR)
+            self.last_check = now
+            if now < self.burst_until:
+                rate *= self.burst_factor
+        return rate
+
+
+class RotatingWriter:
+    """Appends batches of events to a file, rotating it like logrotate by size and/or time
+
+    On rotation file.N becomes file.N+1 (beyond keep are deleted), the file
+    becomes file.1 and a fresh file is started with the sourcetype's header.
+    Time rotation happens at multiples of rotate_seconds since the epoch, so
+    an hourly interval rotates on the hour.
+    """
+
+    def __init__(self, path, header=None, newline="\n", rotate_bytes=None, rotate_seconds=None, keep=5):
+        self.path = path
+        self.header = header
+        self.newline = newline
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.keep = keep
+        self.rotations = 0
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, 'a', newline='')
+        self.size = self.file.tell()
+        if self.size == 0 and self.header is not None:
+            self.file.write(self.header + self.newline)
+            self.size = len(self.header) + len(self.newline)
+        if self.rotate_seconds:
+            self.next_rotation = (time.time() // self.rotate_seconds + 1) * self.rotate_seconds
+
+    def rotate(self):
+        self.file.close()
+        for n in range(self.keep, 0, -1):
+            older = f"{self.path}.{n}"
+            if os.path.exists(older):
+                if n == self.keep:
+                    os.remove(older)
+                else:
+                    os.replace(older, f"{self.path}.{n + 1}")
+        if self.keep > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        self._open()
+
+    def write_batch(self, events):
+        """Write a batch of events in one call and flush it so tailing readers see it"""
+        if self.rotate_seconds and time.time() >= self.next_rotation:
+            self.rotate()
+        chunk = self.newline.join(events) + self.newline
+        self.file.write(chunk)
+        self.file.flush()
+        self.size += len(chunk)
+        if self.rotate_bytes and self.size >= self.rotate_bytes:
+            self.rotate()
+
+    def close(self):
+        self.file.close()
+
+
+def run_live(generator, rate, profile="flat", duration=None, rotate_bytes=None, rotate_seconds=None,
+             keep=5, tick=DEFAULT_TICK, report_interval=10.0):
+    """Emit events stamped with the current time until duration seconds pass (or Ctrl-C)
+
+    Returns a dict of sourcetype -> events written.
+    """
+    total = sum(DEFAULT_VOLUMES[sourcetype] for sourcetype in SOURCETYPES)
+    shares = {sourcetype: DEFAULT_VOLUMES[sourcetype] / total for sourcetype in SOURCETYPES}
+    compiled = {sourcetype: generator.compile_spec(sourcetype) for sourcetype in SOURCETYPES}
+    writers = {sourcetype: RotatingWriter(os.path.join(generator.output_dir, filename), header, newline,
+                                          rotate_bytes=rotate_bytes, rotate_seconds=rotate_seconds, keep=keep)
+               for sourcetype, (filename, header, newline) in SOURCETYPES.items()}
+    rate_at = RateProfile(rate, profile, random.Random(generator.rng.getrandbits(64)))
+    due = dict.fromkeys(SOURCETYPES, 0.0)
+    counts = dict.fromkeys(SOURCETYPES, 0)
+
+    print(f"Live mode: {rate} events/sec ({profile} profile) into {generator.output_dir}; Ctrl-C to stop")
+    started = last = time.monotonic()
+    deadline = started
+    next_report = started + report_interval
+    reported_events, reported_at = 0, started
+    try:
+        while duration is None or last - started < duration:
+            # Absolute deadlines (start + k * tick), so sleep overshoot does not accumulate
+            deadline += tick
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -tick:
+                # Fell behind (e.g. suspended); the due-event accounting below catches up
+                deadline = time.monotonic()
+
+            now = time.monotonic()
+            wall = time.time()
+            # Events due are the rate times the time actually elapsed, so late ticks write more
+            current_rate = rate_at(wall)
+            target = current_rate * (now - last)
+            last = now
+            moment = datetime.fromtimestamp(int(wall))
+            midnight = moment.replace(hour=0, minute=0, second=0)
+            offset = int((moment - midnight).total_seconds())
+            for sourcetype, share in shares.items():
+                due[sourcetype] += target * share
+                batch = int(due[sourcetype])
+                if batch:
+                    due[sourcetype] -= batch
+                    events = list(compiled[sourcetype].iter_events([offset] * batch, midnight, 0))
+                    writers[sourcetype].write_batch(events)
+                    counts[sourcetype] += batch
+
+            if now >= next_report:
+                written = sum(counts.values())
+                print(f"  {written} events written, {(written - reported_events) / (now - reported_at):,.1f} "
+                      f"events/sec (target now {current_rate:,.1f})")
+                reported_events, reported_at = written, now
+                next_report = now + report_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    elapsed = max(time.monotonic() - started, 1e-9)
+    written = sum(counts.values())
+    print(f"Live mode stopped: {written} events in {elapsed:.1f}s ({written / elapsed:,.1f} events/sec)")
+    for sourcetype, count in counts.items():
+        rotations = writers[sourcetype].rotations
+        print(f"  {sourcetype}: {count} events" + (f", {rotations} rotations" if rotations else ""))
+    return counts
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Partitioned output: each sourcetype written into a host=<h>/date=<d>/ tree
+
+With --partition host,day the generator writes
+
+    <output-dir>/host=www3/date=2024-05-01/access_30DAY.log
+    <output-dir>/host=www3/date=2024-05-01/linux_s_30DAY.log
+    ...
+
+instead of one file per sourcetype, matching a production layout of many
+hosts with daily files, so parallel forwarders (or Splunk's host_segment)
+can ingest it. --partition host or --partition day give one level only.
+
+Hosts come from the --hosts N space (www1..wwwN, Zipf-skewed by
+--host-skew): linux_secure events name their host in the event, so their
+partition follows it; access and db_audit events carry no host, so each
+event's host is drawn from the same space as metadata. Days come from the
+event timestamps.
+
+PartitionedWriter buffers events per partition and hands them to a pool of
+writer threads. Each partition belongs to one writer, which keeps a bounded
+LRU of open files (closing the least recently used, reopening for append),
+so any number of hosts and days works within --max-open-files handles.
+"""
+
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from generate_course_data import DEFAULT_BATCH_SIZE, EventWriter, compress_block
+
+PARTITION_FIELDS = ("host", "day")
+DEFAULT_WRITERS = 4
+DEFAULT_MAX_OPEN = 64
+# Events held in partition buffers before they are handed to the writers
+BUFFERED_EVENTS = 200000
+
+# Host of events that name it themselves, by sourcetype
+HOST_FIELDS = {
+    "linux_secure": lambda line: line.split(" ", 6)[5],
+}
+
+# The date part of built-in sourcetypes' timestamps, sliced as is; others parse the whole time key
+DATE_TEXT = {
+    "access_combined_wcookie": lambda line: line[(start := line.index("[") + 1):start + 11],
+    "db_audit": lambda line: line[0:11],
+    "linux_secure": lambda line: line[0:15],
+}
+
+
+def parse_partition(text):
+    """Partition fields from a comma-separated list such as "host,day" """
+    fields = tuple(field.strip() for field in text.split(",") if field.strip())
+    unknown = [field for field in fields if field not in PARTITION_FIELDS]
+    if not fields or unknown or len(set(fields)) != len(fields):
+        raise ValueError(f"invalid partition {text!r}: expected a comma-separated list of {', '.join(PARTITION_FIELDS)}")
+    return fields
+
+
+def _day_of(sourcetype, time_key):
+    """Callable returning the YYYY-MM-DD day of an event line, parsing each distinct date once"""
+    date_text = DATE_TEXT.get(sourcetype, lambda line: time_key(line)[:3])
+    days = {}
+
+    def day_of(line):
+        text = days.get(date_text(line))
+        if text is None:
+            year, month, day, _ = time_key(line)
+            text = days[date_text(line)] = f"{year}-{month:02d}-{int(day):02d}"
+        return text
+    return day_of
+
+
+def _host_of(sourcetype, hosts, random):
+    """Callable returning the host of an event line: its own host field, or a draw from hosts"""
+    if sourcetype in HOST_FIELDS:
+        return HOST_FIELDS[sourcetype]
+    if hosts is None:
+        raise ValueError("host partitioning needs a host space (--hosts)")
+    return lambda line: hosts.sample(random)
+
+
+def partitioner(fields, sourcetype, time_key, hosts=None, random=None):
+    """Callable mapping an event line to its partition, a tuple of directory names
+
+    e.g. ("host=www3", "date=2024-05-01") for fields ("host", "day"). time_key
+    is the sourcetype's TIME_KEYS entry; hosts (an EntitySpace) and random
+    draw hosts for events without a host field.
+    """
+    if fields == ("host", "day"):
+        host_of, day_of = _host_of(sourcetype, hosts, random), _day_of(sourcetype, time_key)
+        return lambda line: ("host=" + host_of(line), "date=" + day_of(line))
+    if fields == ("day", "host"):
+        host_of, day_of = _host_of(sourcetype, hosts, random), _day_of(sourcetype, time_key)
+        return lambda line: ("date=" + day_of(line), "host=" + host_of(line))
+    if fields == ("host",):
+        host_of = _host_of(sourcetype, hosts, random)
+        return lambda line: ("host=" + host_of(line),)
+    day_of = _day_of(sourcetype, time_key)
+    return lambda line: ("date=" + day_of(line),)
+
+
+class _PartitionFiles:
+    """The partitions owned by one writer thread, with an LRU of at most max_open open files"""
+
+    def __init__(self, root, filename, header, compression, max_open):
+        self.root = root
+        self.filename = filename
+        self.header = header
+        self.compression = compression
+        self.max_open = max_open
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.handles = OrderedDict()
+        self.created = set()
+        self.opens = 0
+
+    def write(self, partition, data):
+        """Append data to partition's file (runs on this writer's thread only)"""
+        handle = self.handles.pop(partition, None)
+        if handle is None:
+            directory = os.path.join(self.root, *partition)
+            path = os.path.join(directory, self.filename)
+            if partition in self.created:
+                handle = open(path, 'ab')
+            else:
+                # First write this run: replace any file left by an earlier run
+                os.makedirs(directory, exist_ok=True)
+                handle = open(path, 'wb')
+                self.created.add(partition)
+                if self.header is not None:
+                    handle.write(compress_block(self.header, self.compression))
+            self.opens += 1
+            if len(self.handles) >= self.max_open:
+                self.handles.popitem(last=False)[1].close()
+        self.handles[partition] = handle
+        handle.write(compress_block(data, self.compression))
+
+    def close_files(self):
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+
+
+class PartitionedWriter:
+    """EventWriter counterpart that writes each event to its partition's file under root
+
+    partition_key maps an event line to its partition (see partitioner).
+    Supports write_many, count, bytes, observer, metrics and max_bytes like
+    EventWriter. Events are buffered per partition until buffered_events
+    are held, then handed to `writers` threads (file writes and compression
+    release the GIL, so they overlap generation). Each writer keeps at most
+    max_open // writers files open.
+    """
+
+    def __init__(self, root, filename, partition_key, header=None, newline="\n", batch_size=DEFAULT_BATCH_SIZE,
+                 max_bytes=None, compression=None, writers=DEFAULT_WRITERS, max_open=DEFAULT_MAX_OPEN,
+                 buffered_events=BUFFERED_EVENTS, observer=None, metrics=None, label=None):
+        self.root = root
+        self.filename = filename
+        self.partition_key = partition_key
+        self.newline = newline
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.buffered_events = buffered_events
+        self.observer = observer
+        self.metrics = metrics
+        self.label = label
+        self.count = 0
+        self.bytes = 0
+        header = None if header is None else (header + newline).encode()
+        per_writer = max(1, max_open // writers)
+        self.writers = [_PartitionFiles(root, filename, header, compression, per_writer) for _ in range(writers)]
+        self.pending = deque()
+        # partition -> events buffered for it
+        self.buffers = {}
+        self.buffered = 0
+
+    # Same trimming to max_bytes as EventWriter
+    _fit = EventWriter._fit
+
+    def write_many(self, events):
+        """Write every event from an iterable to its partition; returns the number written"""
+        events = iter(events)
+        written = 0
+        buffers = self.buffers
+        partition_key = self.partition_key
+        newline_size = len(self.newline)
+        clock = time.perf_counter
+        while self.max_bytes is None or self.bytes < self.max_bytes:
+            started = clock()
+            batch = list(islice(events, self.batch_size))
+            if not batch:
+                break
+            if self.max_bytes is not None:
+                batch = self._fit(batch)
+            generated = clock()
+            if self.observer is not None:
+                self.observer(batch)
+            observed = clock()
+            size = newline_size * len(batch)
+            for event in batch:
+                partition = partition_key(event)
+                buffer = buffers.get(partition)
+                if buffer is None:
+                    buffer = buffers[partition] = []
+                buffer.append(event)
+                size += len(event)
+            formatted = clock()
+            self.buffered += len(batch)
+            if self.buffered >= self.buffered_events:
+                self.flush()
+            self.bytes += size
+            written += len(batch)
+            if self.metrics is not None:
+                self.metrics.record(self.label, len(batch), size, generated - started, observed - generated,
+                                    formatted - observed, clock() - formatted)
+        self.count += written
+        return written
+
+    def flush(self):
+        """Hand every partition's buffered events to the writer that owns it"""
+        for partition, events in self.buffers.items():
+            data = (self.newline.join(events) + self.newline).encode()
+            writer = self.writers[hash(partition) % len(self.writers)]
+            self.pending.append(writer.pool.submit(writer.write, partition, data))
+            # Bound the chunks in flight so memory stays proportional to the buffer
+            while len(self.pending) > 8 * len(self.writers):
+                self.pending.popleft().result()
+        self.buffers.clear()
+        self.buffered = 0
+
+    @property
+    def partitions(self):
+        """Partition files written so far"""
+        return sum(len(writer.created) for writer in self.writers)
+
+    @property
+    def opens(self):
+        """Files opened so far, counting reopens after LRU eviction"""
+        return sum(writer.opens for writer in self.writers)
+
+    def close(self):
+        started = time.perf_counter()
+        self.flush()
+        while self.pending:
+            self.pending.popleft().result()
+        for writer in self.writers:
+            writer.pool.submit(writer.close_files).result()
+            writer.pool.shutdown()
+        if self.metrics is not None:
+            self.metrics.add_time(self.label, "write", time.perf_counter() - started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
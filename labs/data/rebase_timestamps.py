@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Shift the timestamps of existing course data files so the data ends "now"
+
+The committed and previously generated files carry fixed dates, so
+earliest=-30d searches come back empty once time moves on. This tool
+moves every event by the same offset instead of regenerating:
+
+- by default the offset is whole days, chosen so the latest event falls on
+  today; times of day (and with them the daily traffic pattern) are kept.
+  --exact shifts to the second so the latest event is exactly --end.
+- uncompressed files are rewritten in place through mmap: every built-in
+  timestamp format is fixed width, so each timestamp is overwritten in
+  its own bytes and nothing else in the file moves
+- .gz/.zst files (or formats whose width could change) are streamed
+  through in chunks into a new file that replaces the original
+
+Usage:
+    python rebase_timestamps.py access_30DAY.log db_audit_30DAY.csv linux_s_30DAY.log
+    python rebase_timestamps.py --end 2025-12-01T00:00:00 --exact db_audit_30DAY.csv
+    python rebase_timestamps.py --offset-days 7 --sourcetype linux_secure secure.log
+"""
+
+import argparse
+import mmap
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+from generate_course_data import SOURCETYPES, compress_block
+from event_formats import (TIME_OF_DAY_WIDTH, compression_of, date_format, open_binary, sourcetype_for_path,
+                           timestamp_format, timestamp_start)
+
+# Directives that always format to the same width
+FIXED_WIDTH_DIRECTIVES = set("abdmYHMS")
+
+# Bytes per chunk read and written by the streaming fallback
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def is_fixed_width(fmt):
+    """True if every strftime directive in fmt has a fixed output width"""
+    return all(directive in FIXED_WIDTH_DIRECTIVES for directive in re.findall(r"%(.)", fmt))
+
+
+class TimestampShifter:
+    """Parses and reformats one sourcetype's timestamps as bytes, caching per day
+
+    A timestamp is a date part followed by HH:MM:SS; dates are parsed with
+    strptime once per distinct day and times of day come from a table.
+    """
+
+    def __init__(self, sourcetype):
+        self.sourcetype = sourcetype
+        self.date_format = date_format(sourcetype)
+        self.width = len(datetime(2000, 1, 1).strftime(timestamp_format(sourcetype)))
+        self.date_width = self.width - TIME_OF_DAY_WIDTH
+        self.time_of_day = [f"{h:02d}:{m:02d}:{s:02d}".encode()
+                            for h in range(24) for m in range(60) for s in range(60)]
+        self.seconds_of_day = {text: i for i, text in enumerate(self.time_of_day)}
+        self.day_numbers = {}
+        self.day_texts = {}
+
+    def day_number(self, date_text):
+        """Proleptic ordinal of a formatted date part"""
+        number = self.day_numbers.get(date_text)
+        if number is None:
+            number = datetime.strptime(date_text.decode(), self.date_format).toordinal()
+            self.day_numbers[date_text] = number
+        return number
+
+    def day_text(self, number):
+        text = self.day_texts.get(number)
+        if text is None:
+            text = datetime.fromordinal(number).strftime(self.date_format).encode()
+            self.day_texts[number] = text
+        return text
+
+    def seconds(self, timestamp):
+        """Seconds since day 0 of a formatted timestamp"""
+        return (self.day_number(timestamp[:self.date_width]) * 86400
+                + self.seconds_of_day[timestamp[self.date_width:self.width]])
+
+    def format(self, seconds):
+        day, second = divmod(seconds, 86400)
+        return self.day_text(day) + self.time_of_day[second]
+
+    def date_map(self, days):
+        """Function mapping a date part to the date part days later (whole-day shifts)"""
+        shifted = {}
+
+        def shift(date_text):
+            text = shifted.get(date_text)
+            if text is None:
+                text = shifted[date_text] = self.day_text(self.day_number(date_text) + days)
+            return text
+        return shift
+
+
+def _line_starts(buffer, start):
+    """Yield (line start, line end) for each non-empty line of a buffer from start"""
+    size = len(buffer)
+    position = start
+    find = buffer.find
+    while position < size:
+        end = find(b"\n", position)
+        if end < 0:
+            end = size
+        if end > position:
+            yield position, end
+        position = end + 1
+
+
+def _header_length(path, sourcetype):
+    header = SOURCETYPES[sourcetype][1]
+    return 0 if header is None else len(header) + len(SOURCETYPES[sourcetype][2])
+
+
+def _checked_seconds(shifter, timestamp, number):
+    """shifter.seconds of an event's timestamp, or ValueError naming its line"""
+    try:
+        return shifter.seconds(timestamp)
+    except (KeyError, ValueError):
+        raise ValueError(f"line {number}: cannot parse timestamp {bytes(timestamp)!r}; file left unchanged") from None
+
+
+def timestamp_range(path, sourcetype, shifter):
+    """Seconds (since day 0) of the earliest and latest events in the file, or None when it has none
+
+    Parses every timestamp, so a file that passes can be rewritten in place
+    without failing partway. Files need not be sorted.
+    """
+    earliest = latest = None
+    header = SOURCETYPES[sourcetype][1] is not None
+    if compression_of(path) is None:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for number, (start, end) in enumerate(_line_starts(buffer, _header_length(path, sourcetype)),
+                                                  1 + header):
+                try:
+                    at = timestamp_start(sourcetype, buffer, start, end)
+                except ValueError as e:
+                    raise ValueError(f"line {number}: {e}; file left unchanged") from None
+                seconds = _checked_seconds(shifter, buffer[at:at + shifter.width], number)
+                if latest is None or seconds > latest:
+                    latest = seconds
+                if earliest is None or seconds < earliest:
+                    earliest = seconds
+    else:
+        with open_binary(path) as source:
+            if header:
+                source.readline()
+            for number, line in enumerate(source, 1 + header):
+                try:
+                    at = timestamp_start(sourcetype, line)
+                except ValueError as e:
+                    raise ValueError(f"line {number}: {e}; file left unchanged") from None
+                seconds = _checked_seconds(shifter, line[at:at + shifter.width], number)
+                if latest is None or seconds > latest:
+                    latest = seconds
+                if earliest is None or seconds < earliest:
+                    earliest = seconds
+    return None if latest is None else (earliest, latest)
+
+
+def rebase_in_place(path, sourcetype, shifter, offset):
+    """Overwrite each timestamp in its own bytes through a writable mmap; returns events rebased"""
+    width, date_width = shifter.width, shifter.date_width
+    whole_days = offset % 86400 == 0
+    shift_date = shifter.date_map(offset // 86400)
+    count = 0
+    with open(path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as buffer:
+        for start, end in _line_starts(buffer, _header_length(path, sourcetype)):
+            at = timestamp_start(sourcetype, buffer, start, end)
+            if whole_days:
+                # Times of day are unchanged: only the date part is rewritten
+                buffer[at:at + date_width] = shift_date(buffer[at:at + date_width])
+            else:
+                buffer[at:at + width] = shifter.format(shifter.seconds(buffer[at:at + width]) + offset)
+            count += 1
+        buffer.flush()
+    return count
+
+
+def rebase_streaming(path, sourcetype, shifter, offset):
+    """Rewrite the file through a chunked stream (compressed or variable-width); returns events rebased"""
+    width = shifter.width
+    compression = compression_of(path)
+    count = 0
+    chunk, chunk_size = [], 0
+    with open_binary(path) as source, open(path + ".rebase", 'wb') as out:
+        if SOURCETYPES[sourcetype][1] is not None:
+            chunk.append(source.readline())
+        for line in source:
+            at = timestamp_start(sourcetype, line)
+            line = line[:at] + shifter.format(shifter.seconds(line[at:at + width]) + offset) + line[at + width:]
+            chunk.append(line)
+            chunk_size += len(line)
+            count += 1
+            if chunk_size >= STREAM_CHUNK_SIZE:
+                out.write(compress_block(b"".join(chunk), compression))
+                chunk, chunk_size = [], 0
+        if chunk:
+            out.write(compress_block(b"".join(chunk), compression))
+    os.replace(path + ".rebase", path)
+    return count
+
+
+def rebase_file(path, sourcetype=None, end=None, offset=None, exact=False):
+    """Shift every timestamp in path by offset seconds, or so the data ends at end (default: now)
+
+    Returns (events rebased, offset applied in seconds).
+    """
+    sourcetype = sourcetype or sourcetype_for_path(path)
+    if sourcetype is None:
+        raise ValueError(f"cannot tell the sourcetype of {path}; pass --sourcetype")
+    shifter = TimestampShifter(sourcetype)
+    # Validate the whole file before writing a byte, whatever the offset source:
+    # the in-place rewrite cannot be undone if a line fails halfway through
+    bounds = timestamp_range(path, sourcetype, shifter)
+    if bounds is None:
+        return 0, 0
+    earliest, latest = bounds
+    if offset is None:
+        end = (end or datetime.now()).replace(microsecond=0)
+        target = end.toordinal() * 86400 + end.hour * 3600 + end.minute * 60 + end.second
+        if exact:
+            offset = target - latest
+        else:
+            # Whole days, latest event on end's day (never after end when both are that day)
+            offset = (target // 86400 - latest // 86400) * 86400
+            if latest + offset > target:
+                offset -= 86400
+    try:
+        # Every shifted time lies between these two, so they all format if both do
+        shifter.format(earliest + offset), shifter.format(latest + offset)
+    except (ValueError, OverflowError):
+        raise ValueError(f"shifting by {offset} seconds leaves the supported date range; file left unchanged") from None
+    if compression_of(path) is None and is_fixed_width(timestamp_format(sourcetype)):
+        return rebase_in_place(path, sourcetype, shifter, offset), offset
+    return rebase_streaming(path, sourcetype, shifter, offset), offset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shift timestamps in course data files so the data ends now")
+    parser.add_argument('files', nargs='+', help='access, db_audit or linux_secure files (.gz/.zst allowed)')
+    parser.add_argument('--sourcetype', choices=sorted(SOURCETYPES), default=None,
+                        help='Sourcetype of the files (default: from the file name)')
+    parser.add_argument('--end', type=datetime.fromisoformat, default=None,
+                        help='Where the latest event should land, ISO format (default: now)')
+    parser.add_argument('--exact', action='store_true',
+                        help='Shift to the second so the latest event is exactly --end (default: whole days)')
+    parser.add_argument('--offset-days', type=float, default=None,
+                        help='Shift by this many days (may be negative or fractional) instead of aligning to --end')
+    args = parser.parse_args()
+
+    offset = round(args.offset_days * 86400) if args.offset_days is not None else None
+    failed = False
+    for path in args.files:
+        started = time.perf_counter()
+        try:
+            count, applied = rebase_file(path, args.sourcetype, end=args.end, offset=offset, exact=args.exact)
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        seconds = time.perf_counter() - started
+        print(f"{path}: {count} events shifted by {timedelta(seconds=applied)} "
+              f"in {seconds:.2f}s ({os.path.getsize(path) / 1e6 / max(seconds, 1e-9):.0f} MB/sec)")
+        if os.path.exists(os.path.join(os.path.dirname(path) or ".", "dataset_manifest.json")):
+            print("   Note: dataset_manifest.json checksums no longer match the rebased file")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Instrumentation for generation runs: counters, phase timings, progress and profiling
+
+RunMetrics collects per sourcetype:
+- counters of events, bytes and batches written
+- timing histograms of the phases each batch goes through in EventWriter:
+    generate  drawing and rendering events (RNG draws and field formatting
+              run fused inside the compiled render functions, so they share
+              a phase; --profile splits them)
+    observe   answer keys and index/column sidecars
+    format    joining the batch into output text
+    write     file writes and compression
+  plus "merge" for concatenating or merging the shards of sharded runs
+- progress lines with rate and ETA every progress_interval seconds
+- an end-of-run JSON report with phase totals and peak RSS
+
+Nothing is recorded unless a RunMetrics is passed to DataGenerator:
+EventWriter reads the clock a few times per batch (thousands of events)
+either way and only records when it has metrics, so plain runs are not
+slowed down. Metrics are plain picklable data, so shard workers return
+theirs and the parent merges them.
+
+profiled() wraps a run in cProfile and tracemalloc and writes hot-path
+reports (see --profile in generate_course_data.py).
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Display order of the batch phases
+PHASES = ("generate", "observe", "format", "write", "merge")
+
+# Profile entries are bucketed by function name / file
+RNG_FUNCTIONS = {"randint", "randrange", "_randbelow_with_getrandbits", "choice", "random", "getrandbits",
+                 "integers", "uniform", "beta", "shuffle", "sample", "sample_many", "sample_array"}
+FORMAT_FUNCTIONS = {"strftime", "replace", "join", "format", "render", "lower", "format_array",
+                    "_render_array", "tolist"}
+IO_FUNCTIONS = {"write", "flush", "close", "open", "compress_block", "compress", "_submit_block", "write_raw",
+                "write_many"}
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process and its finished children, in KiB (None when unknown)"""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB on Linux
+    scale = 1024 if sys.platform == "darwin" else 1
+    return max(own, children) // scale
+
+
+def profile_category(filename, function):
+    """rng, formatting, io or other for a cProfile entry"""
+    if function in RNG_FUNCTIONS or "random" in os.path.basename(filename) or "numpy.random" in filename:
+        return "rng"
+    if function in IO_FUNCTIONS:
+        return "io"
+    if function in FORMAT_FUNCTIONS or function.startswith(("iter_", "_iter_")):
+        # Generator bodies' own time is dominated by f-string formatting
+        return "formatting"
+    return "other"
+
+
+def category_split(profiler):
+    """Seconds and fraction of own (exclusive) time per profile_category of a cProfile run"""
+    split = {"rng": 0.0, "formatting": 0.0, "io": 0.0, "other": 0.0}
+    for (filename, _, function), (_, _, own_time, _, _) in pstats.Stats(profiler).stats.items():
+        # Built-in methods show up as e.g. "<method 'write' of '_io.TextIOWrapper' objects>"
+        name = function.split("'")[1] if function.startswith("<") and "'" in function else function
+        split[profile_category(filename, name)] += own_time
+    total = sum(split.values()) or 1.0
+    return {category: {"seconds": round(seconds, 4), "fraction": round(seconds / total, 3)}
+            for category, seconds in split.items()}
+
+
+class Histogram:
+    """Durations counted in power-of-two microsecond buckets; mergeable across processes"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        # bucket b holds durations in [2 ** (b - 1), 2 ** b) microseconds
+        self.buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def quantile(self, q):
+        """Upper bound in seconds of the bucket holding the q-quantile"""
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "seconds": round(self.total, 6),
+            "min": round(self.min or 0.0, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p90": round(self.quantile(0.9), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+            "buckets_us": {str(1 << bucket): count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+class RunMetrics:
+    """Counters, phase timing histograms and progress of one generation run
+
+    With progress_interval, a progress line is printed at most that often;
+    total_events (for the ETA) may also be given later by start().
+    """
+
+    def __init__(self, total_events=None, progress_interval=None):
+        self.progress_interval = progress_interval
+        self.done = 0
+        # sourcetype -> {"events", "bytes", "batches"}
+        self.counters = {}
+        # sourcetype -> {phase: Histogram}
+        self.phases = {}
+        self.start(total_events)
+
+    def start(self, total_events=None):
+        """(Re)start the wall clock, e.g. once setup is done and the volumes are known"""
+        self.total_events = total_events
+        self.started = time.perf_counter()
+        self.next_progress = self.started + self.progress_interval if self.progress_interval else None
+
+    def __getstate__(self):
+        # Progress is only printed by the process that owns the run
+        return dict(self.__dict__, progress_interval=None, next_progress=None)
+
+    def record(self, sourcetype, events, size, generate, observe, format, write):
+        """Count one written batch and time its phases"""
+        counters = self.counters.get(sourcetype)
+        if counters is None:
+            counters = self.counters[sourcetype] = {"events": 0, "bytes": 0, "batches": 0}
+        counters["events"] += events
+        counters["bytes"] += size
+        counters["batches"] += 1
+        self.add_time(sourcetype, "generate", generate)
+        self.add_time(sourcetype, "observe", observe)
+        self.add_time(sourcetype, "format", format)
+        self.add_time(sourcetype, "write", write)
+        self.done += events
+        self.progress(sourcetype)
+
+    def add_time(self, sourcetype, phase, seconds):
+        """Add one timed step of phase for sourcetype"""
+        phases = self.phases.get(sourcetype)
+        if phases is None:
+            phases = self.phases[sourcetype] = {}
+        histogram = phases.get(phase)
+        if histogram is None:
+            histogram = phases[phase] = Histogram()
+        histogram.add(seconds)
+
+    def merge(self, other):
+        """Add the counters and timings of another run (e.g. a shard worker's)"""
+        for sourcetype, counters in other.counters.items():
+            mine = self.counters.setdefault(sourcetype, {"events": 0, "bytes": 0, "batches": 0})
+            for name, value in counters.items():
+                mine[name] += value
+        for sourcetype, phases in other.phases.items():
+            for phase, histogram in phases.items():
+                self.phases.setdefault(sourcetype, {}).setdefault(phase, Histogram()).merge(histogram)
+        self.done += other.done
+
+    def progress(self, sourcetype, force=False):
+        """Print a progress line with rate and ETA when one is due"""
+        if self.next_progress is None:
+            return
+        now = time.perf_counter()
+        if now < self.next_progress and not force:
+            return
+        self.next_progress = now + self.progress_interval
+        elapsed = max(now - self.started, 1e-9)
+        rate = self.done / elapsed
+        line = f"[{elapsed:7.1f}s] {self.done:,} events"
+        if self.total_events:
+            line += f" of {self.total_events:,} ({min(self.done / self.total_events, 1.0):.1%})"
+        line += f", {rate:,.0f} events/sec"
+        if self.total_events and rate > 0 and self.done < self.total_events:
+            line += f", ETA {(self.total_events - self.done) / rate:,.0f}s"
+        print(f"{line} ({sourcetype})", flush=True)
+
+    def report(self):
+        """End-of-run metrics as a JSON-serializable dict"""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        events = sum(counters["events"] for counters in self.counters.values())
+        size = sum(counters["bytes"] for counters in self.counters.values())
+        totals = {}
+        for phases in self.phases.values():
+            for phase, histogram in phases.items():
+                totals[phase] = totals.get(phase, 0.0) + histogram.total
+        return {
+            "seconds": round(elapsed, 3),
+            "events": events,
+            "bytes": size,
+            "events_per_sec": round(events / elapsed),
+            "mb_per_sec": round(size / 1e6 / elapsed, 2),
+            "peak_rss_kb": peak_rss_kb(),
+            # Summed over worker processes in sharded runs
+            "phase_seconds": {phase: round(totals[phase], 4) for phase in PHASES if phase in totals},
+            "sourcetypes": {
+                sourcetype: dict(counters, phases={phase: self.phases[sourcetype][phase].to_dict()
+                                                   for phase in PHASES if phase in self.phases.get(sourcetype, {})})
+                for sourcetype, counters in self.counters.items()
+            },
+        }
+
+    def summary_lines(self):
+        """One line per sourcetype with the share of time in each phase"""
+        lines = []
+        for sourcetype, phases in self.phases.items():
+            total = sum(histogram.total for histogram in phases.values()) or 1e-9
+            shares = ", ".join(f"{phase} {phases[phase].total / total:.0%} ({phases[phase].total:.2f}s)"
+                               for phase in PHASES if phase in phases)
+            lines.append(f"{sourcetype}: {shares}")
+        return lines
+
+    def save(self, path):
+        """Write report() as JSON to path; returns path"""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+        return path
+
+
+@contextlib.contextmanager
+def profiled(output_dir, top=30, label="generation"):
+    """Profile the enclosed block with cProfile and tracemalloc
+
+    Writes <label>_profile.txt (hot paths by own and cumulative time, the
+    rng/formatting/io split and the top allocation sites) and
+    <label>_profile.pstats (for pstats or snakeviz) to output_dir. Only this
+    process is profiled, not shard worker processes.
+    """
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(output_dir, exist_ok=True)
+        stats_path = os.path.join(output_dir, f"{label}_profile.pstats")
+        profiler.dump_stats(stats_path)
+        report = io.StringIO()
+        report.write(f"Time split (own time): {json.dumps(category_split(profiler))}\n")
+        report.write(f"Traced memory: peak {peak / 1e6:.1f} MB, at end {current / 1e6:.1f} MB\n")
+        for order in ("tottime", "cumulative"):
+            report.write(f"\n=== Top {top} functions by {order} ===\n")
+            stats = pstats.Stats(profiler, stream=report)
+            stats.strip_dirs().sort_stats(order).print_stats(top)
+        report.write(f"\n=== Top {top} allocation sites (live at the end) ===\n")
+        for statistic in snapshot.statistics("lineno")[:top]:
+            report.write(f"{statistic}\n")
+        text_path = os.path.join(output_dir, f"{label}_profile.txt")
+        with open(text_path, 'w') as f:
+            f.write(report.getvalue())
+        print(f"Profile written to {text_path} and {stats_path}")
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the network senders (hec_sender.py and syslog_sender.py)
+
+Both feed batches of generated events through a bounded asyncio queue to a
+pool of sender tasks.
+"""
+
+import asyncio
+
+
+async def put_batch(queue, batch, senders):
+    """Queue a batch, surfacing sender failures instead of blocking forever"""
+    put = asyncio.ensure_future(queue.put(batch))
+    while not put.done():
+        running = [task for task in senders if not task.done()]
+        await asyncio.wait([put] + running, return_when=asyncio.FIRST_COMPLETED)
+        for task in senders:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                put.cancel()
+                raise task.exception()
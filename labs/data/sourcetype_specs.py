@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Declarative sourcetype definitions for the course data generator
+
+A sourcetype is described by a JSON (or YAML, when PyYAML is installed) spec:
+
+    {
+      "name": "linux_secure",
+      "file": "linux_s_30DAY.log",
+      "header": null,
+      "newline": "\\n",
+      "volume": 63884,
+      "timestamp": "%a %b %d %Y %H:%M:%S",
+      "pools": {"valid_users": ["nsharpe", "admin", ...]},
+      "fields": {"pid": {"randint": [1000, 99999]}, "host": {"const": "www1"}},
+      "variants": [
+        {"name": "failed_password", "weight": 0.28,
+         "fields": {"user": {"choice": "failed_users"}},
+         "template": "{timestamp} {host} sshd[{pid}]: Failed password for invalid user {user} ..."}
+      ]
+    }
+
+"volume" is the event count of the default 30-day dataset. Field samplers
+are {"choice": pool name or list, "weights": [...]} (or "zipf": exponent
+for Zipfian popularity in pool order), {"randint": [lo, hi]} or
+{"const": value}; variant fields override top-level ones. Choice pools
+are looked up in the spec's "pools", then in the pools the generator
+provides at compile time (session_ids, product_ids), which may come with
+default weights (e.g. --product-skew). A sampler may also name an entity
+space, {"choice": "client_ips", "entity": "client_ip"}: when the generator
+configures that space (--client-ips N, see entities.py) the field is drawn
+from it instead; this also applies to const fields, e.g. linux_secure's
+{"const": "www1", "entity": "host"} spreads events over --hosts N hosts.
+
+Variants and weighted choices are drawn from alias tables (see
+weighted_sampler.py), so a draw costs the same however many values or
+variants there are.
+
+CompiledSourcetype turns each variant into a generated Python function whose
+body samples exactly the fields its template uses and returns a single
+f-string, so rendering an event is one call with no template scanning.
+Timestamps come from TimestampTable's per-day and per-second strings.
+For the numpy engine, iter_events_numpy renders the same variants and
+samplers in vectorized batches instead (same distributions, a different
+random stream).
+"""
+
+import json
+import os
+import re
+from datetime import datetime, time, timedelta
+from string import Formatter
+
+from weighted_sampler import AliasTable, zipf_weights
+
+try:
+    import yaml
+except ImportError:  # YAML specs are optional
+    yaml = None
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sourcetypes")
+
+MONTHS = {month: i for i, month in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)}
+
+# Regex for each strftime directive a spec timestamp may use
+_DIRECTIVES = {"a": r"[A-Z][a-z]{2}", "b": r"(?P<b>[A-Z][a-z]{2})", "d": r"(?P<d>\d{2})",
+               "m": r"(?P<m>\d{2})", "Y": r"(?P<Y>\d{4})", "H": r"(?P<H>\d{2})",
+               "M": r"(?P<M>\d{2})", "S": r"(?P<S>\d{2})"}
+
+
+class SpecError(ValueError):
+    """Raised for an invalid sourcetype spec"""
+
+
+class TimestampTable:
+    """Formats start_date + N seconds from precomputed per-day and per-second strings
+
+    The format must end in %H:%M:%S. The date part is rendered once per day
+    and the time of day is looked up in a shared table of 86,400 strings, so
+    no strftime call is needed per event.
+    """
+
+    _time_of_day = None
+
+    def __init__(self, start_date, days, fmt):
+        if not fmt.endswith("%H:%M:%S"):
+            raise ValueError(f"timestamp format must end in %H:%M:%S: {fmt}")
+        start = start_date.replace(microsecond=0)
+        self.base = start.hour * 3600 + start.minute * 60 + start.second
+        first_day = datetime.combine(start.date(), time())
+        self.dates = [(first_day + timedelta(days=d)).strftime(fmt[:-8]) for d in range(days + 2)]
+        if TimestampTable._time_of_day is None:
+            TimestampTable._time_of_day = [f"{h:02d}:{m:02d}:{s:02d}"
+                                           for h in range(24) for m in range(60) for s in range(60)]
+        self.time_of_day = TimestampTable._time_of_day
+
+    def format(self, offset):
+        """Format the timestamp offset seconds after start_date"""
+        total = self.base + offset
+        return self.dates[total // 86400] + self.time_of_day[total % 86400]
+
+    def format_array(self, offsets):
+        """Format a numpy array of offsets, returning an object array of strings"""
+        import numpy as np
+        total = offsets + self.base
+        dates = np.array(self.dates, dtype=object)
+        time_of_day = np.array(self.time_of_day, dtype=object)
+        return dates[total // 86400] + time_of_day[total % 86400]
+
+
+def make_time_key(fmt):
+    """Sort key for lines whose first timestamp has strftime format fmt
+
+    Returns (year, month, day, "HH:MM:SS") like the built-in time keys, so
+    keys from every sourcetype compare and convert the same way.
+    """
+    pattern = re.sub(r"%(.)", lambda m: _DIRECTIVES.get(m.group(1), re.escape(m.group(0))),
+                     re.escape(fmt).replace(r"\%", "%"))
+    regex = re.compile(pattern)
+
+    def time_key(line):
+        match = regex.search(line)
+        if match is None:
+            raise ValueError(f"no {fmt} timestamp in line: {line[:80]!r}")
+        parts = match.groupdict()
+        month = MONTHS[parts["b"]] if parts.get("b") else int(parts["m"])
+        return parts["Y"], month, parts["d"], f"{parts['H']}:{parts['M']}:{parts['S']}"
+
+    return time_key
+
+
+def load_spec(path):
+    """Load a sourcetype spec from a .json, .yaml or .yml file"""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise SpecError(f"{path}: YAML specs require the PyYAML package")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    for key in ("name", "file", "volume", "timestamp", "variants"):
+        if key not in spec:
+            raise SpecError(f"{path}: missing required key '{key}'")
+    return spec
+
+
+def builtin_spec_paths():
+    """Paths of the specs shipped in the sourcetypes/ directory"""
+    return sorted(os.path.join(SPEC_DIR, name) for name in os.listdir(SPEC_DIR)
+                  if name.endswith((".json", ".yaml", ".yml")))
+
+
+class CompiledSourcetype:
+    """A spec compiled into per-variant formatter functions bound to an RNG"""
+
+    def __init__(self, spec, rng, pools=None, pool_weights=None, entities=None):
+        self.spec = spec
+        self.name = spec["name"]
+        self.file = spec["file"]
+        self.header = spec.get("header")
+        self.newline = spec.get("newline", "\n")
+        self.volume = spec["volume"]
+        self.timestamp = spec["timestamp"]
+        self.pools = dict(pools or {})
+        self.pools.update(spec.get("pools", {}))
+        self.pool_weights = {name: weights for name, weights in (pool_weights or {}).items()
+                             if name not in spec.get("pools", {})}
+        self.entities = entities or {}
+        self.rng = rng
+
+        self.variants = []
+        # (template, fields) per variant, for iter_events_numpy
+        self.templates = []
+        weights = []
+        for index, variant in enumerate(spec["variants"]):
+            fields = dict(spec.get("fields", {}))
+            fields.update(variant.get("fields", {}))
+            self.variants.append(self._compile_variant(index, variant, fields))
+            self.templates.append((variant["template"], fields))
+            weights.append(float(variant.get("weight", 1)))
+        if sum(weights) <= 0:
+            raise SpecError(f"{self.name}: variant weights must add up to more than 0")
+        self.table = AliasTable(weights)
+
+    def _pool(self, source):
+        if isinstance(source, list):
+            return source
+        if source not in self.pools:
+            raise SpecError(f"{self.name}: unknown pool '{source}'")
+        return self.pools[source]
+
+    def _sampler_code(self, name, sampler, namespace):
+        """Python expression drawing one value for a field; constants return None"""
+        if sampler.get("entity") in self.entities:
+            entity_name = f"entity_{len(namespace)}"
+            namespace[entity_name] = self.entities[sampler["entity"]].sample
+            return f"{entity_name}(random)"
+        if "const" in sampler:
+            return None
+        if "randint" in sampler:
+            low, high = sampler["randint"]
+            return f"{int(low)} + int(random() * {int(high) - int(low) + 1})"
+        if "choice" in sampler:
+            pool = [str(value) for value in self._pool(sampler["choice"])]
+            pool_name = f"pool_{len(namespace)}"
+            namespace[pool_name] = pool
+            weights = self._choice_weights(name, sampler, pool)
+            if weights is not None:
+                # Inlined alias draw: one uniform picks a column, its fraction picks value or alias
+                threshold, own, alias = AliasTable(weights).remap(pool)
+                namespace[pool_name] = own
+                namespace[pool_name + "_threshold"] = threshold
+                namespace[pool_name + "_alias"] = alias
+                return (f"({pool_name}[c] if (u := random() * {len(pool)}) - (c := int(u)) < {pool_name}_threshold[c] "
+                        f"else {pool_name}_alias[c])")
+            return f"{pool_name}[int(random() * {len(pool)})]"
+        raise SpecError(f"{self.name}: field '{name}' has no choice, randint or const sampler")
+
+    def _choice_weights(self, name, sampler, pool):
+        """Weights of a choice sampler's pool (explicit, Zipfian or the generator's), or None for uniform"""
+        weights = sampler.get("weights")
+        if "zipf" in sampler:
+            weights = zipf_weights(len(pool), sampler["zipf"])
+        elif weights is None and isinstance(sampler["choice"], str):
+            weights = self.pool_weights.get(sampler["choice"])
+        if weights is not None and len(weights) != len(pool):
+            raise SpecError(f"{self.name}: field '{name}' has {len(pool)} values but {len(weights)} weights")
+        return weights
+
+    def _array_sampler(self, name, sampler, suffix=""):
+        """Callable (numpy Generator, n) -> object array of n values of a field, each followed by suffix
+
+        None for constants. Draws follow the same distributions as _sampler_code.
+        """
+        import numpy as np
+        entity = self.entities.get(sampler.get("entity"))
+        if entity is not None:
+            return lambda rng, n: np.array(entity.sample_array(rng, n), dtype=object) + suffix
+        if "const" in sampler:
+            return None
+        if "randint" in sampler:
+            low, high = (int(bound) for bound in sampler["randint"])
+            if high - low < 1 << 16:
+                numbers = np.array([f"{value}{suffix}" for value in range(low, high + 1)], dtype=object)
+                return lambda rng, n: numbers[rng.integers(0, len(numbers), n)]
+            return lambda rng, n: rng.integers(low, high + 1, n).astype(str).astype(object) + suffix
+        if "choice" in sampler:
+            pool = [str(value) for value in self._pool(sampler["choice"])]
+            weights = self._choice_weights(name, sampler, pool)
+            values = np.array([value + suffix for value in pool], dtype=object)
+            if weights is not None:
+                table = AliasTable(weights)
+                return lambda rng, n: values[table.sample_array(rng, n)]
+            return lambda rng, n: values[rng.integers(0, len(values), n)]
+        raise SpecError(f"{self.name}: field '{name}' has no choice, randint or const sampler")
+
+    def _array_plan(self, template, fields):
+        """A variant's template as parts for _render_array: literal strings, None for the
+        timestamp and (field, sampler) pairs, with constants and the literal after each
+        drawn field folded in"""
+        parts = []
+        for literal, field, _, _ in Formatter().parse(template):
+            if literal:
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += literal
+                else:
+                    parts.append(literal)
+            if field is None:
+                continue
+            if field == "timestamp":
+                parts.append(None)
+            elif "const" in fields[field] and fields[field].get("entity") not in self.entities:
+                const = str(fields[field]["const"])
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += const
+                else:
+                    parts.append(const)
+            else:
+                parts.append((field, fields[field]))
+        plan = []
+        drawn = set()
+        position = 0
+        while position < len(parts):
+            part = parts[position]
+            if isinstance(part, tuple) and part[0] not in drawn:
+                field, sampler = part
+                drawn.add(field)
+                # A field used again later must be drawn bare, so each use shows the same value
+                reused = any(isinstance(other, tuple) and other[0] == field for other in parts[position + 1:])
+                following = parts[position + 1] if position + 1 < len(parts) else None
+                if isinstance(following, str) and not reused:
+                    plan.append((field, self._array_sampler(field, sampler, following)))
+                    position += 2
+                    continue
+                plan.append((field, self._array_sampler(field, sampler)))
+            else:
+                plan.append(part)
+            position += 1
+        return plan
+
+    @staticmethod
+    def _render_array(plan, rng, timestamps, offsets):
+        """Object array of events rendered from plan, one per offset"""
+        import numpy as np
+        n = len(offsets)
+        drawn = {}
+        text = None
+        for part in plan:
+            if part is None:
+                value = timestamps.format_array(offsets)
+            elif isinstance(part, str):
+                value = part
+            else:
+                field, draw = part
+                if field not in drawn:
+                    drawn[field] = draw(rng, n)
+                value = drawn[field]
+            text = value if text is None else text + value
+        if text is None or isinstance(text, str):
+            return np.full(n, text or "", dtype=object)
+        return text
+
+    def _compile_variant(self, index, variant, fields):
+        """Generate and compile a function rendering one variant from a timestamp string"""
+        namespace = {"random": self.rng.random}
+        body = []
+        sampled = set()
+        text = []
+        for literal, field, format_spec, conversion in Formatter().parse(variant["template"]):
+            text.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if format_spec or conversion:
+                raise SpecError(f"{self.name}: format specs are not supported in templates ({field})")
+            if field == "timestamp":
+                text.append("{timestamp}")
+                continue
+            if field not in fields:
+                raise SpecError(f"{self.name}: template field '{field}' is not defined")
+            if not field.isidentifier():
+                raise SpecError(f"{self.name}: field name '{field}' is not a valid identifier")
+            code = self._sampler_code(field, fields[field], namespace)
+            if code is None:
+                text.append(str(fields[field]["const"]).replace("{", "{{").replace("}", "}}"))
+                continue
+            if field not in sampled:
+                body.append(f"    f_{field} = {code}")
+                sampled.add(field)
+            text.append("{f_" + field + "}")
+        body.append("    return f" + repr("".join(text)))
+        source = "def render(timestamp):\n" + "\n".join(body) + "\n"
+        exec(compile(source, f"<{self.name}:{variant.get('name', index)}>", "exec"), namespace)
+        return namespace["render"]
+
+    def iter_events(self, offsets, start_date, days):
+        """Yield one formatted event per offset (seconds after start_date)"""
+        timestamps = TimestampTable(start_date, days, self.timestamp)
+        format_timestamp = timestamps.format
+        threshold, variants, alias = self.table.remap(self.variants)
+        n = len(variants)
+        random = self.rng.random
+        for offset in offsets:
+            u = random() * n
+            column = int(u)
+            render = variants[column] if u - column < threshold[column] else alias[column]
+            yield render(format_timestamp(offset))
+
+    def iter_events_numpy(self, rng, offset_batches, start_date, days):
+        """Yield one formatted event per offset from batches of offsets (numpy arrays)
+
+        Variants and fields are drawn as arrays from the numpy Generator rng
+        and each variant's events are rendered in bulk: the distributions of
+        iter_events, but not its random stream.
+        """
+        import numpy as np
+        timestamps = TimestampTable(start_date, days, self.timestamp)
+        plans = [self._array_plan(template, fields) for template, fields in self.templates]
+        for offsets in offset_batches:
+            variants = self.table.sample_array(rng, len(offsets))
+            lines = np.empty(len(offsets), dtype=object)
+            for index, plan in enumerate(plans):
+                rows = np.flatnonzero(variants == index)
+                if len(rows):
+                    lines[rows] = self._render_array(plan, rng, timestamps, offsets[rows])
+            yield from lines.tolist()
@@ -0,0 +1,948 @@
+#!/usr/bin/env python3
+"""
+Offline executor for the subset of SPL the labs use
+
+Runs lab searches over the generated files with no Splunk instance, so the
+course validator can check that each search returns sensible results on
+the data DataGenerator produces. Supported:
+
+- the base search: terms and phrases, field=value / != / < > <= >= with *
+  wildcards, AND / OR / NOT and parentheses (OR binds tighter than AND, as
+  in Splunk), index=, sourcetype=, earliest= and latest= (relative times
+  such as -30d@d are relative to the latest event unless a "now" is given)
+- search (where earliest= and latest= bound _time, relative to the latest
+  result unless a "now" is given), stats (count, dc, sum, avg, min, max,
+  values ... as ... by ...), top, rare, table, fields, rename, sort, dedup,
+  head, tail
+- lookup and inputlookup against products.csv (products_lookup), and
+  the Lab 8 automatic lookup giving access events ProductName and Price
+
+Each sourcetype's file is parsed once by the event_formats field
+extractors into a ResultTable of columns (field -> list of values), and
+filters and commands work column-wise on those batches.
+
+Usage:
+    python spl_engine.py 'index=main sourcetype=access_combined_wcookie status=200 | stats count by file'
+    python spl_engine.py --data-dir /tmp/course 'index=main sourcetype=db_audit | stats avg(Duration) by Command'
+"""
+
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import compress
+
+from generate_course_data import SOURCETYPES, COMPRESSION_SUFFIXES
+from event_formats import FIELD_PARSERS, EventClock, epoch_seconds, from_epoch_seconds, open_binary
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Lookup definitions: name in SPL -> CSV file in the data directory
+LOOKUPS = {"products_lookup": "products.csv", "products.csv": "products.csv"}
+
+# Automatic lookups applied to every event of a sourcetype as it is loaded, as configured in
+# Lab 8 (products_auto_lookup): sourcetype -> [(lookup, [(lookup field, event field)] inputs, outputs)]
+AUTOMATIC_LOOKUPS = {
+    "access_combined_wcookie": [
+        ("products_lookup", [("productId", "productId")], [("product_name", "ProductName"), ("price", "Price")]),
+    ],
+}
+
+# Default row limits of sort, head, tail and top/rare
+SORT_LIMIT = 10000
+HEAD_LIMIT = 10
+TOP_LIMIT = 10
+
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[(),]|!=|<=|>=|[=<>]|[^\s(),=!<>"]+')
+RELATIVE_TIME = re.compile(r"^([+-]\d*)?([a-z]+)?(?:@([a-z]+)\d*)?$")
+TIME_UNITS = {
+    "s": "s", "sec": "s", "secs": "s", "second": "s", "seconds": "s",
+    "m": "m", "min": "m", "mins": "m", "minute": "m", "minutes": "m",
+    "h": "h", "hr": "h", "hrs": "h", "hour": "h", "hours": "h",
+    "d": "d", "day": "d", "days": "d",
+    "w": "w", "week": "w", "weeks": "w",
+    "mon": "mon", "month": "mon", "months": "mon",
+    "y": "y", "yr": "y", "year": "y", "years": "y",
+}
+UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+# Default-extracted date_* fields, computed from _time when a search uses them
+DATE_FIELDS = {
+    "date_year": lambda t: str(t.year),
+    "date_month": lambda t: t.strftime("%B").lower(),
+    "date_mday": lambda t: str(t.day),
+    "date_wday": lambda t: t.strftime("%A").lower(),
+    "date_hour": lambda t: str(t.hour),
+    "date_minute": lambda t: str(t.minute),
+    "date_second": lambda t: str(t.second),
+}
+
+
+class SplError(ValueError):
+    """A search the engine cannot parse"""
+
+
+class UnsupportedCommand(SplError):
+    """A valid search using a command (or lookup) outside the supported subset"""
+
+
+def _unquote(token):
+    if len(token) >= 2 and token[0] == token[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+    return token
+
+
+def _wildcard(pattern):
+    """Case-insensitive full-match regex for a value with * wildcards"""
+    return re.compile(".*".join(re.escape(part) for part in pattern.split("*")), re.IGNORECASE | re.DOTALL)
+
+
+def _number(value):
+    """value as an int or float, or None when it is not numeric"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+
+def _sort_key(value):
+    """Orders numbers numerically before strings lexicographically, with missing values last"""
+    if value is None:
+        return (2, 0, "")
+    number = _number(value)
+    if number is not None:
+        return (0, number, "")
+    return (1, 0, str(value))
+
+
+def split_pipeline(spl):
+    """Commands of a search, split at | outside quotes; a leading | starts with a generating command"""
+    commands, current, quoted, escaped = [], [], False, False
+    for char in spl:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == "|" and not quoted:
+            commands.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    commands.append("".join(current).strip())
+    if quoted:
+        raise SplError("unbalanced quotes")
+    return commands
+
+
+class ResultTable:
+    """Search results as columns: field name -> list of values (None where a row lacks the field)
+
+    A table made from another (base) table copies a base column only when
+    it is first used, for the selected rows (all rows when rows is None),
+    so filters and reordering never touch columns a search does not read.
+    """
+
+    def __init__(self, columns=None, length=None, base=None, rows=None, names=None):
+        self._columns = dict(columns or {})
+        self._base = base
+        self._rows = None if rows is None else list(rows)
+        if names is None:
+            names = base.fields() if base is not None else []
+            names += [name for name in self._columns if name not in names]
+        self._names = names
+        if length is None:
+            if self._rows is not None:
+                length = len(self._rows)
+            elif base is not None:
+                length = len(base)
+            else:
+                length = len(next(iter(self._columns.values()))) if self._columns else 0
+        self.length = length
+        # Leaf search masks and lowercased columns, reused by later searches over the same table
+        self.cache = {}
+
+    def __len__(self):
+        return self.length
+
+    def fields(self):
+        return list(self._names)
+
+    def column(self, name):
+        values = self._columns.get(name)
+        if values is not None:
+            return values
+        if self._base is not None and name in self._names:
+            values = self._base.column(name)
+            if self._rows is not None:
+                values = list(map(values.__getitem__, self._rows))
+        elif name in DATE_FIELDS and "_time" in self._names:
+            part = DATE_FIELDS[name]
+            values = [None if t is None else part(from_epoch_seconds(t)) for t in self.column("_time")]
+            self._names.append(name)
+        else:
+            return [None] * self.length
+        self._columns[name] = values
+        return values
+
+    def lowered(self, name):
+        """Column name with string values lowercased (cached)"""
+        key = ("lower", name)
+        if key not in self.cache:
+            self.cache[key] = [value.lower() if isinstance(value, str) else value for value in self.column(name)]
+        return self.cache[key]
+
+    def take(self, rows):
+        """Table of the given row numbers, in that order"""
+        return ResultTable(base=self, rows=rows)
+
+    def rows(self):
+        """Each row as a dict of its non-missing fields"""
+        names = self.fields()
+        for values in zip(*(self.column(name) for name in names)):
+            yield {name: value for name, value in zip(names, values) if value is not None}
+
+    @classmethod
+    def concat(cls, tables):
+        tables = [table for table in tables if len(table)]
+        if len(tables) == 1:
+            return tables[0]
+        names = {}
+        for table in tables:
+            names.update(dict.fromkeys(table.fields()))
+        columns = {name: [] for name in names}
+        for table in tables:
+            for name in names:
+                columns[name].extend(table.column(name))
+        return cls(columns, sum(len(table) for table in tables))
+
+    def format(self, limit=20, fields=None):
+        """The first limit rows as a text table (internal fields other than _time hidden)"""
+        names = fields or [name for name in self.fields() if not name.startswith("_") or name == "_time"]
+        shown = []
+        for row in range(min(limit, self.length)):
+            values = []
+            for name in names:
+                value = self.column(name)[row]
+                if name == "_time" and value is not None:
+                    value = from_epoch_seconds(value).isoformat(sep=" ")
+                elif isinstance(value, float):
+                    value = f"{value:.6g}"
+                elif isinstance(value, list):
+                    value = " ".join(map(str, value))
+                values.append("" if value is None else str(value))
+            shown.append(values)
+        widths = [min(max([len(name)] + [len(values[i]) for values in shown]), 60) for i, name in enumerate(names)]
+        lines = ["  ".join(name.ljust(width) for name, width in zip(names, widths)),
+                 "  ".join("-" * width for width in widths)]
+        lines += ["  ".join(value[:width].ljust(width) for value, width in zip(values, widths)) for values in shown]
+        if self.length > limit:
+            lines.append(f"... {self.length - limit} more")
+        return "\n".join(lines)
+
+
+class EventStore:
+    """Events of a data directory, one ResultTable per sourcetype, parsed on first use"""
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.tables = {}
+        # sourcetype -> lines skipped because they did not parse
+        self.malformed = {}
+
+    def path(self, sourcetype):
+        """Data file of sourcetype (possibly compressed), or None when it is missing"""
+        filename = SOURCETYPES[sourcetype][0]
+        for suffix in [""] + list(COMPRESSION_SUFFIXES.values()):
+            path = os.path.join(self.data_dir, filename + suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def available(self):
+        return [sourcetype for sourcetype in SOURCETYPES if self.path(sourcetype) is not None]
+
+    def table(self, sourcetype):
+        if sourcetype not in self.tables:
+            self.tables[sourcetype] = self._load(sourcetype)
+        return self.tables[sourcetype]
+
+    def _load(self, sourcetype):
+        path = self.path(sourcetype)
+        if path is None:
+            return ResultTable()
+        with io.TextIOWrapper(open_binary(path), newline='') as source:
+            if SOURCETYPES[sourcetype][1] is not None:
+                source.readline()
+            raw = [line.rstrip("\r\n") for line in source]
+        clock = EventClock(sourcetype)
+        parse = FIELD_PARSERS.get(sourcetype)
+        lines, times, extracted = [], [], []
+        for line in raw:
+            # Lines that do not parse are left out (and counted) rather than failing the search
+            try:
+                times.append(clock(line))
+                if parse is not None:
+                    extracted.append(parse(line))
+            except (ValueError, IndexError, KeyError):
+                if len(times) > len(extracted) and parse is not None:
+                    times.pop()
+                if line:
+                    self.malformed[sourcetype] = self.malformed.get(sourcetype, 0) + 1
+                continue
+            lines.append(line)
+        raw = lines
+        names = {}
+        for fields in extracted:
+            names.update(dict.fromkeys(fields))
+        columns = {
+            "_raw": raw,
+            "_time": times,
+            "index": ["main"] * len(raw),
+            "sourcetype": [sourcetype] * len(raw),
+            "source": [os.path.basename(path)] * len(raw),
+        }
+        for name in names:
+            values = [fields.get(name) for fields in extracted]
+            if not all(value is None or isinstance(value, str) for value in values):
+                values = [None if value is None else str(value).lower() for value in values]
+            columns[name] = values
+        # Newest first, the order searches return events in
+        order = sorted(range(len(raw)), key=times.__getitem__, reverse=True)
+        table = ResultTable({name: [values[row] for row in order] for name, values in columns.items()}, len(raw))
+        for lookup, inputs, outputs in AUTOMATIC_LOOKUPS.get(sourcetype, []):
+            table = ResultTable(lookup_columns(self.lookup(lookup), table, inputs, outputs), base=table)
+        return table
+
+    def lookup(self, name):
+        """Rows of a lookup table as a list of dicts"""
+        filename = LOOKUPS.get(name)
+        if filename is None:
+            raise UnsupportedCommand(f"unknown lookup '{name}' (available: {', '.join(sorted(LOOKUPS))})")
+        path = os.path.join(self.data_dir, filename)
+        if not os.path.exists(path):
+            path = os.path.join(DATA_DIR, filename)
+        with open(path, newline='') as f:
+            return list(csv.DictReader(f))
+
+
+class SearchParser:
+    """Recursive-descent parser for base search expressions
+
+    Produces nested tuples: ("and", [...]), ("or", [...]), ("not", node),
+    ("cmp", field, op, value) and ("term", text). earliest= and latest=
+    are collected into self.earliest / self.latest instead.
+    """
+
+    def __init__(self, text):
+        self.tokens = TOKEN.findall(text)
+        self.position = 0
+        self.earliest = None
+        self.latest = None
+
+    def parse(self):
+        node = self._and()
+        if self.position < len(self.tokens):
+            raise SplError(f"unexpected '{self.tokens[self.position]}' in search")
+        return node
+
+    def _peek(self, offset=0):
+        position = self.position + offset
+        return self.tokens[position] if position < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise SplError("search ends unexpectedly")
+        self.position += 1
+        return token
+
+    def _and(self):
+        nodes = []
+        while self._peek() not in (None, ")"):
+            if self._peek() == "AND":
+                self._next()
+                continue
+            node = self._or()
+            if node is not None:
+                nodes.append(node)
+        if not nodes:
+            # e.g. only earliest= / latest=
+            return None
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def _or(self):
+        nodes = [self._not()]
+        while self._peek() == "OR":
+            self._next()
+            nodes.append(self._not())
+        nodes = [node for node in nodes if node is not None]
+        if not nodes:
+            return None
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def _not(self):
+        if self._peek() == "NOT":
+            self._next()
+            return ("not", self._not())
+        token = self._next()
+        if token == "(":
+            node = self._and()
+            if self._next() != ")":
+                raise SplError("unbalanced parentheses")
+            return node
+        if token in (")", ",", "=", "!=", "<", ">", "<=", ">="):
+            raise SplError(f"unexpected '{token}' in search")
+        if self._peek() in ("=", "!=", "<", ">", "<=", ">="):
+            op = self._next()
+            value = _unquote(self._next())
+            if token == "earliest":
+                self.earliest = value
+                return None
+            if token == "latest":
+                self.latest = value
+                return None
+            return ("cmp", token, op, value)
+        return ("term", _unquote(token))
+
+
+def sourcetypes_of(node):
+    """Sourcetypes a search is restricted to (top-level sourcetype=X terms), or None for all"""
+    nodes = node[1] if node is not None and node[0] == "and" else [node]
+    for child in nodes:
+        if child is not None and child[0] == "cmp" and child[1] == "sourcetype" and child[2] == "=":
+            return [sourcetype for sourcetype in SOURCETYPES if _wildcard(child[3]).fullmatch(sourcetype)]
+        if child is not None and child[0] == "or" and all(
+                grandchild[0] == "cmp" and grandchild[1] == "sourcetype" and grandchild[2] == "="
+                for grandchild in child[1]):
+            return [sourcetype for sourcetype in SOURCETYPES
+                    if any(_wildcard(grandchild[3]).fullmatch(sourcetype) for grandchild in child[1])]
+    return None
+
+
+def evaluate(node, table):
+    """Row mask of a parsed search expression over table: bytes, 1 for each matching row
+
+    Masks combine as big integers (one byte per row), so AND, OR and NOT
+    run at C speed. Masks of terms and comparisons are cached on the
+    table, so searches sharing filters over the same events reuse them.
+    """
+    size = len(table)
+    if node is None:
+        return b"\x01" * size
+    kind = node[0]
+    if kind in ("and", "or"):
+        combined = int.from_bytes(evaluate(node[1][0], table), "little")
+        for child in node[1][1:]:
+            mask = int.from_bytes(evaluate(child, table), "little")
+            combined = combined & mask if kind == "and" else combined | mask
+        return combined.to_bytes(size, "little")
+    if kind == "not":
+        mask = int.from_bytes(evaluate(node[1], table), "little")
+        return (mask ^ int.from_bytes(b"\x01" * size, "little")).to_bytes(size, "little")
+    mask = table.cache.get(node)
+    if mask is None:
+        mask = table.cache[node] = bytes(_leaf_mask(node, table))
+    return mask
+
+
+def _leaf_mask(node, table):
+    if node[0] == "term":
+        raw = table.lowered("_raw")
+        text = node[1].lower()
+        if "*" in text:
+            pattern = re.compile(".*".join(re.escape(part) for part in text.split("*")), re.DOTALL)
+            return [line is not None and pattern.search(line) is not None for line in raw]
+        return [line is not None and text in line for line in raw]
+    _, field, op, value = node
+    if op in ("=", "!="):
+        values = table.lowered(field)
+        if "*" in value:
+            match = _wildcard(value).fullmatch
+            mask = [v is not None and match(str(v)) is not None for v in values]
+        else:
+            target = value.lower()
+            mask = [v == target for v in values]
+        if op == "!=":
+            # Like Splunk, field!=value never matches events without the field
+            mask = [v is not None and not m for v, m in zip(values, mask)]
+        return mask
+    target = _number(value)
+    if target is None:
+        raise SplError(f"{field}{op}{value}: comparison needs a number")
+    compare = {"<": float.__lt__, ">": float.__gt__, "<=": float.__le__, ">=": float.__ge__}[op]
+    numbers = [_number(v) for v in table.column(field)]
+    return [n is not None and compare(float(n), float(target)) for n in numbers]
+
+
+def resolve_time(text, now):
+    """Epoch seconds of an earliest/latest time modifier (relative to now, in epoch seconds)"""
+    text = text.strip().lower()
+    if text == "now":
+        return now
+    if re.fullmatch(r"\d+", text):
+        return int(text)
+    try:
+        return epoch_seconds(datetime.strptime(text, "%m/%d/%Y:%H:%M:%S"))
+    except ValueError:
+        pass
+    match = RELATIVE_TIME.fullmatch(text)
+    if match is None or (match.group(2) and match.group(2) not in TIME_UNITS) or (
+            match.group(3) and match.group(3) not in TIME_UNITS):
+        raise SplError(f"cannot parse time modifier '{text}'")
+    amount, unit, snap = match.groups()
+    moment = from_epoch_seconds(now)
+    if amount is not None:
+        count = int(amount) if amount not in "+-" else int(amount + "1")
+        unit = TIME_UNITS[unit or "s"]
+        if unit == "mon":
+            month = moment.year * 12 + moment.month - 1 + count
+            moment = moment.replace(year=month // 12, month=month % 12 + 1, day=min(moment.day, 28))
+        elif unit == "y":
+            moment = moment.replace(year=moment.year + count, day=min(moment.day, 28))
+        else:
+            moment += timedelta(seconds=count * UNIT_SECONDS[unit])
+    if snap:
+        snap = TIME_UNITS[snap]
+        if snap in ("s", "m", "h", "d"):
+            seconds = epoch_seconds(moment)
+            return seconds - seconds % UNIT_SECONDS[snap]
+        moment = moment.replace(hour=0, minute=0, second=0)
+        if snap == "w":
+            # Weeks start on Sunday
+            moment -= timedelta(days=(moment.weekday() + 1) % 7)
+        elif snap == "mon":
+            moment = moment.replace(day=1)
+        else:
+            moment = moment.replace(month=1, day=1)
+    return epoch_seconds(moment)
+
+
+def _field_list(tokens):
+    """Field names from a comma and/or space separated list"""
+    return [_unquote(token) for token in tokens if token != ","]
+
+
+def _options(tokens, names):
+    """Split name=value options (of the given names) from the other tokens"""
+    options, rest = {}, []
+    position = 0
+    while position < len(tokens):
+        if tokens[position] in names and position + 2 < len(tokens) and tokens[position + 1] == "=":
+            options[tokens[position]] = _unquote(tokens[position + 2])
+            position += 3
+        else:
+            rest.append(tokens[position])
+            position += 1
+    return options, rest
+
+
+def _split_by(tokens):
+    if "by" in tokens:
+        at = tokens.index("by")
+        return tokens[:at], _field_list(tokens[at + 1:])
+    return tokens, []
+
+
+def _groups(table, by):
+    """Row numbers per group key, in first-seen order; rows missing a by field are dropped"""
+    groups = {}
+    if not by:
+        return {(): list(range(len(table)))}
+    columns = [table.column(name) for name in by]
+    for row, key in enumerate(zip(*columns)):
+        if None not in key:
+            groups.setdefault(key, []).append(row)
+    return groups
+
+
+def _aggregate(function, values):
+    if function == "count":
+        return sum(1 for value in values if value is not None)
+    if function == "dc":
+        return len({value for value in values if value is not None})
+    if function == "values":
+        return sorted({str(value) for value in values if value is not None})
+    numbers = [number for number in map(_number, values) if number is not None]
+    if function in ("min", "max"):
+        if numbers:
+            return min(numbers) if function == "min" else max(numbers)
+        present = [str(value) for value in values if value is not None]
+        return (min(present) if function == "min" else max(present)) if present else None
+    if not numbers:
+        return None
+    if function == "sum":
+        return sum(numbers)
+    return sum(numbers) / len(numbers)
+
+
+def lookup_columns(rows, table, inputs, outputs, only_new=False):
+    """Event field -> values of the lookup outputs for each row of table
+
+    inputs and outputs are (lookup field, event field) pairs; with only_new,
+    values the events already have are kept (OUTPUTNEW).
+    """
+    matches = {}
+    for row in rows:
+        matches.setdefault(tuple(row.get(field) for field, _ in inputs), row)
+    keys = list(zip(*(table.column(event_field) for _, event_field in inputs)))
+    columns = {}
+    for lookup_field, event_field in outputs:
+        looked_up = [matches[key].get(lookup_field) if key in matches else None for key in keys]
+        if only_new:
+            looked_up = [old if old is not None else new for old, new in zip(table.column(event_field), looked_up)]
+        columns[event_field] = looked_up
+    return columns
+
+
+def _time_range(parser, now):
+    """Epoch seconds (earliest, latest) of a parsed search's time modifiers, None where absent"""
+    earliest = None if parser.earliest is None else resolve_time(parser.earliest, now)
+    latest = None if parser.latest is None else resolve_time(parser.latest, now)
+    return earliest, latest
+
+
+STATS_FUNCTIONS = {"count": "count", "c": "count", "dc": "dc", "distinct_count": "dc", "sum": "sum",
+                   "avg": "avg", "mean": "avg", "min": "min", "max": "max", "values": "values"}
+
+
+class SplEngine:
+    """Runs searches against an EventStore"""
+
+    def __init__(self, store=None, now=None):
+        self.store = store or EventStore()
+        self.now = None if now is None else epoch_seconds(now)
+
+    def run(self, spl):
+        """Results of a search string as a ResultTable"""
+        commands = split_pipeline(spl.strip())
+        if commands[0]:
+            table = self._base_search(commands[0])
+        elif len(commands) > 1:
+            table = None
+        else:
+            raise SplError("empty search")
+        for command in commands[1:]:
+            tokens = TOKEN.findall(command)
+            if not tokens:
+                raise SplError("empty command between pipes")
+            name, args = tokens[0].lower(), tokens[1:]
+            handler = getattr(self, f"_cmd_{name}", None)
+            if handler is None:
+                raise UnsupportedCommand(f"unsupported command '{name}'")
+            if table is None and name != "inputlookup":
+                raise SplError(f"'{name}' cannot start a search")
+            table = handler(table, args)
+        return table
+
+    def _base_search(self, text):
+        parser = SearchParser(text)
+        node = parser.parse()
+        sourcetypes = sourcetypes_of(node)
+        if sourcetypes is None:
+            sourcetypes = self.store.available()
+        tables = [self.store.table(sourcetype) for sourcetype in sourcetypes]
+        now = self.now
+        if now is None:
+            # Just after the latest event, so latest=now keeps it
+            now = max((table.column("_time")[0] for table in tables if len(table)), default=0) + 1
+        earliest, latest = _time_range(parser, now)
+        results = []
+        for table in tables:
+            # Tables are newest first, so the time range is one slice of rows
+            times = table.column("_time")
+            first = 0 if latest is None else bisect_left(times, -latest + 1, key=int.__neg__)
+            end = len(times) if earliest is None else bisect_right(times, -earliest, key=int.__neg__)
+            mask = evaluate(node, table)
+            results.append(table.take(compress(range(first, end), mask[first:end])))
+        table = ResultTable.concat(results)
+        if len([result for result in results if len(result)]) > 1:
+            # Each sourcetype is newest first; interleave them the same way
+            table = table.take(sorted(range(len(table)), key=table.column("_time").__getitem__, reverse=True))
+        return table
+
+    def _cmd_search(self, table, args):
+        parser = SearchParser(" ".join(args))
+        node = parser.parse()
+        mask = evaluate(node, table)
+        if parser.earliest is not None or parser.latest is not None:
+            if "_time" not in table.fields():
+                raise SplError("earliest/latest need _time, which earlier commands removed")
+            times = table.column("_time")
+            now = self.now
+            if now is None:
+                # Rows may be in any order here, so bound each one rather than slicing
+                now = max((t for t in times if t is not None), default=0) + 1
+            earliest, latest = _time_range(parser, now)
+            mask = [keep and t is not None and (earliest is None or t >= earliest) and (latest is None or t < latest)
+                    for keep, t in zip(mask, times)]
+        return table.take(compress(range(len(table)), mask))
+
+    def _cmd_stats(self, table, args):
+        functions, by = _split_by(args)
+        aggregations = []
+        position = 0
+        while position < len(functions):
+            token = functions[position]
+            if token == ",":
+                position += 1
+                continue
+            function = STATS_FUNCTIONS.get(token.lower())
+            if function is None:
+                raise UnsupportedCommand(f"unsupported stats function '{token}'")
+            field = None
+            label = token
+            position += 1
+            if position < len(functions) and functions[position] == "(":
+                if position + 2 >= len(functions) or functions[position + 2] != ")":
+                    raise SplError(f"bad arguments to {token}()")
+                field = _unquote(functions[position + 1])
+                label = f"{token}({field})"
+                position += 3
+            elif function != "count":
+                raise SplError(f"{token} needs a field, e.g. {token}(bytes)")
+            if position + 1 < len(functions) and functions[position].lower() == "as":
+                label = _unquote(functions[position + 1])
+                position += 2
+            aggregations.append((function, field, label))
+        if not aggregations:
+            raise SplError("stats needs at least one function")
+
+        groups = _groups(table, by)
+        keys = sorted(groups, key=lambda key: [_sort_key(value) for value in key])
+        if not by and not len(table):
+            keys = [()]
+            groups = {(): []}
+        columns = {name: [key[i] for key in keys] for i, name in enumerate(by)}
+        for function, field, label in aggregations:
+            values = table.column(field) if field is not None else None
+            if values is None:
+                columns[label] = [len(groups[key]) for key in keys]
+            else:
+                columns[label] = [_aggregate(function, [values[row] for row in groups[key]]) for key in keys]
+        return ResultTable(columns, len(keys))
+
+    def _top(self, table, args, rare):
+        options, rest = _options(args, {"limit", "showperc", "showcount", "countfield", "percentfield"})
+        fields, by = _split_by(rest)
+        fields = _field_list(fields)
+        if not fields:
+            raise SplError(f"{'rare' if rare else 'top'} needs a field")
+        limit = int(options.get("limit", TOP_LIMIT))
+        count_field = options.get("countfield", "count")
+        percent_field = options.get("percentfield", "percent")
+        show_percent = options.get("showperc", "true").lower() not in ("false", "f", "0")
+        show_count = options.get("showcount", "true").lower() not in ("false", "f", "0")
+
+        columns = {name: [] for name in by + fields}
+        counts, percents = [], []
+        values = [table.column(name) for name in fields]
+        for key, rows in sorted(_groups(table, by).items(), key=lambda item: [_sort_key(v) for v in item[0]]):
+            tally = {}
+            for row in rows:
+                combination = tuple(column[row] for column in values)
+                if None not in combination:
+                    tally[combination] = tally.get(combination, 0) + 1
+            total = sum(tally.values())
+            ranked = sorted(tally.items(), key=lambda item: item[1] if rare else -item[1])
+            for combination, count in ranked[:limit or None]:
+                for name, value in zip(by, key):
+                    columns[name].append(value)
+                for name, value in zip(fields, combination):
+                    columns[name].append(value)
+                counts.append(count)
+                percents.append(100.0 * count / total)
+        if show_count:
+            columns[count_field] = counts
+        if show_percent:
+            columns[percent_field] = percents
+        return ResultTable(columns, len(counts))
+
+    def _cmd_top(self, table, args):
+        return self._top(table, args, rare=False)
+
+    def _cmd_rare(self, table, args):
+        return self._top(table, args, rare=True)
+
+    def _select(self, table, patterns):
+        selected = []
+        for pattern in patterns:
+            if "*" in pattern:
+                match = _wildcard(pattern).fullmatch
+                selected += [name for name in table.fields() if match(name) and name not in selected]
+            elif pattern not in selected:
+                selected.append(pattern)
+        return selected
+
+    def _cmd_table(self, table, args):
+        return ResultTable(base=table, names=self._select(table, _field_list(args)))
+
+    def _cmd_fields(self, table, args):
+        remove = bool(args) and args[0] == "-"
+        if args and args[0] in ("+", "-"):
+            args = args[1:]
+        names = self._select(table, _field_list(args))
+        if remove:
+            return ResultTable(base=table, names=[name for name in table.fields() if name not in names])
+        keep = [name for name in ("_raw", "_time") if name in table.fields() and name not in names]
+        return ResultTable(base=table, names=names + keep)
+
+    def _cmd_rename(self, table, args):
+        args = [token for token in args if token != ","]
+        if len(args) % 3 or any(token.lower() != "as" for token in args[1::3]):
+            raise SplError("rename expects: field AS new_name [, field AS new_name ...]")
+        renames = {_unquote(old): _unquote(new) for old, new in zip(args[0::3], args[2::3])}
+        columns = {}
+        for name in table.fields():
+            new = renames.get(name, name)
+            if new in columns and name not in renames:
+                continue
+            columns[new] = table.column(name)
+        return ResultTable(columns, len(table))
+
+    def _cmd_sort(self, table, args):
+        options, args = _options(args, {"limit"})
+        limit = int(options.get("limit", SORT_LIMIT))
+        if args and args[0].isdigit():
+            limit = int(args[0])
+            args = args[1:]
+        keys = []
+        descending = False
+        position = 0
+        while position < len(args):
+            token = args[position]
+            position += 1
+            if token == ",":
+                continue
+            if token in ("-", "+"):
+                descending = token == "-"
+                continue
+            if token[0] in "-+":
+                descending, token = token[0] == "-", token[1:]
+            if token.lower() in ("num", "str", "ip", "auto") and position < len(args) and args[position] == "(":
+                token = args[position + 1]
+                position += 3
+            keys.append((_unquote(token), descending))
+            descending = False
+        if not keys:
+            raise SplError("sort needs a field")
+        order = list(range(len(table)))
+        # Stable sorts from the last key to the first
+        for name, reverse in reversed(keys):
+            values = table.column(name)
+            present = [row for row in order if values[row] is not None]
+            missing = [row for row in order if values[row] is None]
+            present.sort(key=lambda row: _sort_key(values[row]), reverse=reverse)
+            order = present + missing
+        return table.take(order[:limit or None])
+
+    def _cmd_dedup(self, table, args):
+        options, args = _options(args, {"keepempty", "consecutive", "keepevents"})
+        keep = 1
+        if args and args[0].isdigit():
+            keep = int(args[0])
+            args = args[1:]
+        if "sortby" in args:
+            args = args[:args.index("sortby")]
+        names = _field_list(args)
+        if not names:
+            raise SplError("dedup needs a field")
+        keep_empty = options.get("keepempty", "false").lower() in ("true", "t", "1")
+        seen = {}
+        rows = []
+        for row, key in enumerate(zip(*(table.column(name) for name in names))):
+            if None in key:
+                if keep_empty:
+                    rows.append(row)
+                continue
+            if seen.get(key, 0) < keep:
+                seen[key] = seen.get(key, 0) + 1
+                rows.append(row)
+        return table.take(rows)
+
+    def _limit(self, args):
+        options, args = _options(args, {"limit"})
+        if "limit" in options:
+            return int(options["limit"])
+        return int(args[0]) if args and args[0].isdigit() else HEAD_LIMIT
+
+    def _cmd_head(self, table, args):
+        return table.take(range(min(self._limit(args), len(table))))
+
+    def _cmd_tail(self, table, args):
+        count = min(self._limit(args), len(table))
+        return table.take(range(len(table) - 1, len(table) - 1 - count, -1))
+
+    def _cmd_lookup(self, table, args):
+        if not args:
+            raise SplError("lookup needs a lookup table name")
+        rows = self.store.lookup(_unquote(args[0]))
+        args = [token for token in args[1:] if token != ","]
+        upper = [token.upper() for token in args]
+        output_at = next((i for i, token in enumerate(upper) if token in ("OUTPUT", "OUTPUTNEW")), len(args))
+        only_new = output_at < len(args) and upper[output_at] == "OUTPUTNEW"
+
+        def pairs(tokens):
+            result, position = [], 0
+            while position < len(tokens):
+                name = _unquote(tokens[position])
+                if position + 2 < len(tokens) and tokens[position + 1].lower() == "as":
+                    result.append((name, _unquote(tokens[position + 2])))
+                    position += 3
+                else:
+                    result.append((name, name))
+                    position += 1
+            return result
+
+        inputs = pairs(args[:output_at])
+        if not inputs:
+            raise SplError("lookup needs at least one input field")
+        outputs = pairs(args[output_at + 1:])
+        if not outputs:
+            lookup_fields = list(rows[0]) if rows else []
+            outputs = [(name, name) for name in lookup_fields if name not in {field for field, _ in inputs}]
+        return ResultTable(lookup_columns(rows, table, inputs, outputs, only_new), base=table)
+
+    def _cmd_inputlookup(self, table, args):
+        if table is not None:
+            raise SplError("inputlookup must start the search")
+        options, args = _options(args, {"append", "start", "max"})
+        if not args:
+            raise SplError("inputlookup needs a lookup table name")
+        rows = self.store.lookup(_unquote(args[0]))
+        names = list(rows[0]) if rows else []
+        return ResultTable({name: [row.get(name) for row in rows] for name in names}, len(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a lab search offline against generated course data")
+    parser.add_argument('search', help='SPL search, e.g. "index=main sourcetype=db_audit | stats count by Type"')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='Directory holding the generated data files (default: this directory)')
+    parser.add_argument('--now', type=datetime.fromisoformat, default=None,
+                        help='Time relative earliest/latest values count from (default: the latest event)')
+    parser.add_argument('--limit', type=int, default=20, help='Result rows to print (default: 20)')
+    args = parser.parse_args()
+
+    engine = SplEngine(EventStore(args.data_dir), now=args.now)
+    try:
+        results = engine.run(args.search)
+    except SplError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(results.format(args.limit))
+    print(f"\n{len(results)} results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Network syslog sender for generated linux_secure (sshd) events
+
+Streams events from DataGenerator to a syslog endpoint, the way a
+forwarder tier receives them, with an asyncio client:
+- UDP, one message per datagram, or TCP with octet-counting framing
+  (RFC 6587/5425 style "LEN SP MSG"; --syslog-framing lf for receivers
+  that only split on newlines)
+- messages written in batches, spread over a configurable number of
+  sockets or connections
+- backpressure from the transports' flow control: senders wait while a
+  transport's write buffer is over its high-water mark, and a bounded
+  queue between generator and senders slows generation to match
+
+Messages carry PRI <38> (facility auth, severity info) in RFC 3164
+(BSD) or RFC 5424 format.
+
+Also includes a local listener that counts and timestamps received
+messages on UDP and TCP, to measure sustained events/sec and loss end to
+end on one box.
+
+Usage:
+    python syslog_sender.py listen [--port 5514] [--expect 63884]
+    python generate_course_data.py --output syslog --syslog-host localhost --syslog-port 5514 --syslog-protocol tcp
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime
+
+from sender_common import put_batch
+from sourcetype_specs import MONTHS
+
+# Facility auth (4) * 8 + severity info (6), as sshd logs
+DEFAULT_PRI = 38
+DEFAULT_PORT = 5514
+
+# RFC 5424 TIME-OFFSET per (year, month, day, hour) of local event time
+_OFFSETS = {}
+
+
+class SyslogError(Exception):
+    """Raised when the syslog endpoint stays unreachable after all retries"""
+
+
+def rfc3164_message(line, pri=DEFAULT_PRI):
+    """'<PRI>Mmm dd HH:MM:SS host sshd[pid]: msg' from a generated linux_secure line"""
+    weekday, month, day, year, clock, host, rest = line.split(" ", 6)
+    return f"<{pri}>{month} {int(day):2d} {clock} {host} {rest}"
+
+
+def time_offset(year, month, day, hour):
+    """RFC 5424 TIME-OFFSET ('Z' or '+hh:mm') of a local time, computed once per hour
+
+    Generated event times are naive local times (the range ends at
+    datetime.now()), so they are stamped with the local UTC offset in
+    effect at that hour, following DST changes across the range.
+    """
+    key = (year, month, day, hour)
+    offset = _OFFSETS.get(key)
+    if offset is None:
+        minutes = int(datetime(year, month, day, hour).astimezone().utcoffset().total_seconds()) // 60
+        sign = "-" if minutes < 0 else "+"
+        offset = _OFFSETS[key] = "Z" if not minutes else f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+    return offset
+
+
+def rfc5424_message(line, pri=DEFAULT_PRI):
+    """'<PRI>1 YYYY-MM-DDTHH:MM:SS+hh:mm host sshd pid - - msg' from a generated linux_secure line"""
+    weekday, month, day, year, clock, host, rest = line.split(" ", 6)
+    tag, _, message = rest.partition(": ")
+    app, _, pid = tag.rstrip("]").partition("[")
+    offset = time_offset(int(year), MONTHS[month], int(day), int(clock[:2]))
+    return f"<{pri}>1 {year}-{MONTHS[month]:02d}-{day}T{clock}{offset} {host} {app} {pid or '-'} - - {message}"
+
+
+MESSAGE_FORMATS = {"rfc3164": rfc3164_message, "rfc5424": rfc5424_message}
+
+
+def syslog_messages(generator, count, message_format="rfc3164", pri=DEFAULT_PRI):
+    """Yield count linux_secure events as encoded syslog messages"""
+    build = MESSAGE_FORMATS[message_format]
+    for line in generator.iter_events("linux_secure", count):
+        yield build(line, pri).encode()
+
+
+def frame(messages, framing):
+    """Bytes of a batch of messages on a TCP stream"""
+    if framing == "octet":
+        return b"".join(b"%d %s" % (len(message), message) for message in messages)
+    return b"".join(message + b"\n" for message in messages)
+
+
+class _DatagramSender(asyncio.DatagramProtocol):
+    """Datagram endpoint protocol that tracks flow control and send errors"""
+
+    def __init__(self):
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.errors = 0
+
+    def pause_writing(self):
+        self.writable.clear()
+
+    def resume_writing(self):
+        self.writable.set()
+
+    def error_received(self, exc):
+        # e.g. ECONNREFUSED when nothing listens on the port
+        self.errors += 1
+
+
+class SyslogClient:
+    """Batched, fanned-out syslog client over UDP or TCP
+
+    Messages are grouped into batches of batch_size and handed to
+    connections senders, each with its own socket (UDP) or connection
+    (TCP). The queue between the producer and the senders holds at most
+    2 * connections batches, and each sender waits on its transport's
+    flow control after every batch, so a slow receiver slows generation
+    rather than growing memory. TCP senders reconnect with backoff; a
+    batch interrupted by a disconnect is sent again in full.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, protocol="udp", connections=1, batch_size=200,
+                 framing="octet", buffer_bytes=1024 * 1024, max_retries=8):
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.connections = connections
+        self.batch_size = batch_size
+        self.framing = framing
+        self.buffer_bytes = buffer_bytes
+        self.max_retries = max_retries
+        self.messages = 0
+        self.bytes = 0
+        self.batches = 0
+        self.retries = 0
+        self.send_errors = 0
+        self.pauses = 0
+
+    async def send(self, messages):
+        """Send every message from an iterable of encoded syslog messages"""
+        queue = asyncio.Queue(maxsize=2 * self.connections)
+        sender = self._udp_sender if self.protocol == "udp" else self._tcp_sender
+        senders = [asyncio.create_task(sender(queue)) for _ in range(self.connections)]
+        try:
+            batch = []
+            for message in messages:
+                batch.append(message)
+                if len(batch) >= self.batch_size:
+                    await put_batch(queue, batch, senders)
+                    batch = []
+            if batch:
+                await put_batch(queue, batch, senders)
+            for _ in senders:
+                await put_batch(queue, None, senders)
+            await asyncio.gather(*senders)
+        finally:
+            for task in senders:
+                task.cancel()
+
+    async def _udp_sender(self, queue):
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            _DatagramSender, remote_addr=(self.host, self.port))
+        transport.set_write_buffer_limits(high=self.buffer_bytes)
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                for message in batch:
+                    transport.sendto(message)
+                self.messages += len(batch)
+                self.bytes += sum(len(message) for message in batch)
+                self.batches += 1
+                if not protocol.writable.is_set():
+                    self.pauses += 1
+                    await protocol.writable.wait()
+                else:
+                    # Let the other senders and the producer run between batches
+                    await asyncio.sleep(0)
+        finally:
+            self.send_errors += protocol.errors
+            transport.close()
+
+    async def _connect(self):
+        for attempt in range(self.max_retries + 1):
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.transport.set_write_buffer_limits(high=self.buffer_bytes)
+                return writer
+            except OSError:
+                self.retries += 1
+                await asyncio.sleep(min(0.05 * 2 ** attempt, 5.0) * (0.5 + random.random()))
+        raise SyslogError(f"cannot connect to {self.host}:{self.port} after {self.max_retries} retries")
+
+    async def _tcp_sender(self, queue):
+        writer = await self._connect()
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                data = frame(batch, self.framing)
+                while True:
+                    try:
+                        writer.write(data)
+                        if writer.transport.get_write_buffer_size() > self.buffer_bytes:
+                            self.pauses += 1
+                        await writer.drain()
+                        break
+                    except (ConnectionError, OSError):
+                        writer.close()
+                        writer = await self._connect()
+                self.messages += len(batch)
+                self.bytes += len(data)
+                self.batches += 1
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+
+def send_generated_events(generator, count, host, port=DEFAULT_PORT, protocol="udp", connections=1,
+                          batch_size=200, framing="octet", message_format="rfc3164"):
+    """Generate count linux_secure events and send them to a syslog endpoint; prints throughput"""
+    client = SyslogClient(host, port, protocol=protocol, connections=connections, batch_size=batch_size,
+                          framing=framing)
+    started = time.perf_counter()
+    asyncio.run(client.send(syslog_messages(generator, count, message_format)))
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"Sent {client.messages} linux_secure events to {protocol}://{host}:{port} in {client.batches} batches "
+          f"over {connections} {'socket' if protocol == 'udp' else 'connection'}{'s' if connections != 1 else ''} "
+          f"in {elapsed:.1f}s "
+          f"({client.messages / elapsed:,.0f} events/sec, {client.bytes / 1e6 / elapsed:.1f} MB/sec; "
+          f"{client.pauses} flow-control pauses, {client.retries} reconnects, {client.send_errors} send errors)")
+    return client
+
+
+class _StreamReceiver(asyncio.Protocol):
+    """TCP connection of the local listener: splits octet-counted or newline-delimited frames"""
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.buffer = b""
+
+    def data_received(self, data):
+        buffer = self.buffer + data if self.buffer else data
+        position = 0
+        messages = []
+        while position < len(buffer):
+            if buffer[position:position + 1].isdigit():
+                # Octet counting: LEN SP MSG
+                space = buffer.find(b" ", position)
+                if space < 0:
+                    break
+                end = space + 1 + int(buffer[position:space])
+                if end > len(buffer):
+                    break
+                messages.append(buffer[space + 1:end])
+                position = end
+            else:
+                newline = buffer.find(b"\n", position)
+                if newline < 0:
+                    break
+                messages.append(buffer[position:newline].rstrip(b"\r"))
+                position = newline + 1
+        self.buffer = buffer[position:]
+        self.listener.received(messages, "tcp")
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    """UDP endpoint of the local listener: one message per datagram"""
+
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.received([data.rstrip(b"\n")], "udp")
+
+
+class LocalSyslogListener:
+    """Syslog receiver that counts and timestamps messages, for throughput and loss measurements
+
+    Counts messages per transport and per PRI, messages without a valid
+    <PRI>, and arrivals per wall-clock second; with expect set, the report
+    includes how many of the expected messages were lost.
+    """
+
+    def __init__(self, expect=None):
+        self.expect = expect
+        self.messages = 0
+        self.bytes = 0
+        self.invalid = 0
+        self.by_transport = {}
+        self.by_pri = {}
+        self.per_second = {}
+        self.first = None
+        self.last = None
+
+    def received(self, messages, transport):
+        if not messages:
+            return
+        now = time.time()
+        self.first = self.first or now
+        self.last = now
+        second = int(now)
+        self.per_second[second] = self.per_second.get(second, 0) + len(messages)
+        self.messages += len(messages)
+        self.by_transport[transport] = self.by_transport.get(transport, 0) + len(messages)
+        for message in messages:
+            self.bytes += len(message)
+            close = message.find(b">", 1, 5)
+            if message[:1] != b"<" or close < 0 or not message[1:close].isdigit():
+                self.invalid += 1
+                continue
+            pri = int(message[1:close])
+            self.by_pri[pri] = self.by_pri.get(pri, 0) + 1
+
+    def report(self):
+        """Summary of what was received"""
+        elapsed = (self.last - self.first) if self.first and self.last and self.last > self.first else 0
+        report = {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "invalid": self.invalid,
+            "by_transport": self.by_transport,
+            "by_pri": {str(pri): count for pri, count in sorted(self.by_pri.items())},
+            "first": self.first,
+            "last": self.last,
+            "seconds": round(elapsed, 3),
+            "events_per_sec": round(self.messages / elapsed) if elapsed else None,
+            "peak_events_per_sec": max(self.per_second.values()) if self.per_second else None,
+        }
+        if self.expect is not None:
+            report["lost"] = max(self.expect - self.messages, 0)
+            report["loss_rate"] = round(report["lost"] / self.expect, 6) if self.expect else 0.0
+        return report
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, protocols=("udp", "tcp"), report_interval=5.0,
+                    receive_buffer=None):
+        loop = asyncio.get_running_loop()
+        servers = []
+        if "udp" in protocols:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _DatagramReceiver(self),
+                                                               local_addr=(host, port))
+            if receive_buffer:
+                import socket
+                transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+            servers.append(transport)
+        if "tcp" in protocols:
+            servers.append(await loop.create_server(lambda: _StreamReceiver(self), host, port))
+        print(f"Local syslog listening on {'+'.join(protocols)} {host}:{port}")
+        try:
+            reported = 0
+            while True:
+                await asyncio.sleep(report_interval)
+                if self.messages != reported:
+                    reported = self.messages
+                    print(json.dumps(self.report()))
+        finally:
+            for server in servers:
+                server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local syslog listener for measuring generated event streams")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    listen = subparsers.add_parser("listen", help="Receive syslog on UDP and TCP and count messages")
+    listen.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    listen.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    listen.add_argument('--protocol', choices=['udp', 'tcp', 'both'], default='both',
+                        help='Transports to listen on (default: both)')
+    listen.add_argument('--expect', type=int, default=None,
+                        help='Number of messages the sender will send, to report loss')
+    listen.add_argument('--receive-buffer', type=int, default=None,
+                        help='UDP socket receive buffer in bytes (larger buffers drop less under bursts)')
+    listen.add_argument('--report-interval', type=float, default=5.0,
+                        help='Seconds between progress reports (default: 5)')
+    args = parser.parse_args()
+
+    listener = LocalSyslogListener(expect=args.expect)
+    protocols = ("udp", "tcp") if args.protocol == "both" else (args.protocol,)
+    try:
+        asyncio.run(listener.serve(args.host, args.port, protocols, args.report_interval, args.receive_buffer))
+    except KeyboardInterrupt:
+        print(json.dumps(listener.report(), indent=2))
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Weighted categorical sampling with Walker/Vose alias tables
+
+An AliasTable is built once from a list of weights in O(n). After that each
+draw costs one uniform variate, one multiply and two list lookups however
+many categories there are: the uniform picks a column and its fractional
+part decides between the column's own category and its alias.
+
+    table = AliasTable(zipf_weights(len(PRODUCT_IDS), 1.1))
+    product = PRODUCT_IDS[table.sample(rng.random)]
+    indices = table.sample_many(rng.random, 10000)
+    array = table.sample_array(np_rng, 100000)      # numpy Generator
+"""
+
+
+def zipf_weights(n, exponent=1.0):
+    """Zipfian weights 1/rank**exponent for ranks 1..n (exponent 0 is uniform)"""
+    return [1.0 / rank ** exponent for rank in range(1, n + 1)]
+
+
+class AliasTable:
+    """Vose's alias method over len(weights) categories"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0 or min(weights) < 0:
+            raise ValueError("alias table weights must be non-negative with a positive sum")
+        self.n = n
+        self.probabilities = [weight / total for weight in weights]
+        scaled = [p * n for p in self.probabilities]
+        self.threshold = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.threshold[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1.0 up to rounding error and keeps its own column
+
+    def sample(self, random):
+        """Draw one category index; random is a callable returning uniforms on [0, 1)"""
+        u = random() * self.n
+        column = int(u)
+        return column if u - column < self.threshold[column] else self.alias[column]
+
+    def sample_many(self, random, count):
+        """Draw count category indices as a list"""
+        n, threshold, alias = self.n, self.threshold, self.alias
+        out = []
+        append = out.append
+        for _ in range(count):
+            u = random() * n
+            column = int(u)
+            append(column if u - column < threshold[column] else alias[column])
+        return out
+
+    def sample_array(self, rng, count):
+        """Draw count category indices as a numpy array from a numpy Generator"""
+        import numpy as np
+        u = rng.random(count) * self.n
+        column = u.astype(np.int64)
+        return np.where(u - column < np.asarray(self.threshold)[column], column, np.asarray(self.alias)[column])
+
+    def remap(self, values):
+        """(threshold, own values, alias values) for inlining draws that return values, not indices"""
+        return self.threshold, list(values), [values[i] for i in self.alias]
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# validate_course.py lives at the repo root, the generator modules in labs/data
+for path in (ROOT, os.path.join(ROOT, "labs", "data")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
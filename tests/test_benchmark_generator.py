@@ -0,0 +1,18 @@
+import pytest
+
+from benchmark_generator import measure
+
+
+def test_measure_reports_the_fastest_run():
+    result = measure(("db_audit", "python", 2000, 1), repeat=2)
+    assert result["events"] == 2000 and result["events_per_sec"] > 0
+
+
+def test_a_crashed_run_fails_naming_the_case():
+    with pytest.raises(RuntimeError, match=r"no_such_sourcetype/python 100 events x1: .*exited with code 1"):
+        measure(("no_such_sourcetype", "python", 100, 1), repeat=1)
+
+
+def test_a_run_past_the_timeout_is_killed():
+    with pytest.raises(RuntimeError, match=r"access_combined_wcookie/python 50000000 events x1: no result within"):
+        measure(("access_combined_wcookie", "python", 50_000_000, 1), repeat=1, timeout=0.5)
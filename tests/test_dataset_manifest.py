@@ -0,0 +1,19 @@
+import shutil
+from pathlib import Path
+
+from conftest import ROOT
+from generate_course_data import GENERATOR_VERSION, code_digest
+
+DATA = Path(ROOT) / "labs" / "data"
+
+
+def test_generator_version_covers_every_module(tmp_path):
+    for module in DATA.glob("*.py"):
+        shutil.copy(module, tmp_path)
+    assert code_digest(tmp_path) == GENERATOR_VERSION
+    for name in ("event_formats.py", "sourcetype_specs.py"):
+        module = tmp_path / name
+        original = module.read_text()
+        module.write_text(original + "\n# changed\n")
+        assert code_digest(tmp_path) != GENERATOR_VERSION
+        module.write_text(original)
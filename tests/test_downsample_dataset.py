@@ -0,0 +1,32 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from conftest import ROOT
+from answer_keys import AnswerKeys
+
+DATA = Path(ROOT) / "labs" / "data"
+
+
+def test_sample_answer_keys_are_recomputed_and_scaled(tmp_path):
+    with open(DATA / "db_audit_30DAY.csv") as f:
+        lines = [f.readline() for _ in range(2001)]
+    source = tmp_path / "db_audit_30DAY.csv"
+    source.write_text("".join(lines))
+    subprocess.run([sys.executable, str(DATA / "downsample_dataset.py"), str(source), "--fraction", "0.25",
+                    "--workers", "1"], check=True, capture_output=True)
+
+    sample = tmp_path / "sample-25pct"
+    kept = (sample / "db_audit_30DAY.csv").read_text().splitlines()[1:]
+    expected = AnswerKeys()
+    expected.observe("db_audit", kept)
+    data = json.loads((sample / "answer_keys.json").read_text())
+    assert data["events_by_sourcetype"] == {"db_audit": len(kept)}
+    assert data["sourcetypes"] == expected.to_dict()["sourcetypes"]
+
+    scale = data["sample"]["scale"]["db_audit"]
+    assert scale == 2000 / len(kept)
+    estimated = data["estimated"]["sourcetypes"]["db_audit"]
+    for name, counts in data["sourcetypes"]["db_audit"].items():
+        assert estimated[name] == {key: round(count * scale) for key, count in counts.items()}
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from conftest import ROOT
+from event_index import EventIndex, IndexBuilder, build_index, index_dir
+
+DATA = Path(ROOT) / "labs" / "data"
+
+
+def db_audit_copy(tmp_path, lines=3000):
+    with open(DATA / "db_audit_30DAY.csv", newline='') as f:
+        text = "".join(f.readline() for _ in range(lines + 1))
+    path = tmp_path / "db_audit_30DAY.csv"
+    path.write_bytes(text.encode())
+    return str(path)
+
+
+def build_spilling(path, batch_size=100):
+    """Index path with tiny spill thresholds, so postings go through many run files"""
+    with open(path, newline='') as f:
+        builder = IndexBuilder(path, "db_audit", len(f.readline()), spill_postings=500, spill_tokens=200)
+        lines = [line.rstrip("\r\n") for line in f]
+    for start in range(0, len(lines), batch_size):
+        builder.add_batch(lines[start:start + batch_size])
+    runs = len(builder.runs)
+    builder.save()
+    return runs
+
+
+def test_spilled_runs_merge_into_the_same_index(tmp_path):
+    path = db_audit_copy(tmp_path)
+    build_index(path)
+    directory = Path(index_dir(path))
+    whole = {name: (directory / name).read_bytes() for name in ("postings.bin", "tokens.tsv", "offsets.bin", "times.bin")}
+    assert build_spilling(path) > 10
+    for name, data in whole.items():
+        assert (directory / name).read_bytes() == data, name
+    assert not list(directory.glob("*.tmp"))
+
+
+def test_token_lookups_match_a_scan(tmp_path):
+    path = db_audit_copy(tmp_path)
+    build_spilling(path)
+    index = EventIndex(path)
+    with open(path) as f:
+        events = [line.lower() for line in f.read().splitlines()[1:]]
+    assert index.meta["events"] == len(events)
+    for term in ("query", "type=connect", "select", "no-such-token"):
+        expected = [n for n, event in enumerate(events) if term.split("=")[-1] in event]
+        assert index.search([term]) == expected
+    assert index.read_event(7).lower() == events[7]
@@ -0,0 +1,48 @@
+import copy
+import re
+from collections import Counter
+from datetime import datetime
+
+import generate_course_data
+from generate_course_data import DataGenerator
+
+END_DATE = datetime(2026, 1, 1)
+
+
+def test_numpy_engine_follows_spec_variants(monkeypatch):
+    spec = copy.deepcopy(generate_course_data.SPECS["access_combined_wcookie"])
+    spec["fields"]["code"] = {"choice": ["A", "B"], "weights": [9, 1]}
+    spec["variants"] = [
+        {"name": "ping", "weight": 3, "template": '{ip} [{timestamp}] "GET /ping?c={code}&again={code}" {status}',
+         "fields": {"status": {"const": "204"}}},
+        {"name": "health", "weight": 1, "template": '{ip} [{timestamp}] "GET /health" {status}',
+         "fields": {"status": {"randint": [500, 503]}}},
+    ]
+    monkeypatch.setitem(generate_course_data.SPECS, "access_combined_wcookie", spec)
+
+    lines = list(DataGenerator(seed=5, end_date=END_DATE, engine="numpy").iter_web_access_logs(20000))
+    assert len(lines) == 20000
+    paths = Counter(re.search(r'"GET (/\w+)', line).group(1) for line in lines)
+    assert set(paths) == {"/ping", "/health"}
+    assert 0.72 < paths["/ping"] / len(lines) < 0.78
+    codes = Counter()
+    for line in lines:
+        if "/ping" in line:
+            first, second = re.search(r"c=(\w)&again=(\w)", line).groups()
+            assert first == second and line.endswith('" 204')
+            codes[first] += 1
+        else:
+            assert 500 <= int(line.rsplit(" ", 1)[1]) <= 503
+    assert 0.87 < codes["A"] / sum(codes.values()) < 0.93
+
+
+def test_numpy_engine_matches_python_distribution():
+    shares = []
+    for engine in ("python", "numpy"):
+        lines = list(DataGenerator(seed=5, end_date=END_DATE, engine=engine).iter_web_access_logs(50000))
+        statuses = Counter(re.search(r'HTTP 1.1" (\d+)', line).group(1) for line in lines)
+        shares.append({status: count / len(lines) for status, count in statuses.items()})
+    python, numpy = shares
+    assert set(python) == set(numpy)
+    for status in python:
+        assert abs(python[status] - numpy[status]) < 0.01
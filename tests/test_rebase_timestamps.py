@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import ROOT
+from rebase_timestamps import rebase_file
+
+DATA = Path(ROOT) / "labs" / "data"
+
+
+def db_audit_copy(tmp_path, lines=200):
+    with open(DATA / "db_audit_30DAY.csv", newline='') as f:
+        text = "".join(f.readline() for _ in range(lines + 1))
+    path = tmp_path / "db_audit_30DAY.csv"
+    path.write_bytes(text.encode())
+    return path
+
+
+@pytest.mark.parametrize("offset", [7 * 86400, 3600])
+def test_a_malformed_line_leaves_the_file_unchanged(tmp_path, offset):
+    path = db_audit_copy(tmp_path)
+    lines = path.read_bytes().split(b"\n")
+    lines[150] = b"not a timestamp," + lines[150]
+    original = b"\n".join(lines)
+    path.write_bytes(original)
+    with pytest.raises(ValueError, match="line 151"):
+        rebase_file(str(path), offset=offset)
+    assert path.read_bytes() == original
+
+
+def test_a_shift_out_of_range_leaves_the_file_unchanged(tmp_path):
+    path = db_audit_copy(tmp_path)
+    original = path.read_bytes()
+    with pytest.raises(ValueError, match="date range"):
+        rebase_file(str(path), offset=-800000 * 86400)
+    assert path.read_bytes() == original
+
+
+def test_valid_files_are_rebased(tmp_path):
+    path = db_audit_copy(tmp_path)
+    count, applied = rebase_file(str(path), offset=86400)
+    assert (count, applied) == (200, 86400)
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import ROOT
+from generate_course_data import DataGenerator
+from spl_engine import EventStore, SplEngine, SplError
+
+DATA = Path(ROOT) / "labs" / "data"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """An engine over the first 2000 db_audit events"""
+    with open(DATA / "db_audit_30DAY.csv") as f:
+        (tmp_path / "db_audit_30DAY.csv").write_text("".join(f.readline() for _ in range(2001)))
+    return SplEngine(EventStore(str(tmp_path)))
+
+
+def times(table):
+    return sorted(table.column("_time"))
+
+
+def test_mid_pipeline_time_bounds_match_the_base_search(engine):
+    for bounds in ("earliest=-1d", "latest=-1d", "earliest=-2d@d latest=-1d@d"):
+        base = engine.run(f"index=main sourcetype=db_audit {bounds}")
+        piped = engine.run(f"index=main sourcetype=db_audit | search {bounds}")
+        assert 0 < len(piped) < len(engine.run("index=main sourcetype=db_audit"))
+        assert times(piped) == times(base)
+
+
+def test_mid_pipeline_time_bounds_apply_to_reordered_rows(engine):
+    everything = engine.run("sourcetype=db_audit | sort 0 _time")
+    newest = max(everything.column("_time"))
+    piped = engine.run("sourcetype=db_audit | sort 0 _time | search earliest=-1h")
+    assert times(piped) == [t for t in times(everything) if t >= newest + 1 - 3600]
+
+
+def test_time_bounds_without_time_are_an_error(engine):
+    with pytest.raises(SplError):
+        engine.run("sourcetype=db_audit | stats count by Command | search earliest=-1d")
+
+
+def test_access_events_carry_the_automatic_product_lookup(tmp_path):
+    DataGenerator(output_dir=str(tmp_path), days=2, seed=1, stream=True).generate_sourcetype(
+        "access_combined_wcookie", 5000)
+    engine = SplEngine(EventStore(str(tmp_path)))
+    revenue = engine.run("index=main sourcetype=access_combined_wcookie file=success.do status=200 "
+                         "| stats sum(Price) as Revenue by ProductName")
+    assert len(revenue) > 0 and None not in revenue.column("ProductName")
+    explicit = engine.run("sourcetype=access_combined_wcookie productId=DB-SG-G01 "
+                          "| lookup products_lookup productId OUTPUT product_name as Name | table Name, ProductName, Price")
+    assert set(explicit.column("Name")) == set(explicit.column("ProductName")) == {"Mediocre Kingdoms"}
+    assert set(explicit.column("Price")) == {"24.99"}
@@ -0,0 +1,48 @@
+import re
+import time
+
+import pytest
+
+from generate_course_data import DataGenerator
+from syslog_sender import _OFFSETS, rfc5424_message
+
+# RFC 5424 section 6: HEADER SP STRUCTURED-DATA [SP MSG], with NILVALUE structured data
+RFC5424 = re.compile(
+    r"<(?P<pri>\d{1,3})>(?P<version>[1-9]\d{0,2}) "
+    r"(?P<timestamp>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?(?:Z|[+-]\d{2}:\d{2})) "
+    r"(?P<hostname>[!-~]{1,255}) (?P<app>[!-~]{1,48}) (?P<procid>[!-~]{1,128}) (?P<msgid>[!-~]{1,32}) "
+    r"(?P<sd>-)(?: (?P<msg>.*))?$")
+
+LINE = "Fri Oct 16 2026 10:47:23 www4 sshd[16808]: Accepted password for admin from 10.0.0.50 port 22 ssh2"
+
+
+@pytest.fixture
+def timezone(monkeypatch):
+    def use(name):
+        monkeypatch.setenv("TZ", name)
+        time.tzset()
+        _OFFSETS.clear()
+    yield use
+    monkeypatch.undo()
+    time.tzset()
+    _OFFSETS.clear()
+
+
+def test_generated_messages_match_the_rfc5424_header_grammar():
+    generator = DataGenerator(seed=1, output_dir=".")
+    for line in generator.iter_events("linux_secure", 2000):
+        assert RFC5424.match(rfc5424_message(line)), line
+
+
+def test_header_fields(timezone):
+    timezone("UTC")
+    match = RFC5424.match(rfc5424_message(LINE))
+    assert match.group("pri", "version", "timestamp", "hostname", "app", "procid", "msgid") == (
+        "38", "1", "2026-10-16T10:47:23Z", "www4", "sshd", "16808", "-")
+    assert match.group("msg") == "Accepted password for admin from 10.0.0.50 port 22 ssh2"
+
+
+@pytest.mark.parametrize("zone, offset", [("Asia/Kolkata", "+05:30"), ("America/St_Johns", "-02:30")])
+def test_timestamp_carries_the_local_offset(timezone, zone, offset):
+    timezone(zone)
+    assert RFC5424.match(rfc5424_message(LINE)).group("timestamp") == f"2026-10-16T10:47:23{offset}"
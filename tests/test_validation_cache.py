@@ -0,0 +1,52 @@
+import shutil
+from pathlib import Path
+
+from conftest import ROOT
+from validate_course import CACHE_FILE, CourseValidator, ValidationCache
+
+
+def make_course(tmp_path):
+    """A course root holding a copy of the generator modules and a small db_audit file"""
+    source = Path(ROOT) / "labs" / "data"
+    data = tmp_path / "labs" / "data"
+    shutil.copytree(source / "sourcetypes", data / "sourcetypes")
+    for module in source.glob("*.py"):
+        shutil.copy(module, data)
+    with open(source / "db_audit_30DAY.csv") as f:
+        (data / "db_audit_30DAY.csv").write_text("".join(f.readline() for _ in range(50)))
+    return tmp_path
+
+
+def run_data_check(course):
+    cache = ValidationCache(course / CACHE_FILE)
+    validator = CourseValidator(str(course), workers=1, cache=cache)
+    validator.validate_data_files()
+    cache.save()
+    return cache, validator
+
+
+def test_unchanged_modules_replay_cached_findings(tmp_path):
+    course = make_course(tmp_path)
+    first, validator = run_data_check(course)
+    assert (first.hits, first.misses) == (0, 1)
+    assert not validator.errors
+    second, _ = run_data_check(course)
+    assert (second.hits, second.misses) == (1, 0)
+
+
+def test_editing_an_imported_module_invalidates_cached_findings(tmp_path):
+    course = make_course(tmp_path)
+    run_data_check(course)
+    module = course / "labs" / "data" / "event_formats.py"
+    module.write_text(module.read_text() + "\n# LINE_PATTERNS changed\n")
+    cache, _ = run_data_check(course)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_editing_a_sourcetype_spec_invalidates_cached_findings(tmp_path):
+    course = make_course(tmp_path)
+    run_data_check(course)
+    spec = course / "labs" / "data" / "sourcetypes" / "db_audit.json"
+    spec.write_text(spec.read_text() + "\n")
+    cache, _ = run_data_check(course)
+    assert (cache.hits, cache.misses) == (0, 1)
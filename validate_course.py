@@ -10,19 +10,388 @@ This script validates the course structure, content, and ensures:
 5. Presentation concepts are covered before corresponding labs
 6. Links and references are valid
 7. No incomplete content (TODO markers)
+8. Generated data files parse: every line of the access, linux_secure and
+   db_audit files matches its format (checked in parallel over
+   line-aligned mmap chunks), with the time range and out-of-order rate
+9. Optionally (--check-searches), that the SPL in the labs runs and returns
+   results on the generated data, using the offline engine in
+   labs/data/spl_engine.py
+
+Checks are registered with @check and run concurrently over a shared
+document cache. Several course trees can be validated in one run, and
+--json writes the structured results for CI.
+
+Findings are cached per file in .validation_cache.json in the course root,
+keyed by content hashes and the validator version, so a rerun only
+re-checks what changed (a presentation edit re-checks every lab's concept
+coverage). --watch re-validates on every save.
 """
 
+import argparse
+import contextlib
+import hashlib
+import json
+import mmap
 import os
 import re
 import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
+
+# Bytes of a data file checked per worker task
+DATA_CHUNK_SIZE = 32 * 1024 * 1024
+# Malformed lines quoted per file in the report
+MALFORMED_EXAMPLES = 3
+
+# Timing references that must not remain in labs or presentations
+TIMING_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'Duration:\s*\d+\s*(?:min|hour|minute)',
+    r'\d+-day\s+(?:intensive\s+)?course',
+    r'\*Day\s+\d+\s*-\s*Lab',
+    r'Lab\s+\d+\s+of\s+\d+',
+)]
+# Markdown links [text](path)
+LINK_PATTERN = re.compile(r'\[([^\]]+)\]\(([^\)]+)\)')
+# Syntax templates such as <lookup_name> in example searches
+PLACEHOLDER_PATTERN = re.compile(r"<\w+>")
+
+PRESENTATION_FILES = ["content1.html", "content2.html"]
+# Concepts the presentations must introduce before each lab
+LAB_CONCEPTS = {
+    "Lab1_Data_Loading.md": ["data ingestion", "source type", "index"],
+    "Lab2_Basic_Searching.md": ["search", "timeline", "Boolean", "search history", "jobs"],
+    "Lab3_Using_Fields_in_Searches.md": ["fields", "sidebar"],
+    "Lab4_Basic_Commands.md": ["commands", "table", "sort", "dedup"],
+    "lab5_transforming_commands.md": ["stats", "chart", "transforming"],
+    "lab6_reports_dashboards.md": ["reports", "dashboards", "visualizations"],
+    "lab7_pivot_datasets.md": ["pivot", "datasets"],
+    "lab8_lookups.md": ["lookups", "enrichment"],
+    "lab9_alerts.md": ["alerts", "scheduled", "actions"]
+}
+
+# Findings cached per file are only reused by the exact same validator code (and, for the data and
+# search units, the same labs/data modules; see module_digest)
+VALIDATOR_VERSION = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=8).hexdigest()
+# Persistent findings cache, in the course root
+CACHE_FILE = ".validation_cache.json"
+# Seconds between mtime polls in --watch mode
+WATCH_INTERVAL = 0.05
+
+# SPL engine over the parsed data, kept while the data files are unchanged (--watch reruns)
+_ENGINES = {}
+
+# Registered checks in report order: (name, title, CourseValidator method, enabling attribute, uses processes)
+CHECKS = []
+
+
+def check(name: str, title: str, option: str = None, processes: bool = False):
+    """Register a CourseValidator method as a check
+
+    option names the validator attribute that must be true for the check to
+    run. Checks with processes=True start a process pool; they run on the
+    main thread before the others, which run concurrently on threads.
+    """
+    def register(method):
+        CHECKS.append((name, title, method.__name__, option, processes))
+        return method
+    return register
+
+
+class DocumentCache:
+    """Course files read (and lowercased) at most once, shared by all checks and threads"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.texts = {}
+        self.lowered = {}
+        self.lock = threading.Lock()
+
+    def text(self, relative: str) -> Optional[str]:
+        """Content of root/relative, or None when it does not exist"""
+        if relative not in self.texts:
+            path = self.root / relative
+            content = path.read_text() if path.is_file() else None
+            with self.lock:
+                self.texts.setdefault(relative, content)
+        return self.texts[relative]
+
+    def lower(self, relative: str) -> Optional[str]:
+        """Lowercased content of root/relative, or None"""
+        if relative not in self.lowered:
+            content = self.text(relative)
+            with self.lock:
+                self.lowered.setdefault(relative, content.lower() if content is not None else None)
+        return self.lowered[relative]
+
+    def digest(self, relative: str) -> str:
+        """Content hash of root/relative ('missing' when it does not exist)"""
+        content = self.text(relative)
+        if content is None:
+            return "missing"
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def module_digest(module_dir: Path) -> str:
+    """Content hash of the generator modules and sourcetype specs the data and search checks import
+
+    Part of the data and search units' inputs, so editing e.g.
+    event_formats.py (LINE_PATTERNS) or spl_engine.py re-checks them.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(list(module_dir.glob("*.py")) + list((module_dir / "sourcetypes").glob("*"))):
+        if path.is_file():
+            digest.update(path.name.encode() + b"\0" + path.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def forget_modules(module_dir: Path):
+    """Drop module_dir's modules from sys.modules so the next import loads their current source"""
+    directory = str(module_dir.resolve())
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.dirname(os.path.abspath(path)) == directory:
+            del sys.modules[name]
+
+
+def file_signature(path: Path) -> str:
+    """Size and mtime of a data file, standing in for a content hash of multi-GB files"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return f"{path}:missing"
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class ValidationCache:
+    """Findings of file-level check units kept between runs in a JSON file
+
+    Each unit (e.g. formatting of one lab) is stored with a digest of its
+    inputs' content hashes; a unit whose digest is unchanged replays its
+    findings instead of being checked again. The whole cache is dropped
+    when the validator code changes.
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.units = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path is not None and path.exists():
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                data = {}
+            if data.get("version") == VALIDATOR_VERSION:
+                self.units = data.get("units", {})
+
+    def get(self, unit: str, digest: str) -> Optional[Dict]:
+        entry = self.units.get(unit)
+        with self.lock:
+            if entry is not None and entry["digest"] == digest:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        return None
+
+    def put(self, unit: str, digest: str, findings: Dict):
+        with self.lock:
+            self.units[unit] = dict(findings, digest=digest)
+
+    def save(self):
+        if self.path is None:
+            return
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with self.lock:
+            temporary.write_text(json.dumps({"version": VALIDATOR_VERSION, "units": self.units}))
+        os.replace(temporary, self.path)
+
+
+class CheckResult:
+    """Outcome of one check: its errors, warnings and progress lines"""
+
+    def __init__(self, name: str, title: str):
+        self.name = name
+        self.title = title
+        self.errors = []
+        self.warnings = []
+        self.messages = []
+        self.passed = True
+        self.seconds = 0.0
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "passed": self.passed, "seconds": round(self.seconds, 4),
+                "errors": self.errors, "warnings": self.warnings, "messages": self.messages}
+
+
+def _new_scan() -> Dict:
+    """Empty result of scanning part of a data file"""
+    return {"lines": 0, "events": 0, "malformed": 0, "examples": [], "header": True,
+            "first": None, "last": None, "earliest": None, "latest": None, "out_of_order": 0}
+
+
+def _record_malformed(scan: Dict, gap: bytes):
+    """Count the lines of gap (text between conforming lines) as malformed"""
+    parts = gap.split(b"\n")
+    if parts[-1] == b"":
+        parts.pop()
+    for text in parts:
+        scan["lines"] += 1
+        scan["malformed"] += 1
+        if len(scan["examples"]) < MALFORMED_EXAMPLES:
+            scan["examples"].append((scan["lines"], text[:100].decode(errors="replace").rstrip("\r")))
+
+
+def _scan_lines(pattern, day_seconds, days: Dict, data, pos: int, endpos: int, scan: Dict):
+    """Fold the lines of data[pos:endpos] (whole lines) into scan
+
+    Conforming lines are found by one multiline finditer over the buffer,
+    so an mmap is checked without copying it line by line; whatever lies
+    between two matches is malformed.
+    """
+    position = pos
+    previous = scan["last"]
+    earliest, latest = scan["earliest"], scan["latest"]
+    for match in pattern.finditer(data, pos, endpos):
+        start = match.start()
+        if start != position:
+            _record_malformed(scan, data[position:start])
+        position = match.end() + 1
+        date, clock = match.group("date", "clock")
+        base = days.get(date, -1)
+        if base == -1:
+            base = days[date] = day_seconds(date)
+        if base is None:
+            # Matches the layout but is no calendar date (e.g. 31/Feb)
+            _record_malformed(scan, match.group())
+            continue
+        scan["lines"] += 1
+        seconds = base + int(clock[0:2]) * 3600 + int(clock[3:5]) * 60 + int(clock[6:8])
+        if previous is None:
+            scan["first"] = earliest = latest = seconds
+        else:
+            if seconds < previous:
+                scan["out_of_order"] += 1
+            if seconds < earliest:
+                earliest = seconds
+            elif seconds > latest:
+                latest = seconds
+        previous = seconds
+        scan["events"] += 1
+    if position < endpos:
+        _record_malformed(scan, data[position:endpos])
+    scan["last"], scan["earliest"], scan["latest"] = previous, earliest, latest
+
+
+def check_data_chunk(task: Tuple) -> Dict:
+    """Process pool entry point: scan bytes start:end of a data file (the whole file when end is None)
+
+    Range boundaries are moved to the next line start, so each line is
+    checked by exactly one task. Compressed files are streamed whole.
+    """
+    module_dir, path, sourcetype, start, end = task
+    if module_dir not in sys.path:
+        sys.path.insert(0, module_dir)
+    from datetime import datetime
+    from generate_course_data import SOURCETYPES
+    from event_formats import EPOCH_ORDINAL, LINE_PATTERNS, date_format, open_binary
+
+    pattern = LINE_PATTERNS[sourcetype]
+    header = SOURCETYPES[sourcetype][1]
+    fmt = date_format(sourcetype).rstrip(" :")
+
+    def day_seconds(date):
+        try:
+            return (datetime.strptime(date.decode(), fmt).toordinal() - EPOCH_ORDINAL) * 86400
+        except ValueError:
+            return None
+
+    def skip_header(data, pos, endpos):
+        # The CSV header line is not an event
+        line_end = data.find(b"\n", pos, endpos)
+        line_end = endpos if line_end < 0 else line_end
+        if bytes(data[pos:line_end]).rstrip(b"\r") != header.encode():
+            scan["header"] = False
+            return pos
+        scan["lines"] += 1
+        return min(line_end + 1, endpos)
+
+    scan = _new_scan()
+    days = {}
+    if end is not None:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            pos = 0 if start == 0 else (data.find(b"\n", start - 1) + 1 or size)
+            endpos = size if end >= size else (data.find(b"\n", end - 1) + 1 or size)
+            if pos < endpos:
+                if start == 0 and header is not None:
+                    pos = skip_header(data, pos, endpos)
+                _scan_lines(pattern, day_seconds, days, data, pos, endpos, scan)
+        return scan
+
+    with open_binary(path) as f:
+        rest = b""
+        first = True
+        while True:
+            block = f.read(DATA_CHUNK_SIZE)
+            data = rest + block
+            if block:
+                cut = data.rfind(b"\n") + 1
+                data, rest = data[:cut], data[cut:]
+            else:
+                rest = b""
+            pos = 0
+            if first and data and header is not None:
+                pos = skip_header(data, 0, len(data))
+                first = False
+            _scan_lines(pattern, day_seconds, days, data, pos, len(data), scan)
+            if not block:
+                break
+    return scan
+
+
+def merge_scans(scans: List[Dict]) -> Dict:
+    """Combine the scans of consecutive chunks of one file"""
+    total = _new_scan()
+    for scan in scans:
+        for line, text in scan["examples"]:
+            if len(total["examples"]) < MALFORMED_EXAMPLES:
+                total["examples"].append((total["lines"] + line, text))
+        for key in ("lines", "events", "malformed", "out_of_order"):
+            total[key] += scan[key]
+        total["header"] = total["header"] and scan["header"]
+        if scan["first"] is None:
+            continue
+        if total["last"] is None:
+            total["first"], total["earliest"], total["latest"] = scan["first"], scan["earliest"], scan["latest"]
+        else:
+            # An event earlier than the last one of the previous chunk is out of order too
+            total["out_of_order"] += scan["first"] < total["last"]
+            total["earliest"] = min(total["earliest"], scan["earliest"])
+            total["latest"] = max(total["latest"], scan["latest"])
+        total["last"] = scan["last"]
+    return total
+
 
 class CourseValidator:
-    def __init__(self, course_root: str):
+    def __init__(self, course_root: str, data_dir: str = None, check_searches: bool = False,
+                 workers: int = None, cache: ValidationCache = None):
         self.course_root = Path(course_root)
+        self.data_dir = Path(data_dir) if data_dir else self.course_root / "labs" / "data"
+        self.check_searches = check_searches
+        self.workers = workers
+        self.cache = cache
+        self.documents = DocumentCache(self.course_root)
+        self.module_dir = self.course_root / "labs" / "data"
+        self._module_digest = None
+        self.results = []
         self.errors = []
         self.warnings = []
+        # The CheckResult of the check running on this thread
+        self.local = threading.local()
         self.lab_order = [
             "Lab1_Data_Loading.md",
             "Lab2_Basic_Searching.md",
@@ -44,15 +413,78 @@ class CourseValidator:
 
     def add_error(self, message: str):
         """Add an error to the validation results"""
-        self.errors.append(f"❌ ERROR: {message}")
+        result = getattr(self.local, "result", None)
+        if result is None:
+            self.errors.append(f"❌ ERROR: {message}")
+        else:
+            result.errors.append(message)
 
     def add_warning(self, message: str):
         """Add a warning to the validation results"""
-        self.warnings.append(f"⚠️  WARNING: {message}")
-
+        result = getattr(self.local, "result", None)
+        if result is None:
+            self.warnings.append(f"⚠️  WARNING: {message}")
+        else:
+            result.warnings.append(message)
+
+    def note(self, message: str):
+        """Report progress; printed under the check's title once the checks are done"""
+        result = getattr(self.local, "result", None)
+        if result is None:
+            print(f"  {message}")
+        else:
+            result.messages.append(message)
+
+    def current_errors(self) -> int:
+        """Errors recorded so far by the running check"""
+        result = getattr(self.local, "result", None)
+        return len(self.errors if result is None else result.errors)
+
+    def module_digest(self) -> str:
+        """module_digest of this course's labs/data, computed once per validator"""
+        if self._module_digest is None:
+            self._module_digest = module_digest(self.module_dir)
+        return self._module_digest
+
+    def unit_digest(self, unit: str, inputs: List[str]) -> str:
+        """Digest of a unit's name and the signatures of everything its findings depend on"""
+        return hashlib.blake2b("\0".join([unit] + inputs).encode(), digest_size=16).hexdigest()
+
+    def cached_unit(self, unit: str, inputs: List[str], compute):
+        """Run compute() for one file-level unit of the running check, or replay its cached findings
+
+        inputs are content hashes (or data file signatures) of the files
+        the unit reads, so editing any of them re-checks the unit.
+        """
+        digest = self.unit_digest(unit, inputs)
+        entry = self.cache.get(unit, digest) if self.cache is not None else None
+        if entry is None:
+            outer = getattr(self.local, "result", None)
+            scratch = CheckResult(unit, "")
+            self.local.result = scratch
+            try:
+                compute()
+            finally:
+                self.local.result = outer
+            entry = {"errors": scratch.errors, "warnings": scratch.warnings, "messages": scratch.messages}
+            if self.cache is not None:
+                self.cache.put(unit, digest, entry)
+        for message in entry["errors"]:
+            self.add_error(message)
+        for message in entry["warnings"]:
+            self.add_warning(message)
+        for message in entry["messages"]:
+            self.note(message)
+
+    def is_cached(self, unit: str, inputs: List[str]) -> bool:
+        """Whether cached_unit would replay unit without running it"""
+        return (self.cache is not None
+                and self.cache.units.get(unit, {}).get("digest") == self.unit_digest(unit, inputs))
+
+    @check("structure", "📁 Validating Course Structure...")
     def validate_structure(self) -> bool:
         """Validate that all required directories and files exist"""
-        print("\n📁 Validating Course Structure...")
+        errors = self.current_errors()
 
         # Check main directories
         required_dirs = ["labs", "presentations", "scripts", "labs/data"]
@@ -61,7 +493,7 @@ class CourseValidator:
             if not dir_path.exists():
                 self.add_error(f"Required directory missing: {dir_name}")
             else:
-                print(f"  ✓ Found directory: {dir_name}")
+                self.note(f"✓ Found directory: {dir_name}")
 
         # Check lab files
         labs_dir = self.course_root / "labs"
@@ -70,7 +502,7 @@ class CourseValidator:
             if not lab_path.exists():
                 self.add_error(f"Required lab file missing: {lab_file}")
             else:
-                print(f"  ✓ Found lab: {lab_file}")
+                self.note(f"✓ Found lab: {lab_file}")
 
         # Check data files
         data_dir = self.course_root / "labs" / "data"
@@ -79,69 +511,120 @@ class CourseValidator:
             if not data_path.exists():
                 self.add_error(f"Required data file missing: {data_file}")
             else:
-                print(f"  ✓ Found data file: {data_file}")
+                self.note(f"✓ Found data file: {data_file}")
 
         # Check presentation files
         pres_dir = self.course_root / "presentations"
-        for pres_file in ["content1.html", "content2.html"]:
+        for pres_file in PRESENTATION_FILES:
             pres_path = pres_dir / pres_file
             if not pres_path.exists():
                 self.add_error(f"Required presentation file missing: {pres_file}")
             else:
-                print(f"  ✓ Found presentation: {pres_file}")
+                self.note(f"✓ Found presentation: {pres_file}")
+
+        return self.current_errors() == errors
+
+    @check("data", "🧪 Validating Data File Contents...", processes=True)
+    def validate_data_files(self) -> bool:
+        """Check every line of the generated data files against its sourcetype's format"""
+        module_dir = str(self.course_root / "labs" / "data")
+        if module_dir not in sys.path:
+            sys.path.insert(0, module_dir)
+        from generate_course_data import SOURCETYPES, COMPRESSION_SUFFIXES
+        from event_formats import LINE_PATTERNS, compression_of, from_epoch_seconds
+
+        files = []
+        for sourcetype in LINE_PATTERNS:
+            filename = SOURCETYPES[sourcetype][0]
+            for name in [filename] + [filename + suffix for suffix in COMPRESSION_SUFFIXES.values()]:
+                path = self.data_dir / name
+                if path.exists():
+                    files.append((path, sourcetype))
+        if not files:
+            self.add_warning(f"No data files to check in {self.data_dir}")
+            return True
 
-        return len(self.errors) == 0
+        # Files unchanged since the last run replay their findings; only the others are scanned
+        units = [(f"data:{path}", [file_signature(path), self.module_digest()]) for path, _ in files]
+        tasks, spans = [], []
+        for (path, sourcetype), (unit, inputs) in zip(files, units):
+            first = len(tasks)
+            if self.is_cached(unit, inputs):
+                pass
+            elif compression_of(str(path)) is not None:
+                tasks.append((module_dir, str(path), sourcetype, 0, None))
+            else:
+                size = path.stat().st_size
+                for start in range(0, size, DATA_CHUNK_SIZE):
+                    tasks.append((module_dir, str(path), sourcetype, start, start + DATA_CHUNK_SIZE))
+            spans.append((first, len(tasks)))
+
+        started = time.perf_counter()
+        scans = []
+        if tasks:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                scans = list(pool.map(check_data_chunk, tasks))
+        seconds = max(time.perf_counter() - started, 1e-9)
+
+        def report(path, sourcetype, result):
+            if not result["header"]:
+                self.add_error(f"{path.name}: first line is not the {sourcetype} header")
+            if result["malformed"]:
+                examples = "; ".join(f"line {line}: {text!r}" for line, text in result["examples"])
+                self.add_error(f"{path.name}: {result['malformed']:,} of {result['lines']:,} lines do not "
+                               f"match the {sourcetype} format ({examples})")
+            if not result["events"]:
+                self.add_warning(f"{path.name}: no events")
+                return
+            out_of_order = result["out_of_order"] / max(result["events"] - 1, 1)
+            mark = "❌" if result["malformed"] else "✓"
+            self.note(f"{mark} {path.name}: {result['events']:,} events, "
+                      f"{from_epoch_seconds(result['earliest'])} to {from_epoch_seconds(result['latest'])}, "
+                      f"{out_of_order:.1%} out of order"
+                      + (f", {result['malformed']:,} malformed" if result["malformed"] else ""))
+
+        total_bytes = 0
+        for (path, sourcetype), (unit, inputs), (first, end) in zip(files, units, spans):
+            if first != end:
+                total_bytes += path.stat().st_size
+            self.cached_unit(unit, inputs, lambda: report(path, sourcetype, merge_scans(scans[first:end])))
+        if tasks:
+            self.note(f"✓ Checked {total_bytes / 1e6:.1f} MB in {seconds:.2f}s "
+                      f"({total_bytes / 1e6 / seconds:.0f} MB/sec)")
+        return True
 
+    @check("timing", "⏱️  Validating No Timing References...")
     def validate_no_timing_references(self) -> bool:
         """Check that no timing references remain in labs or presentations"""
-        print("\n⏱️  Validating No Timing References...")
-
-        # Patterns to search for timing references
-        timing_patterns = [
-            r'Duration:\s*\d+\s*(?:min|hour|minute)',
-            r'\d+-day\s+(?:intensive\s+)?course',
-            r'\*Day\s+\d+\s*-\s*Lab',
-            r'Lab\s+\d+\s+of\s+\d+',
-        ]
-
-        # Check labs
-        labs_dir = self.course_root / "labs"
-        for lab_file in self.lab_order:
-            lab_path = labs_dir / lab_file
-            if lab_path.exists():
-                content = lab_path.read_text()
-                for pattern in timing_patterns:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
-                    if matches:
-                        self.add_error(f"Timing reference found in {lab_file}: {matches[0]}")
-
-        # Check presentations
-        pres_dir = self.course_root / "presentations"
-        for pres_file in ["content1.html", "content2.html"]:
-            pres_path = pres_dir / pres_file
-            if pres_path.exists():
-                content = pres_path.read_text()
-                for pattern in timing_patterns:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
-                    if matches:
-                        self.add_error(f"Timing reference found in {pres_file}: {matches[0]}")
-
-        if len([e for e in self.errors if "Timing reference" in e]) == 0:
-            print("  ✓ No timing references found")
+        documents = [f"labs/{lab_file}" for lab_file in self.lab_order]
+        documents += [f"presentations/{pres_file}" for pres_file in PRESENTATION_FILES]
+
+        def check_document(document):
+            content = self.documents.text(document)
+            if content is None:
+                return
+            for pattern in TIMING_PATTERNS:
+                match = pattern.search(content)
+                if match:
+                    self.add_error(f"Timing reference found in {Path(document).name}: {match.group()}")
+
+        errors = self.current_errors()
+        for document in documents:
+            self.cached_unit(f"timing:{document}", [self.documents.digest(document)],
+                             lambda: check_document(document))
+
+        if self.current_errors() == errors:
+            self.note("✓ No timing references found")
             return True
         return False
 
+    @check("formatting", "📝 Validating Lab Formatting...")
     def validate_lab_formatting(self) -> bool:
         """Validate that lab files are properly formatted"""
-        print("\n📝 Validating Lab Formatting...")
-
-        labs_dir = self.course_root / "labs"
-        for lab_file in self.lab_order:
-            lab_path = labs_dir / lab_file
-            if not lab_path.exists():
-                continue
-
-            content = lab_path.read_text()
+        def check_lab(lab_file):
+            content = self.documents.text(f"labs/{lab_file}")
+            if content is None:
+                return
 
             # Check for proper heading structure
             if not content.startswith("# Lab"):
@@ -157,64 +640,50 @@ class CourseValidator:
             if "TODO" in content or "TBD" in content:
                 self.add_warning(f"{lab_file}: Contains TODO/TBD markers")
 
-            print(f"  ✓ Validated {lab_file}")
+            self.note(f"✓ Validated {lab_file}")
+
+        for lab_file in self.lab_order:
+            self.cached_unit(f"formatting:{lab_file}", [self.documents.digest(f"labs/{lab_file}")],
+                             lambda: check_lab(lab_file))
 
         return True
 
+    @check("coverage", "🎓 Validating Presentation Coverage Before Labs...")
     def validate_presentation_coverage(self) -> bool:
         """Validate that presentation concepts are covered before labs"""
-        print("\n🎓 Validating Presentation Coverage Before Labs...")
-
-        # Define lab-to-concept mappings
-        lab_concepts = {
-            "Lab1_Data_Loading.md": ["data ingestion", "source type", "index"],
-            "Lab2_Basic_Searching.md": ["search", "timeline", "Boolean", "search history", "jobs"],
-            "Lab3_Using_Fields_in_Searches.md": ["fields", "sidebar"],
-            "Lab4_Basic_Commands.md": ["commands", "table", "sort", "dedup"],
-            "lab5_transforming_commands.md": ["stats", "chart", "transforming"],
-            "lab6_reports_dashboards.md": ["reports", "dashboards", "visualizations"],
-            "lab7_pivot_datasets.md": ["pivot", "datasets"],
-            "lab8_lookups.md": ["lookups", "enrichment"],
-            "lab9_alerts.md": ["alerts", "scheduled", "actions"]
-        }
-
-        # Read all presentation content
-        pres_dir = self.course_root / "presentations"
-        content1 = (pres_dir / "content1.html").read_text().lower() if (pres_dir / "content1.html").exists() else ""
-        content2 = (pres_dir / "content2.html").read_text().lower() if (pres_dir / "content2.html").exists() else ""
-        all_presentation_content = content1 + content2
-
-        # Check each lab's concepts
-        for lab_file, concepts in lab_concepts.items():
-            missing_concepts = []
-            for concept in concepts:
-                if concept.lower() not in all_presentation_content:
-                    missing_concepts.append(concept)
-
+        covered = set()
+
+        def check_lab(lab_file, concepts):
+            if not covered:
+                # Each distinct concept is searched for once, however many labs list it
+                all_presentation_content = "".join(self.documents.lower(f"presentations/{pres_file}") or ""
+                                                   for pres_file in PRESENTATION_FILES)
+                wanted = {concept.lower() for concepts in LAB_CONCEPTS.values() for concept in concepts}
+                covered.update(concept for concept in wanted if concept in all_presentation_content)
+                covered.add(None)
+            missing_concepts = [concept for concept in concepts if concept.lower() not in covered]
             if missing_concepts:
                 self.add_warning(f"{lab_file}: Concepts not found in presentations: {', '.join(missing_concepts)}")
             else:
-                print(f"  ✓ All concepts covered for {lab_file}")
+                self.note(f"✓ All concepts covered for {lab_file}")
+
+        # Editing a presentation re-checks every lab's coverage
+        presentations = [self.documents.digest(f"presentations/{pres_file}") for pres_file in PRESENTATION_FILES]
+        for lab_file, concepts in LAB_CONCEPTS.items():
+            self.cached_unit(f"coverage:{lab_file}", presentations, lambda: check_lab(lab_file, concepts))
 
         return True
 
+    @check("links", "🔗 Validating Internal Links...")
     def validate_links(self) -> bool:
         """Validate internal links in markdown files"""
-        print("\n🔗 Validating Internal Links...")
-
         labs_dir = self.course_root / "labs"
         for lab_file in self.lab_order:
-            lab_path = labs_dir / lab_file
-            if not lab_path.exists():
+            content = self.documents.text(f"labs/{lab_file}")
+            if content is None:
                 continue
 
-            content = lab_path.read_text()
-
-            # Find markdown links [text](path)
-            link_pattern = r'\[([^\]]+)\]\(([^\)]+)\)'
-            links = re.findall(link_pattern, content)
-
-            for link_text, link_path in links:
+            for link_text, link_path in LINK_PATTERN.findall(content):
                 # Skip external links
                 if link_path.startswith(('http://', 'https://', '#')):
                     continue
@@ -224,7 +693,75 @@ class CourseValidator:
                 if not target_path.exists():
                     self.add_warning(f"{lab_file}: Broken link to '{link_path}'")
 
-        print("  ✓ Link validation complete")
+        self.note("✓ Link validation complete")
+        return True
+
+    @staticmethod
+    def extract_searches(content: str) -> List[Tuple[int, str]]:
+        """(line number, SPL) of each fenced code block in content that holds a search"""
+        searches = []
+        block, start = None, 0
+        for number, line in enumerate(content.splitlines(), 1):
+            if line.strip().startswith("```"):
+                if block is None:
+                    block, start = [], number + 1
+                    continue
+                # Comment lines in the examples start with '#'
+                spl = " ".join(part.strip() for part in block if part.strip() and not part.strip().startswith("#"))
+                # Syntax templates such as <lookup_name> are not runnable searches
+                if spl.startswith(("index=", "sourcetype=", "search ", "|")) and not PLACEHOLDER_PATTERN.search(spl):
+                    searches.append((start, spl))
+                block = None
+            elif block is not None:
+                block.append(line)
+        return searches
+
+    @check("searches", "🔎 Validating Lab Searches Against Generated Data...", option="check_searches")
+    def validate_lab_searches(self) -> bool:
+        """Run each lab search against the generated data with the offline SPL engine"""
+        module_dir = str(self.course_root / "labs" / "data")
+        if module_dir not in sys.path:
+            sys.path.insert(0, module_dir)
+        from spl_engine import EventStore, SplEngine, SplError, UnsupportedCommand
+
+        store = EventStore(str(self.data_dir))
+        available = store.available()
+        if not available:
+            self.add_warning(f"No generated data in {self.data_dir}; run labs/data/generate_course_data.py "
+                             "to check lab searches")
+            return True
+        # Data is only parsed when some lab's searches must run again, and once per process
+        data = [file_signature(Path(store.path(sourcetype))) for sourcetype in available] + [self.module_digest()]
+        engine = _ENGINES.get(tuple(data))
+        if engine is None:
+            _ENGINES.clear()
+            engine = _ENGINES[tuple(data)] = SplEngine(store)
+
+        def check_lab(lab_file, content):
+            passed, skipped = 0, 0
+            for line, spl in self.extract_searches(content):
+                try:
+                    results = engine.run(spl)
+                except UnsupportedCommand:
+                    skipped += 1
+                    continue
+                except SplError as e:
+                    self.add_warning(f"{lab_file}:{line}: search could not be run ({e}): {spl[:80]}")
+                    continue
+                if len(results) == 0:
+                    self.add_warning(f"{lab_file}:{line}: search returns no results: {spl[:80]}")
+                else:
+                    passed += 1
+            if passed or skipped:
+                self.note(f"✓ {lab_file}: {passed} searches returned results"
+                          + (f", {skipped} use unsupported commands" if skipped else ""))
+
+        for lab_file in self.lab_order:
+            content = self.documents.text(f"labs/{lab_file}")
+            if content is None:
+                continue
+            self.cached_unit(f"searches:{lab_file}", [self.documents.digest(f"labs/{lab_file}")] + data,
+                             lambda: check_lab(lab_file, content))
         return True
 
     def generate_report(self) -> bool:
@@ -251,32 +788,172 @@ class CourseValidator:
 
         return len(self.errors) == 0
 
+    def run_check(self, name: str, title: str, method: str) -> CheckResult:
+        """Run one registered check, collecting what it reports into a CheckResult"""
+        result = CheckResult(name, title)
+        self.local.result = result
+        started = time.perf_counter()
+        try:
+            outcome = getattr(self, method)()
+        except Exception as e:
+            result.errors.append(f"{name} check failed: {e}")
+            outcome = False
+        finally:
+            self.local.result = None
+        result.seconds = time.perf_counter() - started
+        result.passed = outcome is not False and not result.errors
+        return result
+
+    def run_checks(self) -> List[CheckResult]:
+        """Run the enabled checks; those without process pools run concurrently on threads"""
+        enabled = [(name, title, method, processes) for name, title, method, option, processes in CHECKS
+                   if option is None or getattr(self, option)]
+        results = {}
+        # Process pools are started before any thread, as forking a threaded process is unsafe
+        for name, title, method, processes in enabled:
+            if processes:
+                results[name] = self.run_check(name, title, method)
+        threaded = [(name, title, method) for name, title, method, processes in enabled if not processes]
+        with ThreadPoolExecutor(max_workers=max(len(threaded), 1)) as pool:
+            for result in pool.map(lambda entry: self.run_check(*entry), threaded):
+                results[result.name] = result
+
+        self.results = [results[name] for name, *_ in enabled]
+        for result in self.results:
+            self.errors.extend(f"❌ ERROR: {message}" for message in result.errors)
+            self.warnings.extend(f"⚠️  WARNING: {message}" for message in result.warnings)
+        return self.results
+
+    def to_dict(self) -> Dict:
+        """Structured results of the last run, for --json"""
+        return {
+            "course_root": str(self.course_root.absolute()),
+            "passed": not any(result.errors for result in self.results),
+            "checks": [result.to_dict() for result in self.results],
+            "errors": [error for result in self.results for error in result.errors],
+            "warnings": [warning for result in self.results for warning in result.warnings],
+        }
+
     def run_all_validations(self) -> bool:
         """Run all validation checks"""
         print("🚀 Starting Splunk Fundamentals Course Validation")
         print(f"📂 Course Root: {self.course_root.absolute()}\n")
 
-        self.validate_structure()
-        self.validate_no_timing_references()
-        self.validate_lab_formatting()
-        self.validate_presentation_coverage()
-        self.validate_links()
+        for result in self.run_checks():
+            print(f"\n{result.title}")
+            for message in result.messages:
+                print(f"  {message}")
 
         return self.generate_report()
 
+def watched_files(validator: CourseValidator) -> Dict[str, Tuple[int, int]]:
+    """(mtime, size) of the files the checks read, from one directory listing each"""
+    signatures = {}
+    directories = [validator.course_root / "labs", validator.course_root / "presentations", validator.data_dir,
+                   validator.module_dir, validator.module_dir / "sourcetypes"]
+    for directory in dict.fromkeys(directories):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        signatures[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            continue
+    return signatures
+
+
+def watch(make_validator, cache: ValidationCache):
+    """Re-validate whenever a watched file changes, reusing the cached findings of the others"""
+    previous = None
+    modules = None
+    try:
+        while True:
+            validator = make_validator()
+            current = watched_files(validator)
+            if current != previous:
+                # Edited check modules must be imported afresh, not just miss the cache
+                if modules is not None and validator.module_digest() != modules:
+                    forget_modules(validator.module_dir)
+                    _ENGINES.clear()
+                modules = validator.module_digest()
+                if previous is not None:
+                    changed = sorted(os.path.basename(name) for name in current.keys() | previous.keys()
+                                     if current.get(name) != previous.get(name))
+                    print(f"\n🔄 Changed: {', '.join(changed)}")
+                cache.hits = cache.misses = 0
+                started = time.perf_counter()
+                validator.run_all_validations()
+                cache.save()
+                print(f"⏱️  Validated in {(time.perf_counter() - started) * 1000:.0f} ms "
+                      f"({cache.hits} cached, {cache.misses} re-checked); watching for changes (Ctrl+C to stop)")
+                previous = current
+            time.sleep(WATCH_INTERVAL)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+
 def main():
     """Main entry point"""
-    # Determine course root (current directory)
-    course_root = os.getcwd()
+    parser = argparse.ArgumentParser(description="Validate the Splunk Fundamentals course")
+    parser.add_argument('course_roots', nargs='*',
+                        help='Course trees to validate (default: the current directory)')
+    parser.add_argument('--check-searches', action='store_true',
+                        help='Run the lab searches against the generated data with labs/data/spl_engine.py')
+    parser.add_argument('--data-dir', default=None,
+                        help='Directory holding the generated data (default: labs/data)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for the data file checks (default: CPU count)')
+    parser.add_argument('--json', default=None, metavar='PATH',
+                        help="Also write the structured results as JSON to PATH ('-' for stdout, "
+                             "moving the report to stderr)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Re-check every file instead of reusing findings from {CACHE_FILE}')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and re-validate whenever a lab, presentation or data file changes')
+    args = parser.parse_args()
+    if args.watch and (len(args.course_roots) > 1 or args.json is not None):
+        parser.error("--watch takes a single course root and no --json")
+
+    # Determine course roots (default: current directory)
+    course_roots = args.course_roots or [os.getcwd()]
 
     # Check if we're in the right directory
-    if not os.path.exists(os.path.join(course_root, "labs")):
-        print("❌ ERROR: Cannot find 'labs' directory. Please run this script from the course root directory.")
-        sys.exit(1)
-
-    # Create validator and run checks
-    validator = CourseValidator(course_root)
-    success = validator.run_all_validations()
+    for course_root in course_roots:
+        if not os.path.exists(os.path.join(course_root, "labs")):
+            print(f"❌ ERROR: Cannot find 'labs' directory in {course_root}. Please run this script from the "
+                  "course root directory or pass course roots.")
+            sys.exit(1)
+
+    def make_validator(course_root, cache):
+        return CourseValidator(course_root, data_dir=args.data_dir, check_searches=args.check_searches,
+                               workers=args.workers, cache=cache)
+
+    def open_cache(course_root):
+        return ValidationCache(None if args.no_cache else Path(course_root) / CACHE_FILE)
+
+    if args.watch:
+        cache = open_cache(course_roots[0])
+        watch(lambda: make_validator(course_roots[0], cache), cache)
+        return
+
+    # Create validators and run checks
+    results = []
+    success = True
+    with contextlib.redirect_stdout(sys.stderr) if args.json == "-" else contextlib.nullcontext():
+        for course_root in course_roots:
+            cache = open_cache(course_root)
+            validator = make_validator(course_root, cache)
+            success = validator.run_all_validations() and success
+            cache.save()
+            results.append(validator.to_dict())
+
+    if args.json is not None:
+        report = json.dumps(results[0] if len(results) == 1 else results, indent=2, ensure_ascii=False)
+        if args.json == "-":
+            print(report)
+        else:
+            Path(args.json).write_text(report + "\n")
 
     # Exit with appropriate code
     sys.exit(0 if success else 1)